@@ -2,10 +2,19 @@
 import sqlite3
 import json
 import os
+import tempfile
 import time
+from contextlib import contextmanager
 from datetime import datetime
 from dotenv import load_dotenv
 
+try:  # Trava do ciclo entre processos (servidor + CLI, workers do gunicorn).
+    import fcntl
+    msvcrt = None
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
 # Carrega ambiente procurando em locais comuns:
 # - `./.env` (raiz do repo)
 # - `./FASE5/.env` (compatibilidade com estrutura antiga)
@@ -15,6 +24,17 @@ for env_path in [os.path.join(repo_root, ".env"), os.path.join(repo_root, "FASE5
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'data', 'patients.db')
 LOG_PATH = os.path.join(os.path.dirname(__file__), 'data', 'logs.json')
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+# Quanto um ciclo espera pelo ciclo de outro processo antes de desistir (segundos).
+LOCK_TIMEOUT_S = _env_float("CARDIOIA_RPA_LOCK_TIMEOUT", 30.0)
 api_key = (os.getenv("GEMINI_API_KEY") or "").strip()
 model_name = (os.getenv("GEMINI_MODEL") or "").strip()
 model = None
@@ -53,7 +73,110 @@ def analyze_risk_with_ai(patient_name, sys, dia, bpm):
         # Nao quebra a rastreabilidade; apenas faz fallback.
         return f"Alerta automático: {patient_name} com vitais alterados (PA {sys}/{dia}, FC {bpm} bpm)."
 
+class CycleLockTimeout(TimeoutError):
+    """Outro processo segurou o ciclo por mais que LOCK_TIMEOUT_S."""
+
+
+@contextmanager
+def cycle_lock(timeout=None):
+    """
+    Trava exclusiva do ciclo, valida entre processos: arquivo `<logs.json>.lock` com flock
+    (msvcrt no Windows). O proprio SO solta a trava se o processo morrer no meio do ciclo.
+    """
+    timeout = LOCK_TIMEOUT_S if timeout is None else timeout
+    lock_path = LOG_PATH + ".lock"
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    deadline = time.monotonic() + timeout
+    wait = 0.002
+    try:
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise CycleLockTimeout(f"Outro ciclo RPA em andamento ha mais de {timeout:g}s ({lock_path}).")
+                time.sleep(wait)
+                wait = min(wait * 2, 0.05)
+        yield
+    finally:
+        # Fechar o descritor solta o flock; no Windows a regiao precisa ser liberada antes.
+        if msvcrt is not None:
+            try:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            except OSError:
+                pass
+        os.close(fd)
+
+
+def load_logs(path=None):
+    """
+    Le o `logs.json`. Arquivo ausente e' lista vazia; arquivo ilegivel levanta ValueError em vez
+    de virar `[]` (o proximo ciclo gravaria por cima e o historico se perderia).
+    """
+    path = path or LOG_PATH
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except FileNotFoundError:
+        return []
+    try:
+        logs = json.loads(text) if text.strip() else []
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{path} ilegivel ({e})") from e
+    if not isinstance(logs, list):
+        raise ValueError(f"{path} nao contem uma lista de logs")
+    return logs
+
+
+def write_logs(logs, path=None):
+    """Grava em arquivo temporario no mesmo diretorio + fsync + os.replace: leitores veem o antigo ou o novo."""
+    path = path or LOG_PATH
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(prefix=".logs.", suffix=".tmp", dir=directory)
+    try:
+        os.chmod(tmp, 0o644)  # mkstemp cria com 0600; mantem a permissao do open('w') anterior
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(logs, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    if hasattr(os, "O_DIRECTORY"):  # persiste a troca de nome (POSIX)
+        dfd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dfd)
+        finally:
+            os.close(dfd)
+
+
+def _quarantine(path, reason):
+    """Tira do caminho um logs.json ilegivel (preservado para analise) e avisa."""
+    aside = f"{path}.corrupt-{datetime.now().strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+    os.replace(path, aside)
+    print(f"[AVISO] {reason}; arquivo movido para {aside}. Novo historico iniciado.")
+
+
 def run_rpa_cycle():
+    """
+    Um ciclo do robo sob `cycle_lock()`: ciclos de processos diferentes rodam em fila e cada um
+    acrescenta os proprios alertas ao historico, sem perder os do outro.
+    """
+    with cycle_lock():
+        return _run_cycle_locked()
+
+
+def _run_cycle_locked():
     print("--- Iniciando Ciclo RPA ---")
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
@@ -69,12 +192,13 @@ def run_rpa_cycle():
     records = cursor.fetchall()
     conn.close()
     
-    logs = []
-    if os.path.exists(LOG_PATH):
-        with open(LOG_PATH, 'r', encoding='utf-8') as f:
-            try: logs = json.load(f)
-            except: logs = []
+    try:
+        logs = load_logs()
+    except ValueError as e:
+        _quarantine(LOG_PATH, str(e))
+        logs = []
 
+    alerts = 0
     for name, sys, dia, bpm, ts in records:
         # Regra de Negócio: Pressão > 140/90 ou BPM > 100
         is_anomaly = (sys > 140 or dia > 90) or (bpm > 100)
@@ -96,13 +220,14 @@ def run_rpa_cycle():
                 "action": "Notificar Equipe Médica"
             }
             logs.append(log_entry)
+            alerts += 1
         else:
             print(f"[OK] {name} está estável.")
 
     # Salva no NoSQL (JSON)
-    with open(LOG_PATH, 'w', encoding='utf-8') as f:
-        json.dump(logs, f, indent=4, ensure_ascii=False)
+    write_logs(logs)
     print("--- Ciclo finalizado. Logs atualizados. ---")
+    return {"records": len(records), "alerts": alerts}
 
 if __name__ == "__main__":
     if not os.path.exists(DB_PATH):
@@ -1,17 +1,31 @@
 from __future__ import annotations
 
 import os
+import time
 from typing import Any, Tuple
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request
 
+from backend.assistant_router import FailoverAssistantService
 from backend.automation_adapter import AutomationAdapter
-from backend.clinical_extraction import ClinicalExtractionService
+from backend.clinical_extraction import ClinicalExtractionResult, ClinicalExtractionService
+from backend.hot_reload import HotReloader, hot_reload_enabled
+from backend.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from backend.metrics import METRICS, instrument_app, metrics_enabled
 from backend.mock_assistant import MockAssistantService
+from backend.mqtt_ingest import MqttIngestBridge, mqtt_ingest_enabled
 from backend.phase2_triage import Phase2TriageService
 from backend.phase3_vitals import risk_check_local, try_post_phase3
 from backend.phase4_cv import try_get_phase4_health
-from backend.watson_service import WatsonService
+from backend.profiler import ADMIN_TOKEN_HEADER, SamplingProfiler, admin_token_ok, install_profiler
+from backend.rate_limit import LLM_LIMITER, build_rate_limiter, install_rate_limits, rate_limit_enabled
+from backend.response_cache import CachedAssistantService
+from backend.services import ServiceRegistry
+from backend.single_flight import stats as single_flight_stats
+from backend.sse import event_stream
+from backend.static_files import StaticFiles
+from backend.vitals_extractor import extract_vitals
+from backend.vitals_store import DEFAULT_AGGS, FIELDS, VitalsStore, device_time_ms, parse_resolution_ms, parse_time_ms
 
 
 HELP_TEXT = (
@@ -31,50 +45,259 @@ def _build_assistant() -> Tuple[Any, str]:
         return MockAssistantService(), "local"
 
     try:
+        # Import tardio: o SDK do Watson é pesado e não é necessário no modo local.
+        from backend.watson_service import WatsonService
+
         svc = WatsonService()
         print("Conectado ao IBM Watson com sucesso.")
-        return svc, "watson"
     except Exception as e:
         # Para avaliação: se não tiver credenciais, ainda permite rodar em modo local.
         print(f"Erro ao conectar com Watson: {e}")
         print("Fazendo fallback para modo LOCAL (offline).")
         return MockAssistantService(), "local"
 
+    # Failover por requisição: se o Watson ficar instável, o circuit breaker desvia para o modo LOCAL.
+    if os.getenv("CARDIOIA_WATSON_FAILOVER", "1").strip().lower() in ["0", "false", "no", "off"]:
+        return svc, "watson"
+    try:
+        return FailoverAssistantService(svc, MockAssistantService()), "watson"
+    except Exception as e:
+        print(f"Failover local indisponível ({e}); usando apenas o Watson.")
+        return svc, "watson"
+
+
+def _assistant_impl(assistant: Any) -> str:
+    """Backend que atende agora ("local" ou "watson"), olhando através do cache e do failover."""
+    assistant = getattr(assistant, "inner", assistant)
+    impl = "local" if isinstance(assistant, MockAssistantService) else "watson"
+    # Com failover, o backend ativo depende do estado do circuit breaker.
+    return getattr(assistant, "active_backend", impl)
+
 
-def create_app() -> Flask:
+def _number(value: Any) -> float | None:
+    try:
+        return float(value) if value is not None else None
+    except Exception:
+        return None
+
+
+def _extraction_payload(result: ClinicalExtractionResult) -> dict[str, Any]:
+    return {
+        "source": result.source,
+        "summary": result.summary,
+        "structured": result.structured,
+        "triage": result.triage,
+    }
+
+
+def _build_cached_assistant(_services: ServiceRegistry) -> Any:
+    assistant, _kind = _build_assistant()
+    if os.getenv("CARDIOIA_RESPONSE_CACHE", "1").strip().lower() not in ["0", "false", "no", "off"]:
+        assistant = CachedAssistantService.from_env(assistant)
+    return assistant
+
+
+def build_services() -> ServiceRegistry:
+    """
+    Registra os serviços do backend (construídos sob demanda, uma única vez por processo).
+    A triagem da Fase 2 é compartilhada entre `/api/phase2/triage` e `/api/clinical/extract`.
+    """
+    services = ServiceRegistry()
+    services.register("assistant", _build_cached_assistant)
+    services.register("phase2_triage", lambda _s: Phase2TriageService())
+    services.register("clinical_extraction", lambda s: ClinicalExtractionService(triage=s.get("phase2_triage")))
+    services.register("automation", lambda _s: AutomationAdapter())
+    services.register("vitals_store", lambda _s: VitalsStore())
+    services.register("mqtt_ingest", lambda s: MqttIngestBridge(s.get("vitals_store")))
+    return services
+
+
+def start_background_services(app: Flask) -> None:
+    """
+    Threads de fundo que nao podem esperar a primeira requisicao (ponte MQTT: um worker sem trafego
+    HTTP ainda precisa consumir os dispositivos). Uma vez por processo; com `preload_app` o
+    gunicorn chama isto no `post_fork` de cada worker, nunca no master.
+    """
+    if mqtt_ingest_enabled():
+        app.config["services"].get("mqtt_ingest").ensure_started()
+
+
+def create_app(start_background: bool = True) -> Flask:
     # Frontend (React build) fica em `backend/static` (gerado pelo Vite).
     app = Flask(__name__, static_folder="static")
     repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 
-    assistant, assistant_kind = _build_assistant()
-    app.config["assistant"] = assistant
-    app.config["assistant_kind"] = assistant_kind
+    # Assistente + integracoes (fases anteriores + ir alem), criados sob demanda.
+    services = build_services()
+    app.config["services"] = services
     # Armazenamento simples de sessão em memória (para protótipo).
     # Em produção, usaria Redis ou banco de dados.
     app.config["user_sessions"] = {}
 
-    # Integracoes (fases anteriores + ir alem).
-    app.config["phase2_triage"] = Phase2TriageService()
-    app.config["clinical_extraction"] = ClinicalExtractionService()
-    app.config["automation"] = AutomationAdapter()
+    # Arquivos estaticos com ETag, variantes .br/.gz e Range (ver `backend/static_files.py`).
+    # Os assets do Vite tem hash no nome, entao podem ser cacheados como imutaveis.
+    static_files = StaticFiles(app.static_folder, immutable_prefixes=("assets/",))
+    app.view_functions["static"] = static_files.send
+    doc_roots = {
+        "fase5/": StaticFiles(os.path.join(repo_root, "document", "fase5")),
+        "anteriores/": StaticFiles(os.path.join(repo_root, "FASES ANTERIORES")),
+        "root/": StaticFiles(repo_root),
+    }
+
+    # Contagem/latencia por rota (Prometheus em /api/metrics); CARDIOIA_METRICS=0 desliga.
+    if metrics_enabled():
+        instrument_app(app)
+
+    # Atras de nginx/balanceador, `remote_addr` seria o do proxy e todos os clientes dividiriam o balde
+    # por IP. `CARDIOIA_TRUSTED_PROXIES=<n>` (saltos de proxy confiaveis) passa a ler o IP do
+    # `X-Forwarded-For`; sem isso o header e' ignorado, porque o cliente poderia forja-lo.
+    try:
+        trusted_proxies = int(os.getenv("CARDIOIA_TRUSTED_PROXIES") or 0)
+    except ValueError:
+        trusted_proxies = 0
+    if trusted_proxies > 0:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies)  # type: ignore[method-assign]
+
+    # Limite por usuario/rota nas rotas que chamam Watson/Gemini (429 + Retry-After); CARDIOIA_RATE_LIMIT=0 desliga.
+    rate_limiter = build_rate_limiter() if rate_limit_enabled() else None
+    if rate_limiter is not None:
+        install_rate_limits(app, rate_limiter)
+
+    # Profiler por amostragem (opt-in): fracao sorteada das requisicoes ou header + token de admin.
+    try:
+        sample_rate = float(os.getenv("CARDIOIA_PROFILER_SAMPLE_RATE") or 0.0)
+    except ValueError:
+        sample_rate = 0.0
+    profiler = SamplingProfiler(sample_rate=sample_rate)
+    app.config["profiler"] = profiler
+    install_profiler(app, profiler)
+
+    # Recarga a quente do skill (modo LOCAL) e do knowledge map da Fase 2: so recarrega servicos
+    # ja construidos (os que ainda nao foram criados vao ler a versao nova de qualquer forma).
+    reloader = HotReloader()
+    app.config["hot_reload"] = reloader
+
+    def _reload_service(name: str, method: str) -> None:
+        svc = services.peek(name)
+        if svc is not None:
+            getattr(svc, method)()
+
+    reloader.watch("skill", [os.path.join(repo_root, "watson_skill_export.json")], lambda: _reload_service("assistant", "reload_skill"))
+    reloader.watch(
+        "knowledge_map",
+        [os.path.join(repo_root, "FASES ANTERIORES", "Fase2", "data", "knowledge_map.csv")],
+        lambda: _reload_service("phase2_triage", "reload_rules"),
+    )
+    if hot_reload_enabled():
+        # Thread criada na primeira requisicao de cada processo (seguro com preload + fork do gunicorn).
+        app.before_request(reloader.ensure_started)
+
+    # Ponte MQTT dos dispositivos da Fase 3 (opt-in). Com varios workers, use CARDIOIA_MQTT_SHARED_GROUP
+    # ou rode `scripts/mqtt_ingest.py` como processo unico. Sobe ja na criacao do app (ou no `post_fork`
+    # do gunicorn, ver `start_background_services`); o gancho por requisicao so' religa threads que morreram.
+    if mqtt_ingest_enabled():
+        app.before_request(lambda: services.get("mqtt_ingest").ensure_started())
+    if start_background:
+        start_background_services(app)
+
+    def admin_error() -> tuple[Any, int] | None:
+        if not (os.getenv("CARDIOIA_ADMIN_TOKEN") or "").strip():
+            return jsonify({"error": "Rotas de admin desativadas (configure CARDIOIA_ADMIN_TOKEN)"}), 404
+        if not admin_token_ok(request.headers.get(ADMIN_TOKEN_HEADER)):
+            return jsonify({"error": "Token de admin inválido"}), 403
+        return None
 
     @app.get("/api/status")
     def status():
         cfg_mode = os.getenv("CARDIOIA_ASSISTANT_MODE", "watson").strip().lower()
-        assistant = app.config.get("assistant")
-        impl = "local" if isinstance(assistant, MockAssistantService) else "watson"
+        assistant = services.get("assistant")
+        cached = assistant if isinstance(assistant, CachedAssistantService) else None
+        impl = _assistant_impl(assistant)
+        assistant = getattr(assistant, "inner", assistant)
 
         assistant_id = getattr(assistant, "assistant_id", None)
         environment_id = getattr(assistant, "environment_id", None)
 
-        return jsonify(
-            {
-                "mode": cfg_mode,
-                "assistant": impl,
-                "assistant_id": assistant_id,
-                "environment_id": environment_id,
-            }
-        )
+        payload = {
+            "mode": cfg_mode,
+            "assistant": impl,
+            "assistant_id": assistant_id,
+            "environment_id": environment_id,
+        }
+        if isinstance(assistant, FailoverAssistantService):
+            payload["failover"] = assistant.stats()
+        if cached is not None:
+            payload["response_cache"] = cached.cache.stats()
+        extraction = services.peek("clinical_extraction")
+        extraction_cache = extraction.cache_stats() if extraction is not None else None
+        if extraction_cache is not None:
+            payload["extraction_cache"] = extraction_cache
+        vitals_store = services.peek("vitals_store")
+        if vitals_store is not None:
+            payload["vitals_store"] = vitals_store.stats()
+        mqtt_ingest = services.peek("mqtt_ingest")
+        if mqtt_ingest is not None:
+            payload["mqtt_ingest"] = mqtt_ingest.stats()
+        payload["services"] = services.stats()
+        payload["hot_reload"] = reloader.stats()
+        payload["single_flight"] = single_flight_stats()
+        payload["rate_limit"] = {
+            **(rate_limiter.stats() if rate_limiter is not None else {"backend": None}),
+            "llm": LLM_LIMITER.stats(),
+        }
+        return jsonify(payload)
+
+    @app.get("/api/metrics")
+    def metrics():
+        if not metrics_enabled():
+            return jsonify({"error": "Métricas desativadas (CARDIOIA_METRICS=0)"}), 404
+        return Response(METRICS.render(), content_type=METRICS_CONTENT_TYPE)
+
+    @app.get("/api/admin/profiler")
+    def profiler_report():
+        """Pilhas agregadas no formato collapsed (flamegraph.pl / speedscope); `?format=json` traz os contadores."""
+        denied = admin_error()
+        if denied is not None:
+            return denied
+        text = profiler.collapsed()
+        payload = {**profiler.stats(), "collapsed": text} if request.args.get("format") == "json" else None
+        if request.args.get("reset") == "1":
+            profiler.reset()
+        if payload is not None:
+            return jsonify(payload)
+        return Response(text, content_type="text/plain; charset=utf-8")
+
+    @app.post("/api/admin/profiler")
+    def profiler_config():
+        denied = admin_error()
+        if denied is not None:
+            return denied
+        body = request.get_json(silent=True) or {}
+        if "sample_rate" in body:
+            try:
+                profiler.sample_rate = min(1.0, max(0.0, float(body["sample_rate"])))
+            except (TypeError, ValueError):
+                return jsonify({"error": "sample_rate deve ser um número entre 0 e 1"}), 400
+        if body.get("reset"):
+            profiler.reset()
+        return jsonify(profiler.stats())
+
+    @app.post("/api/admin/reload")
+    def admin_reload():
+        """Forca a recarga (body opcional `{"target": "skill" | "knowledge_map"}`; sem alvo recarrega todos)."""
+        denied = admin_error()
+        if denied is not None:
+            return denied
+        body = request.get_json(silent=True) or {}
+        targets = reloader.stats()["targets"]
+        names = [body["target"]] if body.get("target") else list(targets)
+        unknown = [n for n in names if n not in targets]
+        if unknown:
+            return jsonify({"error": f"Alvo desconhecido: {unknown[0]}", "targets": list(targets)}), 400
+        results = {n: reloader.reload(n) for n in names}
+        return jsonify({"reloaded": results, **reloader.stats()}), 200 if all(results.values()) else 500
 
     @app.get("/api/config")
     def config():
@@ -87,7 +310,7 @@ def create_app() -> Flask:
 
     @app.get("/")
     def home():
-        return send_from_directory(app.static_folder, "index.html")
+        return static_files.send("index.html")
 
     @app.get("/docs/<path:doc_path>")
     def docs(doc_path: str):
@@ -103,34 +326,18 @@ def create_app() -> Flask:
         if not doc_path:
             return jsonify({"error": "Documento não informado"}), 400
 
-        if doc_path.startswith("fase5/"):
-            rel = doc_path.replace("fase5/", "", 1)
-            base_dir = os.path.join(repo_root, "document", "fase5")
-            return send_from_directory(base_dir, rel)
-
-        if doc_path.startswith("anteriores/"):
-            rel = doc_path.replace("anteriores/", "", 1)
-            base_dir = os.path.join(repo_root, "FASES ANTERIORES")
-            return send_from_directory(base_dir, rel)
-
-        if doc_path.startswith("root/"):
-            rel = doc_path.replace("root/", "", 1)
-            base_dir = repo_root
-            return send_from_directory(base_dir, rel)
+        for prefix, files in doc_roots.items():
+            if doc_path.startswith(prefix):
+                return files.send(doc_path[len(prefix):])
 
         return jsonify({"error": "Prefixo inválido. Use /docs/fase5/…, /docs/anteriores/… ou /docs/root/…"}), 400
 
-    @app.post("/api/message")
-    def message():
-        data = request.get_json(silent=True) or {}
-        user_msg = str(data.get("message") or "")
-        user_id = str(data.get("user_id") or "default_user")
-
+    def assistant_reply(user_msg: str, user_id: str) -> dict[str, Any]:
         # Conversa "humanizada": mensagem vazia não deve virar erro 400.
         if not user_msg.strip():
-            return jsonify({"response": HELP_TEXT, "intents": [], "entities": []})
+            return {"response": HELP_TEXT, "intents": [], "entities": []}
 
-        assistant = app.config["assistant"]
+        assistant = services.get("assistant")
         user_sessions: dict[str, str] = app.config["user_sessions"]
 
         # Recupera ou cria sessão para o usuário.
@@ -140,13 +347,11 @@ def create_app() -> Flask:
                 user_sessions[user_id] = session_id
             else:
                 # Não explode a conversa com 500: devolve uma resposta orientando o próximo passo.
-                return jsonify(
-                    {
-                        "response": "Eu não consegui iniciar uma sessão agora. Você pode tentar novamente em instantes ou usar o modo local (offline).",
-                        "intents": [],
-                        "entities": [],
-                    }
-                )
+                return {
+                    "response": "Eu não consegui iniciar uma sessão agora. Você pode tentar novamente em instantes ou usar o modo local (offline).",
+                    "intents": [],
+                    "entities": [],
+                }
 
         session_id = user_sessions[user_id]
 
@@ -161,13 +366,43 @@ def create_app() -> Flask:
                 user_sessions[user_id] = new_session_id
                 response_data = assistant.send_message(new_session_id, user_msg, user_id=user_id)
 
-        return jsonify(
-            {
-                "response": response_data.get("text") or "Sem resposta.",
-                "intents": response_data.get("intents") or [],
-                "entities": response_data.get("entities") or [],
-            }
-        )
+        return {
+            "response": response_data.get("text") or "Sem resposta.",
+            "intents": response_data.get("intents") or [],
+            "entities": response_data.get("entities") or [],
+        }
+
+    @app.post("/api/message")
+    def message():
+        data = request.get_json(silent=True) or {}
+        user_msg = str(data.get("message") or "")
+        user_id = str(data.get("user_id") or "default_user")
+        return jsonify(assistant_reply(user_msg, user_id))
+
+    @app.post("/api/message/stream")
+    def message_stream():
+        """
+        Versão SSE de `/api/message`: `meta` sai na hora, depois `triage`/`vitals` (locais,
+        rápidos), `token` com o texto do assistente e `done` com o mesmo JSON da rota normal.
+        """
+        data = request.get_json(silent=True) or {}
+        user_msg = str(data.get("message") or "")
+        user_id = str(data.get("user_id") or "default_user")
+
+        def events():
+            yield "meta", {"user_id": user_id, "assistant": _assistant_impl(services.get("assistant"))}
+            if user_msg.strip():
+                triage = services.get("phase2_triage").triage(user_msg.strip())
+                yield "triage", {"risk": triage.risk, "diagnosis": triage.diagnosis}
+                vitals = extract_vitals(user_msg)
+                if vitals:
+                    yield "vitals", vitals
+            # Watson/local respondem a mensagem inteira de uma vez: um único `token`.
+            payload = assistant_reply(user_msg, user_id)
+            yield "token", {"text": payload["response"]}
+            yield "done", payload
+
+        return event_stream(events())
 
     @app.post("/api/phase2/triage")
     def phase2_triage():
@@ -176,7 +411,7 @@ def create_app() -> Flask:
         if not text.strip():
             return jsonify({"error": "Texto nao informado."}), 400
 
-        svc: Phase2TriageService = app.config["phase2_triage"]
+        svc: Phase2TriageService = services.get("phase2_triage")
         triage = svc.triage(text.strip())
         return jsonify(
             {
@@ -197,33 +432,53 @@ def create_app() -> Flask:
         if not text.strip():
             return jsonify({"error": "Texto nao informado."}), 400
 
-        svc: ClinicalExtractionService = app.config["clinical_extraction"]
+        svc: ClinicalExtractionService = services.get("clinical_extraction")
         result = svc.extract(text.strip())
-        return jsonify(
-            {
-                "source": result.source,
-                "summary": result.summary,
-                "structured": result.structured,
-                "triage": result.triage,
-            }
-        )
+        return jsonify(_extraction_payload(result))
+
+    @app.post("/api/clinical/extract/stream")
+    def clinical_extract_stream():
+        """
+        Versão SSE de `/api/clinical/extract`: `meta`, `triage` e `vitals` locais primeiro,
+        `token` com os trechos do Gemini conforme chegam e `done` com o resultado completo.
+        """
+        data = request.get_json(silent=True) or {}
+        text = str(data.get("text") or data.get("message") or "")
+        if not text.strip():
+            return jsonify({"error": "Texto nao informado."}), 400
+
+        svc: ClinicalExtractionService = services.get("clinical_extraction")
+
+        def events():
+            yield "meta", {"gemini": svc.gemini_available()}
+            for kind, value in svc.extract_stream(text.strip()):
+                yield kind, _extraction_payload(value) if kind == "done" else value
+
+        return event_stream(events())
 
     @app.get("/api/monitor/logs")
     def monitor_logs():
         """
         Ir Alem 2: leitura dos logs gerados pelo robo (NoSQL em JSON).
         """
-        adapter: AutomationAdapter = app.config["automation"]
-        return jsonify({"logs": adapter.read_logs()})
+        adapter: AutomationAdapter = services.get("automation")
+        try:
+            return jsonify({"logs": adapter.read_logs()})
+        except ValueError as e:
+            return jsonify({"logs": [], "error": str(e)}), 500
 
     @app.post("/api/monitor/run_once")
     def monitor_run_once():
         """
         Ir Alem 2: roda um ciclo do robo e retorna logs atualizados.
         """
-        adapter: AutomationAdapter = app.config["automation"]
+        adapter: AutomationAdapter = services.get("automation")
         result = adapter.run_once()
-        return jsonify({**result, "logs": adapter.read_logs()})
+        try:
+            logs = adapter.read_logs()
+        except ValueError as e:
+            return jsonify({**result, "ok": False, "error": str(e), "logs": []}), 500
+        return jsonify({**result, "logs": logs})
 
     @app.post("/api/phase3/vitals")
     def phase3_vitals():
@@ -238,20 +493,66 @@ def create_app() -> Flask:
 
         # payload compativel com a Fase 3 (rest_alerts.py)
         payload = {"ts": data.get("ts"), "temp": temp, "hum": data.get("hum"), "bpm": bpm}
+        # Com `patient_id`, a leitura tambem entra na serie temporal do paciente.
+        if data.get("patient_id") is not None:
+            store: VitalsStore = services.get("vitals_store")
+            try:
+                # Como na ponte MQTT: `ts` ausente ou de uptime do ESP32 (`millis()/1000`) vale a hora de chegada.
+                store.append(data["patient_id"], [{**payload, "ts": device_time_ms(payload["ts"], time.time())}])
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
         external = try_post_phase3(payload)
         if external is not None:
             return jsonify({"source": "fase3_service", "result": external})
 
+        return jsonify({"source": "local_rules", "result": risk_check_local(_number(temp), _number(bpm))})
+
+    @app.get("/api/patients/<patient_id>/vitals")
+    def patient_vitals(patient_id: str):
+        """
+        Serie temporal de sinais vitais do paciente.
+        Query: `start`/`end` (epoch ou ISO 8601; padrao: ultimas 24h), `resolution` (`auto`, `raw`,
+        `60`, `5m`, `1h`...), `agg` (min,max,mean,count) e `fields`. Intervalos longos voltam em
+        buckets (min/max/media), nunca como pontos crus; `t` em epoch ms.
+        """
+        store: VitalsStore = services.get("vitals_store")
+        args = request.args
         try:
-            temp_f = float(temp) if temp is not None else None
-        except Exception:
-            temp_f = None
+            end = parse_time_ms(args["end"]) if args.get("end") else int(time.time() * 1000)
+            start = parse_time_ms(args["start"]) if args.get("start") else end - 86_400_000
+            result = store.query(
+                patient_id,
+                start,
+                end,
+                resolution_ms=parse_resolution_ms(args.get("resolution")),
+                aggs=[a for a in (args.get("agg") or ",".join(DEFAULT_AGGS)).split(",") if a.strip()],
+                fields=[f for f in (args.get("fields") or ",".join(FIELDS)).split(",") if f.strip()],
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(result)
+
+    @app.post("/api/patients/<patient_id>/vitals")
+    def patient_vitals_append(patient_id: str):
+        """
+        Grava leituras do paciente: uma leitura (`ts`, `systolic`, `diastolic`, `heart_rate`/`bpm`,
+        `temp`) ou `{"readings": [...]}` em lote. Devolve o risco (regra da Fase 3) das leituras com alerta.
+        """
+        data = request.get_json(silent=True)
+        readings = data.get("readings") if isinstance(data, dict) and "readings" in data else [data]
+        if not isinstance(readings, list) or not all(isinstance(r, dict) for r in readings):
+            return jsonify({"error": "Envie uma leitura (objeto) ou `readings` (lista de objetos)."}), 400
+        store: VitalsStore = services.get("vitals_store")
         try:
-            bpm_f = float(bpm) if bpm is not None else None
-        except Exception:
-            bpm_f = None
-
-        return jsonify({"source": "local_rules", "result": risk_check_local(temp_f, bpm_f)})
+            stored = store.append(patient_id, readings)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        alerts = []
+        for reading in readings:
+            risk = risk_check_local(_number(reading.get("temp")), _number(reading.get("heart_rate", reading.get("bpm"))))
+            if risk["alerts"]:
+                alerts.append({"ts": reading.get("ts"), **risk})
+        return jsonify({"stored": stored, "alerts": alerts}), 201
 
     @app.get("/api/phase4/health")
     def phase4_health():
@@ -266,5 +567,6 @@ def create_app() -> Flask:
 
 if __name__ == "__main__":
     print("Iniciando servidor Flask na porta 5000...")
-    app = create_app()
+    # Com o reloader, so' o processo filho (WERKZEUG_RUN_MAIN) atende; o pai apenas vigia os arquivos.
+    app = create_app(start_background=os.environ.get("WERKZEUG_RUN_MAIN") == "true")
     app.run(debug=True, port=5000)
@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker simples (closed -> open -> half_open -> closed).
+
+    - closed: chamadas liberadas; guarda as últimas `window` chamadas (erro/lentidão).
+    - open: após taxa de falhas >= `failure_rate`, bloqueia por `open_seconds`.
+    - half_open: libera até `half_open_probes` chamadas de teste; se todas derem certo, fecha.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        window: int = 20,
+        min_calls: int = 4,
+        slow_call_seconds: float = 4.0,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 2,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_rate = failure_rate
+        self.min_calls = max(1, min_calls)
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes: deque[bool] = deque(maxlen=max(1, window))  # True = falha
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.trips = 0
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreaker":
+        return cls(
+            failure_rate=_env_float("CARDIOIA_BREAKER_FAILURE_RATE", 0.5),
+            window=_env_int("CARDIOIA_BREAKER_WINDOW", 20),
+            min_calls=_env_int("CARDIOIA_BREAKER_MIN_CALLS", 4),
+            slow_call_seconds=_env_float("CARDIOIA_BREAKER_SLOW_CALL_S", 4.0),
+            open_seconds=_env_float("CARDIOIA_BREAKER_OPEN_S", 30.0),
+            half_open_probes=_env_int("CARDIOIA_BREAKER_HALF_OPEN_PROBES", 2),
+        )
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self) -> None:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+
+    def _trip(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self.trips += 1
+
+    def release(self) -> None:
+        """Devolve uma vaga de sonda sem registrar resultado (a chamada nem chegou ao servico)."""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes_in_flight > 0:
+                self._probes_in_flight -= 1
+
+    def allow_request(self) -> bool:
+        """Retorna True se a chamada pode ir para o serviço principal (reserva um probe no half_open)."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def record(self, ok: bool, elapsed_s: float = 0.0) -> None:
+        failed = (not ok) or elapsed_s > self.slow_call_seconds
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if failed:
+                    self._trip()
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._state = self.CLOSED
+                    self._outcomes.clear()
+                return
+
+            if self._state == self.OPEN:
+                # Resposta atrasada de uma chamada liberada antes de abrir: ignora.
+                return
+
+            self._outcomes.append(failed)
+            n = len(self._outcomes)
+            if n >= self.min_calls and sum(self._outcomes) / n >= self.failure_rate:
+                self._trip()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            self._maybe_half_open()
+            n = len(self._outcomes)
+            return {
+                "state": self._state,
+                "failure_rate": round(sum(self._outcomes) / n, 3) if n else 0.0,
+                "window_calls": n,
+                "trips": self.trips,
+            }
+
+
+@dataclass
+class _RoutedSession:
+    primary_id: str | None = None
+    fallback_id: str | None = None
+
+
+class FailoverAssistantService:
+    """
+    Roteia cada mensagem para o Watson (principal) ou para o modo LOCAL (fallback).
+
+    O backend continua enxergando um único `session_id` por usuário; por baixo, cada sessão
+    roteada guarda a sessão do Watson e a sessão local, criadas sob demanda. Assim a troca de
+    backend (e a volta) não quebra o mapeamento `user_id -> session_id` do app.
+    """
+
+    def __init__(self, primary: Any, fallback: Any, breaker: CircuitBreaker | None = None) -> None:
+        self.primary = primary
+        self.fallback = fallback
+        self.breaker = breaker or CircuitBreaker.from_env()
+        self._sessions: dict[str, _RoutedSession] = {}
+        self._lock = threading.Lock()
+        self.served = {"watson": 0, "local": 0}
+
+    # Mantém compatibilidade com `/api/status` (que lê esses atributos do assistente).
+    @property
+    def assistant_id(self) -> str | None:
+        return getattr(self.primary, "assistant_id", None)
+
+    @property
+    def environment_id(self) -> str | None:
+        return getattr(self.primary, "environment_id", None)
+
+    @property
+    def active_backend(self) -> str:
+        return "watson" if self.breaker.state == CircuitBreaker.CLOSED else "local"
+
+    @property
+    def skill_version(self) -> int:
+        return getattr(self.fallback, "skill_version", 0)
+
+    def cache_state(self, session_id: str) -> str | None:
+        """Escopo de cache do próximo turno, conforme o backend que deve atendê-lo."""
+        if self.breaker.state == CircuitBreaker.CLOSED:
+            return "watson"
+        with self._lock:
+            routed = self._sessions.get(session_id)
+        if routed is None or routed.fallback_id is None:
+            return "local:start"
+        fn = getattr(self.fallback, "cache_state", None)
+        return fn(routed.fallback_id) if fn is not None else None
+
+    def reload_skill(self) -> None:
+        reload = getattr(self.fallback, "reload_skill", None)
+        if reload is not None:
+            reload()
+
+    def create_session(self) -> str:
+        session_id = str(uuid.uuid4())
+        with self._lock:
+            self._sessions[session_id] = _RoutedSession()
+        return session_id
+
+    def _routed(self, session_id: str) -> _RoutedSession:
+        with self._lock:
+            routed = self._sessions.get(session_id)
+            if routed is None:
+                routed = self._sessions[session_id] = _RoutedSession()
+            return routed
+
+    def _call_primary(self, routed: _RoutedSession, message_text: str, user_id: str | None) -> dict[str, Any] | None:
+        """Chama o Watson e registra o resultado no breaker. Retorna None se precisar de fallback."""
+        started = time.perf_counter()
+        try:
+            if routed.primary_id is None:
+                routed.primary_id = self.primary.create_session()
+                if not routed.primary_id:
+                    self.breaker.record(False, time.perf_counter() - started)
+                    return None
+
+            resp = self.primary.send_message(routed.primary_id, message_text, user_id=user_id)
+
+            # Sessão expirada não é falha do serviço: recria e reenvia 1 vez.
+            if resp.get("error_type") == "invalid_session":
+                routed.primary_id = self.primary.create_session()
+                if not routed.primary_id:
+                    self.breaker.record(False, time.perf_counter() - started)
+                    return None
+                resp = self.primary.send_message(routed.primary_id, message_text, user_id=user_id)
+        except Exception as e:
+            print(f"Erro no Watson (roteador): {e}")
+            self.breaker.record(False, time.perf_counter() - started)
+            return None
+
+        # Teto local de chamadas a LLM cheio: o Watson nem foi chamado, entao nao conta como falha
+        # dele (senao a carga local abriria o circuito contra um Watson saudavel). O turno vai para o LOCAL.
+        if resp.get("error_type") == "overloaded":
+            self.breaker.release()
+            return None
+        ok = resp.get("error_type") not in ["service_error", "invalid_session"]
+        self.breaker.record(ok, time.perf_counter() - started)
+        return resp if ok else None
+
+    def send_message(self, session_id: str, message_text: str, user_id: str | None = None) -> dict[str, Any]:
+        """Resposta marcada com `backend` ("watson"/"local"): quem de fato atendeu o turno."""
+        routed = self._routed(session_id)
+
+        if self.breaker.allow_request():
+            resp = self._call_primary(routed, message_text, user_id)
+            if resp is not None:
+                self.served["watson"] += 1
+                return {**resp, "backend": "watson"}
+
+        if routed.fallback_id is None:
+            routed.fallback_id = self.fallback.create_session()
+        self.served["local"] += 1
+        return {**self.fallback.send_message(routed.fallback_id, message_text, user_id=user_id), "backend": "local"}
+
+    def stats(self) -> dict[str, Any]:
+        return {**self.breaker.snapshot(), "served": dict(self.served)}
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 import importlib.util
+import threading
 from pathlib import Path
 from typing import Any
 
+from backend.single_flight import single_flight
+
 
 class AutomationAdapter:
     """
@@ -16,12 +19,27 @@ class AutomationAdapter:
         self._repo_root = Path(__file__).resolve().parents[1]
         self._automation_dir = self._repo_root / "automation"
 
-        self._db_setup = self._load_module(self._automation_dir / "database_setup.py", "cardioia_db_setup")
-        self._rpa = self._load_module(self._automation_dir / "rpa_monitor.py", "cardioia_rpa_monitor")
+        # Modulos carregados sob demanda: `rpa_monitor.py` pode importar o SDK do Gemini.
+        self._modules: dict[str, Any] = {}
+        self._modules_lock = threading.Lock()
 
         self.db_path = self._automation_dir / "data" / "patients.db"
         self.log_path = self._automation_dir / "data" / "logs.json"
 
+    def _module(self, filename: str, name: str):
+        with self._modules_lock:
+            if name not in self._modules:
+                self._modules[name] = self._load_module(self._automation_dir / filename, name)
+            return self._modules[name]
+
+    @property
+    def _db_setup(self):
+        return self._module("database_setup.py", "cardioia_db_setup")
+
+    @property
+    def _rpa(self):
+        return self._module("rpa_monitor.py", "cardioia_rpa_monitor")
+
     @staticmethod
     def _load_module(path: Path, name: str):
         if not path.exists():
@@ -44,9 +62,13 @@ class AutomationAdapter:
         except Exception:
             return False
 
+    @single_flight("automation_run_once", key=lambda self: self)
     def run_once(self) -> dict[str, Any]:
         """
         Roda um ciclo do robo e retorna um resumo (nao retorna logs inteiros).
+
+        Disparos simultaneos no processo entram no ciclo ja em andamento; entre processos o
+        `cycle_lock()` do `rpa_monitor.py` coloca os ciclos em fila.
         """
         ok = self.ensure_db()
         if not ok:
@@ -54,18 +76,16 @@ class AutomationAdapter:
         if self._rpa is None:
             return {"ok": False, "error": "Modulo de automacao (rpa_monitor.py) nao encontrado."}
         try:
-            self._rpa.run_rpa_cycle()
-            return {"ok": True}
+            summary = self._rpa.run_rpa_cycle()
+            return {"ok": True, **(summary or {})}
         except Exception as e:
             return {"ok": False, "error": str(e)}
 
     def read_logs(self) -> list[dict[str, Any]]:
-        if not self.log_path.exists():
-            return []
-        try:
-            import json
-
-            return json.loads(self.log_path.read_text(encoding="utf-8"))
-        except Exception:
+        """
+        Logs gravados pelo robo (`rpa_monitor.load_logs`). Arquivo ausente e' lista vazia; arquivo
+        ilegivel levanta ValueError (o robo grava de forma atomica, entao isso indica dano real).
+        """
+        if self._rpa is None:
             return []
-
+        return self._rpa.load_logs(str(self.log_path))
@@ -2,11 +2,17 @@ from __future__ import annotations
 
 import json
 import os
-import re
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Optional
+from typing import Any, Iterable, Iterator, Optional
 
+from backend.extraction_cache import ExtractionCache, cache_key, normalize_for_cache
+from backend.metrics import dependency_call
 from backend.phase2_triage import Phase2TriageService
+from backend.rate_limit import llm_slot
+from backend.single_flight import single_flight
+from backend.text_normalization import normalize, normalize_many
+from backend.vitals_extractor import extract_vitals
 
 
 def _extract_json_blob(text: str) -> str | None:
@@ -34,35 +40,101 @@ def _try_parse_json(text: str) -> dict[str, Any] | None:
             return None
 
 
-def _extract_vitals_simple(text: str) -> dict[str, Any]:
-    """
-    Extracao simples via regex (sem LLM):
-    - PA: 150/95
-    - FC: 88bpm, 88 bpm, fc 88
-    - Temp: 38.2, 38,2, 38 C
-    """
-    t = (text or "")
-
-    vitals: dict[str, Any] = {}
+def _try_parse_json_array(text: str) -> list[Any] | None:
+    if not text:
+        return None
+    try:
+        data = json.loads(text)
+    except Exception:
+        start = text.find("[")
+        end = text.rfind("]")
+        if start == -1 or end == -1 or end <= start:
+            return None
+        try:
+            data = json.loads(text[start : end + 1])
+        except Exception:
+            return None
+    return data if isinstance(data, list) else None
 
-    m = re.search(r"\b(\d{2,3})\s*/\s*(\d{2,3})\b", t)
-    if m:
-        vitals["pressao_arterial"] = f"{m.group(1)}/{m.group(2)}"
 
-    m = re.search(r"\b(?:fc|frequencia cardiaca|bpm)\s*[:=]?\s*(\d{2,3})\b", t, re.I)
-    if m:
-        vitals["frequencia_cardiaca_bpm"] = int(m.group(1))
-    else:
-        m = re.search(r"\b(\d{2,3})\s*bpm\b", t, re.I)
-        if m:
-            vitals["frequencia_cardiaca_bpm"] = int(m.group(1))
+def _parse_batch_response(text: str, expected_ids: set[str]) -> dict[str, dict[str, Any]]:
+    """
+    Valida a resposta em lote elemento a elemento (mesmas regras de `_try_parse_json`).
+    Retorna apenas os ids validos; os ausentes/invalidos sao reprocessados pelo chamador.
+    """
+    out: dict[str, dict[str, Any]] = {}
+    for element in _try_parse_json_array(text) or []:
+        if not isinstance(element, dict):
+            continue
+        item_id = str(element.get("id") or "")
+        if item_id not in expected_ids or item_id in out:
+            continue
+        data = element.get("dados")
+        if isinstance(data, str):
+            data = _try_parse_json(data)
+        if isinstance(data, dict):
+            out[item_id] = data
+    return out
 
-    m = re.search(r"\b(?:temp|temperatura)\s*[:=]?\s*(\d{2})(?:[\\.,](\d))?\s*(?:c|°c)?\b", t, re.I)
-    if m:
-        dec = m.group(2) or "0"
-        vitals["temperatura_c"] = float(f"{m.group(1)}.{dec}")
 
-    return vitals
+def _extract_vitals_simple(text: str) -> dict[str, Any]:
+    """
+    Extracao simples via regex (sem LLM), numa unica varredura (ver `backend/vitals_extractor.py`):
+    - PA: 150/95, 150x95, 150 por 95 mmHg
+    - FC: 88bpm, 88 bpm, fc 88, pulso de 88, 88 batimentos
+    - Temp: 38.2, 38,2, 38 C, febre de 38,5 °C, 101 °F
+    """
+    return extract_vitals(text)
+
+
+# Versao do prompt: entra na chave do cache de extracoes (mudou o prompt -> cache novo).
+PROMPT_VERSION = "v1"
+
+
+_FIELDS_SPEC = (
+    "  queixa_principal: string|null\n"
+    "  sintomas: array<string>\n"
+    "  duracao: string|null\n"
+    "  sinais_vitais: {pressao_arterial:string|null, frequencia_cardiaca_bpm:number|null, temperatura_c:number|null}\n"
+    "  historico: array<string>\n"
+    "  medicamentos: array<string>\n"
+    "  alergias: array<string>\n"
+    "  red_flags: array<string>\n"
+    "  perguntas_de_seguimento: array<string>\n\n"
+)
+
+# Delimitadores das notas no prompt em lote (o texto do paciente nao pode "fechar" a nota).
+_NOTE_OPEN = "<<<nota id={id}>>>"
+_NOTE_CLOSE = "<<<fim>>>"
+
+
+def _build_prompt(user_text: str) -> str:
+    return (
+        "Voce e' um assistente clinico. Extraia informacoes do texto do paciente e devolva APENAS JSON valido.\n\n"
+        "Regras:\n"
+        "- Responda somente com JSON (sem markdown, sem texto antes/depois).\n"
+        "- Se algum campo nao existir no texto, use null.\n"
+        "- Campos:\n"
+        + _FIELDS_SPEC
+        + f"Texto do paciente:\n{user_text.strip()}\n"
+    )
+
+
+def _build_batch_prompt(items: list[tuple[str, str]]) -> str:
+    """Empacota varias notas num unico prompt: as instrucoes sao pagas uma vez so."""
+    notes = "".join(
+        f"{_NOTE_OPEN.format(id=item_id)}\n{text.strip().replace('<<<', '<< <')}\n{_NOTE_CLOSE}\n" for item_id, text in items
+    )
+    return (
+        "Voce e' um assistente clinico. Para CADA nota abaixo, extraia informacoes do texto do paciente.\n\n"
+        "Regras:\n"
+        "- Responda somente com um array JSON valido (sem markdown, sem texto antes/depois).\n"
+        '- Um elemento por nota, no formato {"id": "<id da nota>", "dados": {...}}.\n'
+        "- Se algum campo nao existir no texto, use null.\n"
+        "- Campos de `dados`:\n"
+        + _FIELDS_SPEC
+        + f"Notas:\n{notes}"
+    )
 
 
 @dataclass(frozen=True)
@@ -74,10 +146,21 @@ class ClinicalExtractionResult:
 
 
 class GeminiClinicalExtractor:
-    def __init__(self) -> None:
+    def __init__(self, model: Any | None = None, model_name: str | None = None) -> None:
+        """
+        `model` permite injetar um modelo compativel com `generate_content` (ex.: `FakeGeminiModel`
+        para testes/backfill offline); sem ele, o modelo vem do Gemini configurado no .env.
+        """
         self._api_key = (os.getenv("GEMINI_API_KEY") or "").strip()
         self._model_name = (os.getenv("GEMINI_MODEL") or "").strip()
         self._model = None
+        self._cache: ExtractionCache | None = None
+
+        if model is not None:
+            self._model = model
+            self._model_name = model_name or getattr(model, "model_name", None) or "custom"
+            self._cache = self._build_cache()
+            return
 
         if not self._api_key:
             return
@@ -106,6 +189,31 @@ class GeminiClinicalExtractor:
             # Deixa para o caller cair no fallback local.
             pass
 
+        if self._model is not None:
+            self._cache = self._build_cache()
+
+    @staticmethod
+    def _build_cache() -> ExtractionCache | None:
+        if (os.getenv("CARDIOIA_EXTRACTION_CACHE") or "1").strip().lower() in ["0", "false", "no", "off"]:
+            return None
+        repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+        path = (os.getenv("CARDIOIA_EXTRACTION_CACHE_PATH") or "").strip() or os.path.join(
+            repo_root, "backend", "data", "extraction_cache.db"
+        )
+        try:
+            max_entries = int(os.getenv("CARDIOIA_EXTRACTION_CACHE_MAX") or 5000)
+        except ValueError:
+            max_entries = 5000
+        try:
+            return ExtractionCache(path, max_entries=max_entries)
+        except Exception as e:
+            # Cache e' otimizacao: sem ele a extracao continua funcionando.
+            print(f"Cache de extracao indisponivel: {e}")
+            return None
+
+    def cache_stats(self) -> dict[str, Any] | None:
+        return self._cache.stats() if self._cache is not None else None
+
     def available(self) -> bool:
         return self._model is not None
 
@@ -113,41 +221,148 @@ class GeminiClinicalExtractor:
         if not self._model:
             return None, None
 
-        prompt = (
-            "Voce e' um assistente clinico. Extraia informacoes do texto do paciente e devolva APENAS JSON valido.\n\n"
-            "Regras:\n"
-            "- Responda somente com JSON (sem markdown, sem texto antes/depois).\n"
-            "- Se algum campo nao existir no texto, use null.\n"
-            "- Campos:\n"
-            "  queixa_principal: string|null\n"
-            "  sintomas: array<string>\n"
-            "  duracao: string|null\n"
-            "  sinais_vitais: {pressao_arterial:string|null, frequencia_cardiaca_bpm:number|null, temperatura_c:number|null}\n"
-            "  historico: array<string>\n"
-            "  medicamentos: array<string>\n"
-            "  alergias: array<string>\n"
-            "  red_flags: array<string>\n"
-            "  perguntas_de_seguimento: array<string>\n\n"
-            f"Texto do paciente:\n{user_text.strip()}\n"
-        )
+        key = cache_key(user_text, self._model_name, PROMPT_VERSION)
+        if self._cache is not None:
+            found, cached = self._cache.get(key)
+            if found:
+                return cached, None
 
+        prompt = _build_prompt(user_text)
         try:
-            resp = self._model.generate_content(prompt)
+            with llm_slot("gemini"), dependency_call("gemini", "extract"):
+                resp = self._model.generate_content(prompt)
             txt = (getattr(resp, "text", None) or "").strip()
             data = _try_parse_json(txt)
-            return data, txt
         except Exception:
+            # Erro de rede/quota nao entra no cache (pode ser transitorio).
             return None, None
 
+        if self._cache is not None:
+            # Falha de parse vira cache negativo (com TTL curto).
+            self._cache.put(key, data if isinstance(data, dict) else None)
+        return data, txt
+
+    def extract_stream(self, user_text: str) -> Iterator[tuple[str, Any]]:
+        """
+        Versao em streaming de `extract`: produz ("token", trecho) conforme o Gemini responde
+        e termina sempre com ("result", dados ou None). Acerto de cache vai direto ao resultado.
+        """
+        if not self._model:
+            yield "result", None
+            return
+
+        key = cache_key(user_text, self._model_name, PROMPT_VERSION)
+        if self._cache is not None:
+            found, cached = self._cache.get(key)
+            if found:
+                yield "result", cached
+                return
+
+        parts: list[str] = []
+        try:
+            with llm_slot("gemini"), dependency_call("gemini", "extract_stream"):
+                for chunk in self._model.generate_content(_build_prompt(user_text), stream=True):
+                    piece = getattr(chunk, "text", None) or ""
+                    if piece:
+                        parts.append(piece)
+                        yield "token", piece
+        except Exception:
+            # Mesmo criterio de `extract`: erro de transporte nao entra no cache.
+            yield "result", None
+            return
+
+        data = _try_parse_json("".join(parts).strip())
+        if self._cache is not None:
+            self._cache.put(key, data if isinstance(data, dict) else None)
+        yield "result", data
+
+    def extract_many(
+        self, texts: Iterable[str], batch_size: int = 8, max_workers: int = 4
+    ) -> list[dict[str, Any] | None]:
+        """
+        Extracao em lote para backfill: empacota ate `batch_size` notas por chamada ao LLM.
+
+        - Resultado alinhado com a entrada (None = sem extracao; o chamador faz o fallback local).
+        - Cache consultado antes; textos repetidos no lote viram uma unica nota.
+        - Notas com elemento ausente/invalido na resposta sao re-divididas ate chegar na
+          extracao individual (`extract`).
+        - `max_workers` limita quantos lotes rodam em paralelo.
+        """
+        texts = [(t or "").strip() for t in texts]
+        results: list[dict[str, Any] | None] = [None] * len(texts)
+        if not self._model:
+            return results
+
+        pending: dict[str, list[int]] = {}  # texto -> posicoes na entrada
+        for i, text in enumerate(texts):
+            if not text:
+                continue
+            if self._cache is not None:
+                found, cached = self._cache.get(cache_key(text, self._model_name, PROMPT_VERSION))
+                if found:
+                    results[i] = cached
+                    continue
+            pending.setdefault(text, []).append(i)
+
+        unique = list(pending)
+        size = max(1, batch_size)
+        batches = [unique[i : i + size] for i in range(0, len(unique), size)]
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            for done in pool.map(self._extract_batch, batches):
+                for text, data in done.items():
+                    for i in pending[text]:
+                        results[i] = data
+        return results
+
+    def _extract_batch(self, batch: list[str]) -> dict[str, dict[str, Any] | None]:
+        if len(batch) == 1:
+            return {batch[0]: self.extract(batch[0])[0]}
+
+        ids = {f"n{i}": text for i, text in enumerate(batch)}
+        try:
+            with llm_slot("gemini"), dependency_call("gemini", "extract_batch"):
+                resp = self._model.generate_content(_build_batch_prompt(list(ids.items())))  # type: ignore[union-attr]
+            txt = (getattr(resp, "text", None) or "").strip()
+        except Exception:
+            # Falha de transporte vale para o lote inteiro: nao multiplica chamadas durante um incidente.
+            return {text: None for text in batch}
+
+        parsed = _parse_batch_response(txt, set(ids))
+        out: dict[str, dict[str, Any] | None] = {}
+        for item_id, data in parsed.items():
+            out[ids[item_id]] = data
+            if self._cache is not None:
+                self._cache.put(cache_key(ids[item_id], self._model_name, PROMPT_VERSION), data)
+
+        failed = [text for item_id, text in ids.items() if item_id not in parsed]
+        if failed:
+            if len(failed) == 1:
+                out.update(self._extract_batch(failed))
+            else:
+                half = (len(failed) + 1) // 2
+                out.update(self._extract_batch(failed[:half]))
+                out.update(self._extract_batch(failed[half:]))
+        return out
+
 
 class ClinicalExtractionService:
-    def __init__(self) -> None:
-        self._triage = Phase2TriageService()
-        self._gemini = GeminiClinicalExtractor()
+    def __init__(self, gemini: GeminiClinicalExtractor | None = None, triage: Phase2TriageService | None = None) -> None:
+        # `triage` permite compartilhar o motor da Fase 2 ja carregado (ver `backend/services.py`).
+        self._triage = triage or Phase2TriageService()
+        self._gemini = gemini or GeminiClinicalExtractor()
+
+    def cache_stats(self) -> dict[str, Any] | None:
+        return self._gemini.cache_stats()
+
+    def gemini_available(self) -> bool:
+        return self._gemini.available()
 
+    # Retentativas do frontend / a mesma anamnese aberta por varios profissionais: requisicoes
+    # simultaneas com o mesmo texto (mesma normalizacao do cache do Gemini) viram uma so extracao.
+    @single_flight("clinical_extract", key=lambda self, text: (self, normalize_for_cache(text)))
     def extract(self, text: str) -> ClinicalExtractionResult:
         raw = (text or "").strip()
-        triage = self._triage.triage(raw)
+        triage = self._triage.triage(normalize(raw))
         triage_payload = {"risk": triage.risk, "diagnosis": triage.diagnosis}
 
         if self._gemini.available() and raw:
@@ -161,6 +376,64 @@ class ClinicalExtractionService:
                     triage=triage_payload,
                 )
 
+        return self._local_result(raw, triage_payload)
+
+    def extract_stream(self, text: str) -> Iterator[tuple[str, Any]]:
+        """
+        Versao em streaming de `extract` (eventos para SSE), do mais rapido para o mais lento:
+        ("triage", ...) e ("vitals", ...) locais, ("token", {"text": ...}) do Gemini e, por fim,
+        ("done", ClinicalExtractionResult) com o mesmo resultado de `extract`.
+        """
+        raw = (text or "").strip()
+        triage = self._triage.triage(normalize(raw))
+        triage_payload = {"risk": triage.risk, "diagnosis": triage.diagnosis}
+        yield "triage", triage_payload
+        yield "vitals", _extract_vitals_simple(raw)
+
+        structured = None
+        if self._gemini.available() and raw:
+            for kind, value in self._gemini.extract_stream(raw):
+                if kind == "token":
+                    yield "token", {"text": value}
+                else:
+                    structured = value
+
+        if structured is not None:
+            yield "done", ClinicalExtractionResult(
+                source="gemini",
+                summary=self._build_summary(structured, triage_payload),
+                structured=structured,
+                triage=triage_payload,
+            )
+            return
+        yield "done", self._local_result(raw, triage_payload)
+
+    def extract_many(self, texts: Iterable[str], batch_size: int = 8, max_workers: int = 4) -> list[ClinicalExtractionResult]:
+        """Versao em lote de `extract` (backfill de notas): Gemini em lotes + fallback local por nota."""
+        raws = [(t or "").strip() for t in texts]
+        structured_list: list[dict[str, Any] | None] = [None] * len(raws)
+        if self._gemini.available():
+            structured_list = self._gemini.extract_many(raws, batch_size=batch_size, max_workers=max_workers)
+
+        results = []
+        for nt, structured in zip(normalize_many(raws), structured_list):
+            raw = nt.raw
+            triage = self._triage.triage(nt)
+            triage_payload = {"risk": triage.risk, "diagnosis": triage.diagnosis}
+            if structured is not None:
+                results.append(
+                    ClinicalExtractionResult(
+                        source="gemini",
+                        summary=self._build_summary(structured, triage_payload),
+                        structured=structured,
+                        triage=triage_payload,
+                    )
+                )
+            else:
+                results.append(self._local_result(raw, triage_payload))
+        return results
+
+    def _local_result(self, raw: str, triage_payload: dict[str, Any]) -> ClinicalExtractionResult:
         # Fallback local: regex + triagem (Fase 2)
         vitals = _extract_vitals_simple(raw)
         structured = {
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Callable
+
+
+def normalize_for_cache(text: str) -> str:
+    """Normalização conservadora: NFC + espaços colapsados (não altera o conteúdo clínico)."""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+def cache_key(text: str, model_name: str, prompt_version: str) -> str:
+    h = hashlib.sha256()
+    for part in (normalize_for_cache(text), model_name or "", prompt_version or ""):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Cache persistente (SQLite) das extrações do Gemini, endereçado por conteúdo.
+
+    - Chave: sha256(texto normalizado, modelo, versão do prompt).
+    - Limite de tamanho: remove as entradas menos acessadas quando passa de `max_entries`. O
+      `last_access` so' e' regravado num acerto se tiver mais de `touch_interval_seconds`: acertos
+      seguidos ficam so' na leitura, sem disputar a trava de escrita do SQLite entre os workers.
+    - Cache negativo: falhas de parse ficam guardadas por `negative_ttl_seconds`
+      (evita pagar o LLM de novo para o mesmo texto problemático).
+    - Uma conexão por processo, aberta no primeiro uso: o serviço pode ser pré-carregado no master
+      do gunicorn e uma conexão SQLite não atravessa o fork. O arquivo é compartilhado pelos
+      workers; os contadores de acerto/erro são do processo.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_entries: int = 5000,
+        negative_ttl_seconds: float = 600.0,
+        touch_interval_seconds: float = 60.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = Path(path)
+        self.max_entries = max(1, max_entries)
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.touch_interval_seconds = max(0.0, touch_interval_seconds)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        self._conn: sqlite3.Connection | None = None
+        self._pid = 0
+        self._inherited: list[sqlite3.Connection] = []
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS extractions (
+                    key TEXT PRIMARY KEY,
+                    payload TEXT,
+                    negative INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_access ON extractions(last_access)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # Chamado com `_lock`. Conexao herdada do pai (fork) fica guardada sem uso e sem fechar.
+        if self._conn is None or self._pid != os.getpid():
+            if self._conn is not None:
+                self._inherited.append(self._conn)
+            self._conn = self._connect()
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> tuple[bool, dict[str, Any] | None]:
+        """Retorna (encontrado, valor). Valor None com encontrado=True é um cache negativo."""
+        now = self._clock()
+        with self._lock:
+            db = self._db
+            row = db.execute(
+                "SELECT payload, negative, created_at, last_access FROM extractions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return False, None
+            payload, negative, created_at, last_access = row
+            if negative and now - created_at >= self.negative_ttl_seconds:
+                db.execute("DELETE FROM extractions WHERE key = ?", (key,))
+                db.commit()
+                self.misses += 1
+                return False, None
+            if now - last_access >= self.touch_interval_seconds:
+                db.execute("UPDATE extractions SET last_access = ? WHERE key = ?", (now, key))
+                db.commit()
+            if negative:
+                self.negative_hits += 1
+                return True, None
+            try:
+                value = json.loads(payload)
+            except (TypeError, json.JSONDecodeError):
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            return True, value
+
+    def put(self, key: str, value: dict[str, Any] | None) -> None:
+        now = self._clock()
+        payload = None if value is None else json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            db = self._db
+            exists = db.execute("SELECT 1 FROM extractions WHERE key = ?", (key,)).fetchone() is not None
+            db.execute(
+                "INSERT OR REPLACE INTO extractions (key, payload, negative, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, 1 if value is None else 0, now, now),
+            )
+            self.stores += 1
+            if not exists:
+                # Contagem lida do arquivo (outros workers tambem inserem); so em chave nova, que
+                # acabou de custar uma chamada ao LLM.
+                excess = db.execute("SELECT COUNT(*) FROM extractions").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    db.execute(
+                        "DELETE FROM extractions WHERE key IN (SELECT key FROM extractions ORDER BY last_access ASC LIMIT ?)",
+                        (excess,),
+                    )
+                    self.evictions += excess
+            db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM extractions")
+            self._db.commit()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            entries = self._db.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+            return {
+                "path": str(self.path),
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
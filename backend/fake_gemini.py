@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from backend.vitals_extractor import extract_vitals
+
+
+_NOTE_RE = re.compile(r"<<<nota id=([^>]+)>>>\n(.*?)\n<<<fim>>>", re.S)
+_SINGLE_MARKER = "Texto do paciente:\n"
+_SYMPTOMS = ["dor no peito", "falta de ar", "tontura", "palpitacoes", "nausea", "suor frio", "cansaco", "febre"]
+_RED_FLAGS = {"dor no peito", "falta de ar", "suor frio"}
+_STREAM_CHUNK = 24
+
+
+@dataclass
+class _FakeResponse:
+    text: str
+
+
+class FakeGeminiModel:
+    """
+    Modelo falso com a mesma interface usada do Gemini (`generate_content(prompt).text`).
+
+    Serve para testes e backfill offline: entende o prompt individual e o prompt em lote
+    (`_build_batch_prompt`), extrai vitais por regex e sintomas por palavra-chave.
+    - `latency_s`: simula o tempo de ida e volta ao LLM.
+    - `drop_ids`: ids de nota omitidos na resposta em lote (forca re-divisao).
+    - `malformed`: devolve texto sem JSON (falha de parse).
+    - `generate_content(..., stream=True)` devolve a resposta em pedacos, como o SDK.
+    """
+
+    model_name = "fake-gemini"
+
+    def __init__(self, latency_s: float = 0.0, drop_ids: set[str] | None = None, malformed: bool = False) -> None:
+        self.latency_s = latency_s
+        self.drop_ids = set(drop_ids or ())
+        self.malformed = malformed
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_chars = 0
+
+    @staticmethod
+    def _extract(text: str) -> dict[str, Any]:
+        low = text.lower()
+        sintomas = [s for s in _SYMPTOMS if s in low]
+        vitals = extract_vitals(text)
+        return {
+            "queixa_principal": sintomas[0] if sintomas else None,
+            "sintomas": sintomas,
+            "duracao": None,
+            "sinais_vitais": {
+                "pressao_arterial": vitals.get("pressao_arterial"),
+                "frequencia_cardiaca_bpm": vitals.get("frequencia_cardiaca_bpm"),
+                "temperatura_c": vitals.get("temperatura_c"),
+            },
+            "historico": [],
+            "medicamentos": [],
+            "alergias": [],
+            "red_flags": [s for s in sintomas if s in _RED_FLAGS],
+            "perguntas_de_seguimento": [],
+        }
+
+    def generate_content(self, prompt: str, stream: bool = False) -> Any:
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += len(prompt)
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        resp = self._respond(prompt)
+        if not stream:
+            return resp
+        # Como o SDK com `stream=True`: iteravel de respostas parciais.
+        return (_FakeResponse(resp.text[i : i + _STREAM_CHUNK]) for i in range(0, len(resp.text), _STREAM_CHUNK))
+
+    def _respond(self, prompt: str) -> _FakeResponse:
+        if self.malformed:
+            return _FakeResponse("Desculpe, nao consegui processar o texto.")
+
+        notes = _NOTE_RE.findall(prompt)
+        if notes:
+            out = [{"id": i, "dados": self._extract(t)} for i, t in notes if i not in self.drop_ids]
+            return _FakeResponse(json.dumps(out, ensure_ascii=False))
+
+        text = prompt.split(_SINGLE_MARKER, 1)[-1]
+        return _FakeResponse(json.dumps(self._extract(text), ensure_ascii=False))
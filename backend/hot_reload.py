@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+from backend.metrics import METRICS
+
+METRICS.describe("cardioia_reload_duration_seconds", "histogram", "Duracao das recargas a quente (rebuild + validacao + troca).")
+METRICS.describe("cardioia_reloads_total", "counter", "Recargas a quente por alvo e resultado.")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def hot_reload_enabled() -> bool:
+    return os.getenv("CARDIOIA_HOT_RELOAD", "1").strip().lower() not in ("0", "false", "no")
+
+
+def _signature(paths: tuple[str, ...]) -> tuple[Any, ...]:
+    sig = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            sig.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            sig.append(None)
+    return tuple(sig)
+
+
+@dataclass
+class _Target:
+    name: str
+    paths: tuple[str, ...]
+    reload: Callable[[], Any]
+    signature: tuple[Any, ...]
+    reloads: int = 0
+    failures: int = 0
+    last_duration_ms: float | None = None
+    last_error: str | None = None
+    last_reload_at: str | None = None
+
+
+class HotReloader:
+    """
+    Recarga a quente de conteudo (export do skill, knowledge map da Fase 2).
+
+    Uma thread por processo verifica mtime/tamanho dos arquivos a cada `interval_s`. Ao notar
+    mudanca, espera o arquivo "assentar" (`settle_s`, para nao ler um arquivo pela metade) e chama
+    o `reload` do alvo, que reconstroi e valida a versao nova por fora e a troca numa unica
+    atribuicao; requisicoes em andamento seguem com a versao antiga. Falha na recarga mantem a
+    versao atual e so tenta de novo na proxima mudanca do arquivo.
+
+    A thread e' criada sob demanda (`ensure_started`, chamado a cada requisicao), entao com
+    gunicorn cada worker tem a sua depois do fork.
+    """
+
+    def __init__(self, interval_s: float | None = None, settle_s: float = 0.2) -> None:
+        self.interval_s = _env_float("CARDIOIA_HOT_RELOAD_INTERVAL_S", 2.0) if interval_s is None else interval_s
+        self.settle_s = settle_s
+        self._targets: dict[str, _Target] = {}
+        self._lock = threading.Lock()  # serializa recargas (poll x recarga forcada)
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+
+    def watch(self, name: str, paths: list[str] | tuple[str, ...], reload: Callable[[], Any]) -> None:
+        paths = tuple(str(p) for p in paths)
+        self._targets[name] = _Target(name=name, paths=paths, reload=reload, signature=_signature(paths))
+
+    def ensure_started(self) -> None:
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="cardioia-hot-reload", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval_s)
+            try:
+                self.check_once()
+            except Exception as e:
+                print(f"Hot reload: erro inesperado na verificacao: {e}")
+
+    def check_once(self) -> list[str]:
+        """Recarrega os alvos cujos arquivos mudaram. Retorna os nomes recarregados com sucesso."""
+        changed = []
+        for target in list(self._targets.values()):
+            sig = _signature(target.paths)
+            if sig == target.signature:
+                continue
+            if self.settle_s:
+                time.sleep(self.settle_s)
+                if _signature(target.paths) != sig:
+                    continue  # ainda sendo escrito: confere no proximo ciclo
+            if self._reload(target, sig):
+                changed.append(target.name)
+        return changed
+
+    def reload(self, name: str) -> bool:
+        """Recarga forcada (ex.: rota de admin), mesmo sem mudanca nos arquivos."""
+        target = self._targets[name]
+        return self._reload(target, _signature(target.paths))
+
+    def _reload(self, target: _Target, sig: tuple[Any, ...]) -> bool:
+        with self._lock:
+            started = time.perf_counter()
+            try:
+                target.reload()
+                ok = True
+                target.last_error = None
+            except Exception as e:
+                ok = False
+                target.last_error = f"{type(e).__name__}: {e}"
+                print(f"Hot reload de '{target.name}' falhou; mantendo a versao atual. {target.last_error}")
+            elapsed = time.perf_counter() - started
+            # Mesmo com falha a assinatura avanca: nao tenta de novo ate o arquivo mudar outra vez.
+            target.signature = sig
+            target.last_duration_ms = round(elapsed * 1000, 3)
+            target.last_reload_at = datetime.now(timezone.utc).isoformat()
+            if ok:
+                target.reloads += 1
+            else:
+                target.failures += 1
+        METRICS.observe("cardioia_reload_duration_seconds", elapsed, target=target.name)
+        METRICS.inc("cardioia_reloads_total", target=target.name, result="ok" if ok else "error")
+        return ok
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "interval_s": self.interval_s,
+            "running": bool(self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()),
+            "targets": {
+                t.name: {
+                    "reloads": t.reloads,
+                    "failures": t.failures,
+                    "last_duration_ms": t.last_duration_ms,
+                    "last_reload_at": t.last_reload_at,
+                    "last_error": t.last_error,
+                }
+                for t in self._targets.values()
+            },
+        }
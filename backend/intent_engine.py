@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import heapq
+import math
+import os
+from collections import Counter
+from typing import Iterable
+
+from backend.text_normalization import NormalizedText, normalize
+
+# Pontuacao minima para aceitar uma intencao (cosseno), calibrada no skill atual: "dor no peito forte"
+# e "falta de ar quando subo escada" passam; "dor nas costas" e "palpitacoes a noite" (~ "boa noite") nao.
+DEFAULT_MIN_SCORE = 0.4
+# Peso dos trigramas de caracteres em relacao as palavras: ajudam com erro de digitacao e flexao
+# ("palpitacoes" x "palpitacao") sem dominar o casamento de palavras inteiras.
+CHAR_NGRAM_WEIGHT = 0.5
+
+
+def intent_engine_name() -> str:
+    """`jaccard` (padrao, comparacao por exemplo) ou `tfidf` (`TfidfIntentEngine`)."""
+    return (os.getenv("CARDIOIA_INTENT_ENGINE") or "jaccard").strip().lower()
+
+
+def _features(tokens: Iterable[str]) -> Counter[str]:
+    feats: Counter[str] = Counter()
+    for tok in tokens:
+        feats["w:" + tok] += 1
+        padded = f"^{tok}$"
+        for i in range(len(padded) - 2):
+            feats["c:" + padded[i : i + 3]] += 1
+    return feats
+
+
+class TfidfIntentEngine:
+    """
+    Classificador de intencoes por TF-IDF esparso (palavras + trigramas de caracteres).
+
+    Os exemplos do skill viram, uma vez por versao do skill, uma matriz esparsa normalizada (L2)
+    guardada por coluna: indice invertido `feature -> [(linha, peso), ...]`. Classificar e' um
+    produto matriz-vetor esparso -- so as colunas das features da mensagem sao percorridas, entao o
+    custo acompanha os exemplos que compartilham alguma feature com ela, nao o tamanho do skill.
+    A pontuacao da intencao e' a do seu exemplo mais parecido (mesma ideia do Jaccard por exemplo).
+    """
+
+    def __init__(self, intents: dict[str, list[str]], min_score: float = DEFAULT_MIN_SCORE) -> None:
+        self.min_score = min_score
+        self.intent_names: list[str] = []
+        rows: list[tuple[int, Counter[str]]] = []
+        for name, examples in intents.items():
+            feats_list = [_features(normalize(ex).tokens) for ex in examples]
+            feats_list = [f for f in feats_list if f]
+            if not feats_list:
+                continue
+            self.intent_names.append(name)
+            rows.extend((len(self.intent_names) - 1, f) for f in feats_list)
+
+        n_rows = len(rows)
+        df: Counter[str] = Counter()
+        for _, feats in rows:
+            df.update(feats.keys())
+        # IDF suavizado; features que nao aparecem nos exemplos usam o maior IDF possivel (df = 0).
+        self._idf = {f: math.log((1 + n_rows) / (1 + d)) + 1.0 for f, d in df.items()}
+        self._oov_idf = math.log(1 + n_rows) + 1.0
+
+        self._row_intent: list[int] = []
+        self._postings: dict[str, list[tuple[int, float]]] = {}
+        for row, (intent, feats) in enumerate(rows):
+            weights = self._weights(feats)
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            self._row_intent.append(intent)
+            for f, w in weights.items():
+                self._postings.setdefault(f, []).append((row, w / norm))
+
+    @property
+    def n_examples(self) -> int:
+        return len(self._row_intent)
+
+    @property
+    def n_features(self) -> int:
+        return len(self._postings)
+
+    def _weights(self, feats: Counter[str]) -> dict[str, float]:
+        idf, oov = self._idf, self._oov_idf
+        return {
+            f: (1.0 + math.log(tf)) * idf.get(f, oov) * (CHAR_NGRAM_WEIGHT if f[0] == "c" else 1.0)
+            for f, tf in feats.items()
+        }
+
+    def scores(self, message: str | NormalizedText) -> dict[str, float]:
+        """Cosseno do exemplo mais parecido de cada intencao com pontuacao > 0."""
+        feats = _features(normalize(message).tokens)
+        if not feats or not self._row_intent:
+            return {}
+        weights = self._weights(feats)
+        # Features fora do vocabulario entram na norma: palavras desconhecidas diluem a similaridade.
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        acc: dict[int, float] = {}
+        postings = self._postings
+        for f, w in weights.items():
+            column = postings.get(f)
+            if column is None:
+                continue
+            w /= norm
+            for row, rw in column:
+                acc[row] = acc.get(row, 0.0) + w * rw
+
+        best: dict[str, float] = {}
+        names, row_intent = self.intent_names, self._row_intent
+        for row, score in acc.items():
+            name = names[row_intent[row]]
+            if score > best.get(name, 0.0):
+                best[name] = score
+        return best
+
+    def classify(self, message: str | NormalizedText, k: int = 3) -> list[tuple[str, float]]:
+        """Top-k intencoes (nome, pontuacao), da maior para a menor; sem corte por `min_score`."""
+        scores = self.scores(message)
+        return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], item[0]))
+
+    def best(self, message: str | NormalizedText) -> tuple[str | None, float]:
+        top = self.classify(message, k=1)
+        if not top or top[0][1] < self.min_score:
+            return None, top[0][1] if top else 0.0
+        return top[0]
+
+    def classify_many(self, messages: Iterable[str | NormalizedText], k: int = 3) -> list[list[tuple[str, float]]]:
+        """`classify` em lote (ex.: conversas registradas); mensagens com os mesmos tokens sao calculadas uma vez."""
+        memo: dict[tuple[str, ...], list[tuple[str, float]]] = {}
+        out = []
+        for message in messages:
+            text = normalize(message)
+            found = memo.get(text.tokens)
+            if found is None:
+                found = memo[text.tokens] = self.classify(text, k)
+            out.append(found)
+        return out
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+# Buckets (segundos) cobrindo desde o assistente local (~ms) ate Watson/Gemini (segundos).
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_LabelKey = tuple  # ((nome, valor), ...)
+
+
+def metrics_enabled() -> bool:
+    return os.getenv("CARDIOIA_METRICS", "1").strip().lower() not in ("0", "false", "no")
+
+
+class _Shard:
+    """Contadores de uma unica thread: so ela escreve, entao o caminho quente nao usa lock."""
+
+    __slots__ = ("thread", "counters", "hists")
+
+    def __init__(self, thread: threading.Thread | None) -> None:
+        self.thread = weakref.ref(thread) if thread is not None else None
+        self.counters: dict[tuple[str, _LabelKey], float] = {}
+        # hist = [contagem por bucket..., contagem acima do ultimo bucket, soma]
+        self.hists: dict[tuple[str, _LabelKey], list[float]] = {}
+
+    def alive(self) -> bool:
+        thread = self.thread() if self.thread is not None else None
+        return thread is not None and thread.is_alive()
+
+
+class Metrics:
+    """
+    Registro de metricas com agregacao por thread (shards), exportado em texto do Prometheus.
+
+    - `inc` / `observe` escrevem no shard da thread atual (sem lock; o GIL basta porque
+      cada shard tem um unico escritor).
+    - `render` soma os shards na hora da coleta. Shards de threads que ja terminaram (servidor
+      de desenvolvimento cria uma thread por requisicao) sao incorporados a um shard "aposentado".
+    - Cada processo tem o seu registro: com gunicorn, cada worker expoe os proprios numeros.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: list[_Shard] = []
+        self._retired = _Shard(None)
+        self._meta: dict[str, tuple[str, str]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        self._meta[name] = (kind, help_text)
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._retire_dead()
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        counters = self._shard().counters
+        key = (name, tuple(labels.items()))
+        counters[key] = counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        hists = self._shard().hists
+        key = (name, tuple(labels.items()))
+        hist = hists.get(key)
+        if hist is None:
+            hist = hists[key] = [0.0] * (len(self.buckets) + 2)
+        hist[bisect_left(self.buckets, value)] += 1
+        hist[-1] += value
+
+    @contextmanager
+    def time(self, name: str, **labels: Any) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def _retire_dead(self) -> None:
+        # Chamado com `_lock`; threads mortas nao escrevem mais, entao o merge e' seguro.
+        alive = []
+        for shard in self._shards:
+            if shard.alive():
+                alive.append(shard)
+            else:
+                _merge(self._retired, shard.counters, shard.hists)
+        self._shards = alive
+
+    def collect(self) -> tuple[dict[tuple[str, _LabelKey], float], dict[tuple[str, _LabelKey], list[float]]]:
+        """Soma de todos os shards (copias; pode estar levemente atrasada em relacao as escritas)."""
+        total = _Shard(None)
+        with self._lock:
+            self._retire_dead()
+            shards = [self._retired, *self._shards]
+            for shard in shards:
+                # `dict.copy` / `list[:]` sao atomicos sob o GIL.
+                hists = {k: v[:] for k, v in shard.hists.copy().items()}
+                _merge(total, shard.counters.copy(), hists)
+        return total.counters, total.hists
+
+    def reset(self) -> None:
+        with self._lock:
+            for shard in [self._retired, *self._shards]:
+                shard.counters.clear()
+                shard.hists.clear()
+
+    def render(self) -> str:
+        counters, hists = self.collect()
+        by_name: dict[str, list[tuple[_LabelKey, Any]]] = {}
+        for (name, labels), value in counters.items():
+            by_name.setdefault(name, []).append((labels, value))
+        for (name, labels), hist in hists.items():
+            by_name.setdefault(name, []).append((labels, hist))
+
+        hist_names = {name for name, _ in hists}
+        lines: list[str] = []
+        for name in sorted(by_name):
+            kind, help_text = self._meta.get(name, ("untyped", ""))
+            if name in hist_names:
+                kind = "histogram"
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(by_name[name], key=lambda item: item[0]):
+                if kind != "histogram":
+                    lines.append(f"{name}{_labels(labels)} {_num(value)}")
+                    continue
+                cumulative = 0.0
+                for bound, count in zip(self.buckets, value):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels, le=_num(bound))} {_num(cumulative)}")
+                cumulative += value[-2]
+                lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {_num(cumulative)}")
+                lines.append(f"{name}_sum{_labels(labels)} {_num(value[-1])}")
+                lines.append(f"{name}_count{_labels(labels)} {_num(cumulative)}")
+        return "\n".join(lines) + "\n"
+
+
+def _merge(into: _Shard, counters: dict, hists: dict) -> None:
+    for key, value in counters.items():
+        into.counters[key] = into.counters.get(key, 0.0) + value
+    for key, hist in hists.items():
+        target = into.hists.get(key)
+        if target is None:
+            into.hists[key] = list(hist)
+        else:
+            for i, value in enumerate(hist):
+                target[i] += value
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: _LabelKey, **extra: str) -> str:
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _num(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+METRICS = Metrics()
+METRICS.describe("cardioia_http_requests_total", "counter", "Requisicoes HTTP por rota, metodo e status.")
+METRICS.describe(
+    "cardioia_http_request_duration_seconds", "histogram", "Latencia das rotas (ate o envio dos cabecalhos)."
+)
+METRICS.describe(
+    "cardioia_dependency_call_duration_seconds", "histogram", "Latencia das chamadas a Watson, Gemini, Fase 3 e Fase 4."
+)
+METRICS.describe("cardioia_dependency_errors_total", "counter", "Chamadas a dependencias que falharam.")
+
+
+class DependencyCall:
+    """Permite marcar como erro uma chamada que nao levantou excecao (ex.: resposta invalida)."""
+
+    __slots__ = ("failed",)
+
+    def __init__(self) -> None:
+        self.failed = False
+
+    def fail(self) -> None:
+        self.failed = True
+
+
+@contextmanager
+def dependency_call(dependency: str, operation: str = "call") -> Iterator[DependencyCall]:
+    """
+    Mede uma chamada externa (`with dependency_call("gemini", "extract") as call: ...`).
+    Excecoes contam como erro e sao repassadas; `call.fail()` marca erros tratados no local.
+    """
+    call = DependencyCall()
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call.failed = True
+        raise
+    finally:
+        METRICS.observe(
+            "cardioia_dependency_call_duration_seconds",
+            time.perf_counter() - started,
+            dependency=dependency,
+            operation=operation,
+        )
+        if call.failed:
+            METRICS.inc("cardioia_dependency_errors_total", dependency=dependency, operation=operation)
+
+
+def instrument_app(app: Any, metrics: Metrics = METRICS) -> None:
+    """Conta e mede cada requisicao do Flask. A rota e' o padrao da URL (sem ids), para manter poucas series."""
+    from flask import g, request
+
+    @app.before_request
+    def _metrics_start() -> None:
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _metrics_record(response: Any) -> Any:
+        started = g.pop("_metrics_started", None)
+        if started is None:
+            return response
+        route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        metrics.inc("cardioia_http_requests_total", route=route, method=request.method, status=str(response.status_code))
+        metrics.observe(
+            "cardioia_http_request_duration_seconds",
+            time.perf_counter() - started,
+            route=route,
+            method=request.method,
+        )
+        return response
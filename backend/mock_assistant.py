@@ -3,29 +3,18 @@ from __future__ import annotations
 import json
 import os
 import re
-import unicodedata
+import struct
+import threading
+import time
 import uuid
+from array import array
+from collections import deque
 from dataclasses import dataclass
-from datetime import datetime, timezone
-from typing import Any
+from typing import Any, Callable, Iterable
 
-
-def _strip_accents_lower(s: str) -> str:
-    s = (s or "").strip().lower()
-    s = "".join(ch for ch in unicodedata.normalize("NFKD", s) if not unicodedata.combining(ch))
-    return re.sub(r"\s+", " ", s)
-
-
-def _tokenize(s: str) -> set[str]:
-    s = _strip_accents_lower(s)
-    s = re.sub(r"[^a-z0-9\s/:-]", " ", s)
-    return {t for t in s.split() if t}
-
-
-def _jaccard(a: set[str], b: set[str]) -> float:
-    if not a or not b:
-        return 0.0
-    return len(a & b) / max(1, len(a | b))
+from backend.intent_engine import TfidfIntentEngine, intent_engine_name
+from backend.skill_artifact import autobuild_enabled, default_artifact_path, read_artifact, write_artifact
+from backend.text_normalization import NormalizedText, normalize, tokenize
 
 
 def _extract_dialog_text(node: dict[str, Any]) -> str | None:
@@ -53,7 +42,815 @@ def _extract_dialog_text(node: dict[str, Any]) -> str | None:
 @dataclass
 class _SkillIndex:
     intents: dict[str, list[str]]
-    dialogs_by_condition: dict[str, dict[str, Any]]
+    # condição do dialog node -> texto da resposta (já extraído do `output` do export).
+    templates: dict[str, str]
+    # (intent, tokens) de cada exemplo, na ordem do export (desempate igual ao loop original).
+    example_tokens: tuple[tuple[str, frozenset[str]], ...] = ()
+
+    def to_payload(self) -> dict[str, Any]:
+        """Forma serializável do índice (artefato binário): tokens viram ids de um dicionário único."""
+        ids: dict[str, int] = {}
+        examples = tuple(
+            (name, tuple(ids.setdefault(tok, len(ids)) for tok in sorted(tokens))) for name, tokens in self.example_tokens
+        )
+        return {"intents": self.intents, "templates": self.templates, "tokens": tuple(ids), "examples": examples}
+
+    @classmethod
+    def from_payload(cls, payload: dict[str, Any]) -> _SkillIndex:
+        tokens = payload["tokens"]
+        example_tokens = tuple((name, frozenset(tokens[i] for i in tok_ids)) for name, tok_ids in payload["examples"])
+        return cls(intents=payload["intents"], templates=payload["templates"], example_tokens=example_tokens)
+
+
+class _KeywordAutomaton:
+    """
+    Aho-Corasick sobre o texto normalizado.
+
+    Uma única varredura devolve o conjunto de rótulos cujas palavras-chave aparecem no texto
+    (mesma semântica de `any(w in norm for w in lista)`, inclusive para substrings).
+    """
+
+    __slots__ = ("_delta", "_out")
+
+    def __init__(self, keywords: dict[str, Iterable[str]]) -> None:
+        trie: list[dict[str, int]] = [{}]
+        out: list[set[str]] = [set()]
+        for label, words in keywords.items():
+            for word in words:
+                node = 0
+                for ch in word:
+                    nxt = trie[node].get(ch)
+                    if nxt is None:
+                        nxt = len(trie)
+                        trie[node][ch] = nxt
+                        trie.append({})
+                        out.append(set())
+                    node = nxt
+                out[node].add(label)
+
+        # BFS: links de falha viram transições completas (DFA), sem laço de falha na varredura.
+        fail = [0] * len(trie)
+        delta: list[dict[str, int]] = [dict(trie[0])] + [{} for _ in trie[1:]]
+        queue = deque(trie[0].values())
+        while queue:
+            node = queue.popleft()
+            out[node] |= out[fail[node]]
+            row = dict(delta[fail[node]])
+            for ch, nxt in trie[node].items():
+                fail[nxt] = delta[fail[node]].get(ch, 0) if node else 0
+                row[ch] = nxt
+                queue.append(nxt)
+            delta[node] = row
+
+        self._delta = delta
+        self._out = [frozenset(o) if o else None for o in out]
+
+    def scan(self, text: str) -> set[str]:
+        delta, out = self._delta, self._out
+        node = 0
+        hits: set[str] = set()
+        for ch in text:
+            node = delta[node].get(ch, 0)
+            found = out[node]
+            if found:
+                hits |= found
+        return hits
+
+
+# Gatilhos de palavra-chave (texto já normalizado). Cada estado compila só os rótulos que usa.
+_KEYWORDS: dict[str, tuple[str, ...]] = {
+    "cancel": ("cancelar", "cancela", "sair", "parar", "para", "pare", "deixa pra la", "deixa pra lá"),
+    "vague": ("to ruim", "tô ruim", "to mal", "tô mal", "passando mal", "mal"),
+    # "onde acho um medico", "quero um medico", "hospital", etc.
+    "doctor": (
+        "onde acho",
+        "onde eu acho",
+        "onde encontro",
+        "um medico",
+        "um médico",
+        "medico",
+        "médico",
+        "hospital",
+        "pronto socorro",
+        "pronto atendimento",
+        "consulta",
+        "agendar",
+        "marcar",
+    ),
+    "arm_left": ("esquerdo", "esquerda"),
+    "arm_right": ("direito", "direita"),
+    "jaw": ("mandibula", "mandíbula"),
+    "confused": ("sim ou nao", "sim ou não", "o que", "oq", "do que"),
+    "confused_arm": ("sim ou nao", "sim ou não", "o que", "oq", "do que", "como assim"),
+    "alarm": ("falta de ar", "suor frio", "nausea", "náusea", "tontura", "desmaio"),
+    "offscope": ("dente", "dent", "rabiga", "bunda", "anus", "ânus"),
+    "date_word": ("hoje", "amanha", "segunda", "terca", "quarta", "quinta", "sexta", "sabado", "domingo"),
+    "neg": ("nao", "não"),
+    "chest": ("peito",),
+    "pain": ("dor",),
+    "arm": ("braco", "braço"),
+    # reforços da classificação de intenção
+    "chest_emergency": ("dor no peito", "infarto", "socorro", "aperto no peito"),
+    "schedule": ("agendar", "marcar", "consulta", "cardiologista", "horario"),
+    "greeting": ("ola", "oi", "bom dia", "boa tarde", "boa noite"),
+    "chest_area": ("peito", "torax", "tórax", "aperto no peito"),
+}
+_INTENT_LABELS = ("neg", "chest", "pain", "chest_emergency", "schedule", "greeting", "chest_area")
+
+_YES = frozenset(["sim", "s", "claro", "isso", "com certeza", "ok", "certo", "aham", "uhum", "sinto", "tenho"])
+_NO = frozenset(["nao", "não", "n", "negativo", "nao tenho", "não tenho"])
+
+_DATE_RE = re.compile(r"\b\d{1,2}(?:/\d{1,2}/|-\d{1,2}-)\d{2,4}\b")
+_DAY_RE = re.compile(r"\bdia\s+\d{1,2}\b")
+_BP_RE = re.compile(r"\b(\d{2,3})\s*/\s*(\d{2,3})\b")
+_DATE_PLACEHOLDER = "<? @sys-date ?>"
+
+# Estados do diálogo; o código do estado é a posição aqui (estados novos entram no fim, para não
+# mudar o significado de sessões serializadas). A tabela de `_compile_dialog` segue esta ordem.
+_STATES = (
+    "start",
+    "emergencia_irradia",
+    "emergencia_sintomas",
+    "agendamento_data",
+    "agendamento_observacao",
+    "dor_esclarecimento",
+    "braco_lado",
+    "braco_peito",
+    "braco_sintomas",
+)
+_STATE_CODES = {name: code for code, name in enumerate(_STATES)}
+_START = _STATE_CODES["start"]
+# Estados antigos que caem em outro estado (compat de sessões já abertas).
+_STATE_ALIASES = {"emergencia_confirmacao": "emergencia_irradia"}
+
+# Intenções internadas: id pequeno por nome, no processo todo (0 = sem intenção).
+_INTENT_NAMES: list[str | None] = [None]
+_INTENT_IDS: dict[str | None, int] = {None: 0}
+_INTENT_LOCK = threading.Lock()
+
+
+def _intent_id(name: str | None) -> int:
+    code = _INTENT_IDS.get(name)
+    if code is None:
+        with _INTENT_LOCK:
+            code = _INTENT_IDS.get(name)
+            if code is None:
+                code = _INTENT_IDS[name] = len(_INTENT_NAMES)
+                _INTENT_NAMES.append(name)
+    return code
+
+
+def _default_history_size() -> int:
+    try:
+        return max(1, int(os.getenv("CARDIOIA_SESSION_HISTORY") or 16))
+    except ValueError:
+        return 16
+
+
+_ARM_SIDES = (None, "esquerdo", "direito")
+_TURN_BITS = 16  # cada turno do histórico: (epoch_s << 16) | id da intenção, num int64
+# versão, estado, criada em, capacidade, total de turnos, irradia (-1 = ?), lado do braço, 3 tentativas
+_CTX_HEADER = struct.Struct("<BBqHIbBHHHB")
+_CTX_VERSION = 1
+
+
+class _SessionContext:
+    """
+    Contexto de uma sessão LOCAL, com tamanho limitado.
+
+    O estado é um código pequeno (`_STATES`) e o histórico é um anel de capacidade fixa com os
+    turnos mais recentes, cada um um int64 com (epoch em segundos, id da intenção internada):
+    sessões longas não crescem sem limite. `to_bytes`/`from_bytes` serializam num formato binário
+    curto, para guardar a sessão fora do processo (Redis, SQLite).
+    """
+
+    __slots__ = (
+        "state",
+        "created_at",
+        "capacity",
+        "turn_count",
+        "_turns",
+        "emergency_irradia",
+        "arm_side",
+        "emergency_attempts",
+        "emergency_attempts_2",
+        "braco_attempts",
+    )
+
+    def __init__(self, capacity: int = 16, created_at: int | None = None) -> None:
+        self.state = _START
+        self.created_at = int(time.time()) if created_at is None else created_at
+        self.capacity = capacity
+        self.turn_count = 0
+        self._turns = array("q")
+        self.emergency_irradia: bool | None = None
+        self.arm_side: str | None = None
+        self.emergency_attempts = 0
+        self.emergency_attempts_2 = 0
+        self.braco_attempts = 0
+
+    @property
+    def state_name(self) -> str:
+        return _STATES[self.state]
+
+    @state_name.setter
+    def state_name(self, name: str) -> None:
+        name = _STATE_ALIASES.get(name, name)
+        self.state = _STATE_CODES.get(name, _START)
+
+    def record(self, intent: str | None, ts: int | None = None) -> None:
+        packed = ((int(time.time()) if ts is None else ts) << _TURN_BITS) | _intent_id(intent)
+        if len(self._turns) < self.capacity:
+            self._turns.append(packed)
+        else:
+            self._turns[self.turn_count % self.capacity] = packed
+        self.turn_count += 1
+
+    def turns(self) -> list[tuple[int, str | None]]:
+        """Turnos guardados, do mais antigo ao mais recente: (epoch_s, intenção)."""
+        turns = self._turns
+        start = self.turn_count % self.capacity if len(turns) == self.capacity else 0
+        mask = (1 << _TURN_BITS) - 1
+        return [(p >> _TURN_BITS, _INTENT_NAMES[p & mask]) for p in turns[start:] + turns[:start]]
+
+    def to_bytes(self) -> bytes:
+        # Ids de intenção são do processo: a serialização leva só os nomes usados nesta sessão.
+        mask = (1 << _TURN_BITS) - 1
+        local: dict[int, int] = {}
+        turns = array("q", ((p & ~mask) | local.setdefault(p & mask, len(local)) for p in self._turns))
+        names = [(_INTENT_NAMES[i] or "").encode("utf-8") for i in local]
+        irradia = -1 if self.emergency_irradia is None else int(self.emergency_irradia)
+        header = _CTX_HEADER.pack(
+            _CTX_VERSION,
+            self.state,
+            self.created_at,
+            self.capacity,
+            self.turn_count,
+            irradia,
+            _ARM_SIDES.index(self.arm_side),
+            self.emergency_attempts,
+            self.emergency_attempts_2,
+            self.braco_attempts,
+            len(names),
+        )
+        table = b"".join(bytes([len(n)]) + n for n in names)
+        return header + table + turns.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> _SessionContext:
+        (version, state, created_at, capacity, turn_count, irradia, arm, att1, att2, att3, n_names) = _CTX_HEADER.unpack_from(data, 0)
+        if version != _CTX_VERSION:
+            raise ValueError(f"versão de contexto não suportada: {version}")
+        ctx = cls(capacity=capacity, created_at=created_at)
+        ctx.state = state if state < len(_STATES) else _START
+        ctx.turn_count = turn_count
+        ctx.emergency_irradia = None if irradia < 0 else bool(irradia)
+        ctx.arm_side = _ARM_SIDES[arm]
+        ctx.emergency_attempts, ctx.emergency_attempts_2, ctx.braco_attempts = att1, att2, att3
+        pos = _CTX_HEADER.size
+        ids = []
+        for _ in range(n_names):
+            size = data[pos]
+            ids.append(_intent_id(data[pos + 1 : pos + 1 + size].decode("utf-8") or None))
+            pos += 1 + size
+        mask = (1 << _TURN_BITS) - 1
+        turns = array("q")
+        turns.frombytes(data[pos:])
+        ctx._turns = array("q", ((p & ~mask) | ids[p & mask] for p in turns))
+        return ctx
+
+
+class _Turn:
+    """Tudo que as regras precisam sobre a mensagem atual (calculado uma vez por turno)."""
+
+    __slots__ = ("ctx", "raw", "norm", "hits", "is_yes", "is_no", "intent", "score")
+
+    def __init__(self, ctx: _SessionContext, raw: str, norm: str, hits: set[str]) -> None:
+        self.ctx = ctx
+        self.raw = raw
+        self.norm = norm
+        self.hits = hits
+        self.is_yes = norm in _YES
+        self.is_no = norm in _NO
+        self.intent: str | None = None
+        self.score = 0.0
+
+
+class _When:
+    """Condição de uma transição; `labels` são os gatilhos de palavra-chave que ela consulta."""
+
+    __slots__ = ("test", "labels")
+
+    def __init__(self, test: Callable[[_Turn], bool], labels: tuple[str, ...] = ()) -> None:
+        self.test = test
+        self.labels = labels
+
+    def __call__(self, t: _Turn) -> bool:
+        return self.test(t)
+
+    def __or__(self, other: _When) -> _When:
+        return _When(lambda t: self.test(t) or other.test(t), self.labels + other.labels)
+
+    def __and__(self, other: _When) -> _When:
+        return _When(lambda t: self.test(t) and other.test(t), self.labels + other.labels)
+
+    def __invert__(self) -> _When:
+        return _When(lambda t: not self.test(t), self.labels)
+
+
+def _hit(label: str) -> _When:
+    return _When(lambda t: label in t.hits, (label,))
+
+
+def _attempts(key: str, limit: int = 2) -> _When:
+    """Escape hatch: conta tentativas sem resposta válida no contexto da sessão."""
+
+    def test(t: _Turn) -> bool:
+        count = getattr(t.ctx, key) + 1
+        setattr(t.ctx, key, count)
+        return count >= limit
+
+    return _When(test)
+
+
+_ALWAYS = _When(lambda t: True)
+_YES_W = _When(lambda t: t.is_yes)
+_NO_W = _When(lambda t: t.is_no)
+# "no esquerdo" conta como sim para irradiação ao braço esquerdo; "no direito" como não.
+_ARM_SIDE_W = _hit("arm_left") | _hit("arm_right")
+_DATE_W = _When(lambda t: bool(_DATE_RE.search(t.raw.strip())) or "date_word" in t.hits or bool(_DAY_RE.search(t.norm)), ("date_word",))
+
+
+def _intent_is(name: str | None) -> _When:
+    return _When(lambda t: t.intent == name)
+
+
+@dataclass(frozen=True)
+class _Reply:
+    """Resposta pré-renderizada; `confidence=None` usa o score da intenção classificada."""
+
+    text: str
+    intent: str | None = None
+    confidence: float | None = 1.0
+    entities: tuple[tuple[str, str], ...] = ()
+
+    def __call__(self, t: _Turn) -> dict[str, Any]:
+        intents = []
+        if self.intent:
+            intents.append({"intent": self.intent, "confidence": t.score if self.confidence is None else self.confidence})
+        return {"text": self.text, "intents": intents, "entities": [{"entity": e, "value": v} for e, v in self.entities]}
+
+
+@dataclass(frozen=True)
+class _Rule:
+    when: _When
+    reply: Callable[[_Turn], dict[str, Any]]
+    goto: str | None = None
+    update: Callable[[_Turn], None] | None = None
+
+
+# Passos especiais da tabela (executados em ordem, como as regras).
+_RECORD = "record"  # registra a mensagem no histórico
+_CLASSIFY = "classify"  # classifica a intenção (e registra no histórico)
+
+
+@dataclass(frozen=True)
+class _CompiledState:
+    automaton: _KeywordAutomaton
+    steps: tuple[Any, ...]
+
+
+def _set_ctx(key: str, value: Callable[[_Turn], Any]) -> Callable[[_Turn], None]:
+    def update(t: _Turn) -> None:
+        setattr(t.ctx, key, value(t))
+
+    return update
+
+
+def _arm_side(t: _Turn) -> str:
+    return "esquerdo" if "arm_left" in t.hits else "direito"
+
+
+def _compile_dialog(idx: _SkillIndex) -> tuple[_CompiledState, ...]:
+    """
+    Compila o diálogo local numa tabela de transições: estado -> regras ordenadas (condição, resposta,
+    próximo estado). Os textos do export são resolvidos aqui, uma vez por versão do skill, e cada estado
+    ganha um autômato com só as palavras-chave que as suas regras consultam. A tabela é indexada pelo
+    código do estado (`_STATES`).
+    """
+
+    def dialog_text(condition: str) -> str | None:
+        return idx.templates.get(condition)
+
+    irradia_q = "Responda **Sim** ou **Não**: a dor/pressão se espalha para o braço esquerdo ou para a mandíbula?"
+    agendar_emerg = _Reply(
+        "Posso pré-agendar uma consulta por aqui. Para qual dia você gostaria de marcar? (Ex: 10/03/2026, amanhã, segunda que vem)",
+        "agendar_consulta",
+    )
+    agendar_braco = _Reply("Posso pré-agendar uma consulta por aqui. Para qual dia você gostaria de marcar?", "agendar_consulta")
+    cancel = _Rule(
+        _hit("cancel"),
+        _Reply(
+            "Tudo bem. Como você prefere seguir agora: agendar uma consulta ou descrever um sintoma (dor no peito, falta de ar, palpitações)?",
+            "cancelar",
+        ),
+        goto="start",
+    )
+
+    date_tmpl = dialog_text("@sys-date")
+
+    def date_reply(t: _Turn) -> dict[str, Any]:
+        d = t.raw.strip()
+        txt = date_tmpl or f"Entendido. Consulta pré-agendada para **{d}**."
+        return {
+            "text": txt.replace(_DATE_PLACEHOLDER, d),
+            "intents": [{"intent": "informar_data", "confidence": 1.0}],
+            "entities": [{"entity": "sys-date", "value": d}],
+        }
+
+    def observacao_reply(t: _Turn) -> dict[str, Any]:
+        motivo = t.raw.strip()
+        if not motivo:
+            return _Reply("Tudo bem. Consulta pré-agendada. Posso te ajudar com mais alguma coisa?", "confirmar_agendamento")(t)
+        # Se o usuario mandar outra data aqui, trate como observacao mesmo (nao reinicia fluxo).
+        return {
+            "text": f"Perfeito. Registrei a observação: **{motivo}**.\n\nPosso te ajudar com mais alguma coisa?",
+            "intents": [{"intent": "confirmar_agendamento", "confidence": 1.0}],
+            "entities": [{"entity": "observacao", "value": motivo}],
+        }
+
+    def arm_side_reply(t: _Turn) -> dict[str, Any]:
+        return {
+            "text": "Obrigado. Agora responda **Sim** ou **Não**: você também sente dor/pressão no **peito**?",
+            "intents": [{"intent": "braco_lado_informado", "confidence": 1.0}],
+            "entities": [{"entity": "arm_side", "value": _arm_side(t)}],
+        }
+
+    fallback_txt = dialog_text("anything_else") or "Desculpe, não entendi. Tente: \"Quero agendar uma consulta\"."
+
+    def fallback_reply(t: _Turn) -> dict[str, Any]:
+        # Heurística útil (não substitui o Watson): leitura de pressão no formato 150/95
+        m = _BP_RE.search(t.raw)
+        if not m:
+            return {"text": fallback_txt, "intents": [], "entities": []}
+        sys, dia = int(m.group(1)), int(m.group(2))
+        entities = [{"entity": "pressao", "value": f"{sys}/{dia}"}]
+        if sys >= 180 or dia >= 120:
+            return {
+                "text": f"Uma medida de **{sys}/{dia}** pode indicar urgência.\n\nSe você estiver com sintomas (dor no peito, falta de ar, confusão), procure atendimento imediatamente.",
+                "intents": [{"intent": "info_pressao", "confidence": 0.9}],
+                "entities": entities,
+            }
+        if sys >= 140 or dia >= 90:
+            return {
+                "text": f"Uma medida de **{sys}/{dia}** está acima do ideal.\n\nSe isso for frequente, vale agendar uma avaliação. Você quer pré-agendar uma consulta?",
+                "intents": [{"intent": "info_pressao", "confidence": 0.9}],
+                "entities": entities,
+            }
+        return {
+            "text": f"**{sys}/{dia}** parece dentro de um intervalo comum.\n\nSe houver sintomas ou dúvidas, posso ajudar a organizar as informações ou pré-agendar uma consulta.",
+            "intents": [{"intent": "info_pressao", "confidence": 0.7}],
+            "entities": entities,
+        }
+
+    # Regras comuns depois da classificação de intenção (estado inicial e estados desconhecidos).
+    tail = (
+        # Dor fora do contexto cardiologico: pede esclarecimento antes de disparar emergencia.
+        _Rule(
+            _hit("pain") & _intent_is(None),
+            _Reply(
+                "Entendi que você está com dor.\n\n"
+                "Para eu te orientar melhor, me diga:\n"
+                "1) Onde é a dor (peito, costas, barriga, cabeça, dente...)?\n"
+                "2) Começou quando?\n"
+                "3) Tem falta de ar, tontura, náusea ou suor frio junto?",
+                "esclarecer_dor",
+            ),
+            goto="dor_esclarecimento",
+        ),
+        # Sintomas claramente fora do escopo cardiologico: faz redirecionamento sem travar fluxo.
+        _Rule(
+            _hit("offscope") & ~_intent_is("dor_no_peito"),
+            _Reply(
+                "Entendi. Isso parece fugir do meu foco (cardiologia).\n\n"
+                "Se você quiser, eu posso:\n"
+                "- ajudar a **organizar** as informações (para levar a uma consulta)\n"
+                "- ou **pré-agendar** uma consulta com cardiologista, se houver sintomas cardíacos.\n\n"
+                "Você quer organizar as informações ou falar de sintomas como dor no peito, falta de ar ou palpitações?",
+                "fora_escopo",
+            ),
+        ),
+        _Rule(_intent_is("dor_no_peito"), _Reply(irradia_q, "dor_no_peito", None), goto="emergencia_irradia"),
+        _Rule(
+            _intent_is("agendar_consulta"),
+            _Reply(
+                dialog_text("#agendar_consulta") or "Certo, vamos agendar. Para qual dia você gostaria de marcar a consulta?",
+                "agendar_consulta",
+                None,
+            ),
+            goto="agendamento_data",
+        ),
+        _Rule(
+            _intent_is("falta_de_ar"),
+            _Reply(
+                dialog_text("#falta_de_ar")
+                or "Entendi. Falta de ar pode ter várias causas.\n\nVocê está com dor no peito, tontura ou lábios arroxeados agora?",
+                "falta_de_ar",
+                None,
+            ),
+        ),
+        _Rule(
+            _intent_is("info_pressao"),
+            _Reply(
+                dialog_text("#info_pressao")
+                or "Pressão alta é quando a pressão arterial fica frequentemente elevada.\n\n"
+                "Se você tiver uma medida recente (ex: 150/95), pode me dizer?",
+                "info_pressao",
+                None,
+            ),
+        ),
+        _Rule(
+            _intent_is("agradecimento"),
+            _Reply(dialog_text("#agradecimento") or "De nada. Como posso te ajudar?", "agradecimento", None),
+        ),
+        _Rule(_intent_is("saudacao"), _Reply(dialog_text("#saudacao") or "Olá! Como posso ajudar?", "saudacao", None)),
+        # Sim/Não fora de contexto: conversa humanizada precisa pedir esclarecimento.
+        _Rule(
+            _YES_W | _NO_W,
+            _Reply(
+                "Entendi. Só para eu não te orientar errado:\n\n"
+                "1) Você quer **agendar uma consulta**?\n"
+                "ou\n"
+                "2) Você está com **algum sintoma agora** (dor no peito, falta de ar, palpitações)?\n\n"
+                "Me diga qual opção faz mais sentido para você.",
+                "esclarecer_contexto",
+            ),
+        ),
+        # Fallback do JSON
+        _Rule(_ALWAYS, fallback_reply),
+    )
+
+    table: dict[str, tuple[Any, ...]] = {
+        "start": (
+            cancel,
+            # Atalho "humano" para entradas muito vagas.
+            _Rule(
+                _hit("vague"),
+                _Reply(
+                    "Entendi. Para eu te ajudar sem adivinhar:\n\n"
+                    "1) Qual é o sintoma principal agora? (ex.: dor no peito, falta de ar, palpitações, tontura)\n"
+                    "2) Isso começou há quanto tempo?\n\n"
+                    "Se preferir, você também pode dizer: \"quero agendar uma consulta\".",
+                    "sintoma_vago",
+                ),
+            ),
+            _CLASSIFY,
+            # Dor no braço (muito comum em conversa humana): não dispare emergência direto.
+            _Rule(
+                _hit("pain") & _hit("arm") & ~_hit("chest"),
+                _Reply("Entendi: dor no braço. É no braço **esquerdo** ou **direito**?", "dor_no_braco"),
+                goto="braco_lado",
+            ),
+            *tail,
+        ),
+        # Emergência (pergunta 1) - irradiação
+        "emergencia_irradia": (
+            cancel,
+            # Se o usuário tentar "sair" perguntando por médico, não trave o fluxo.
+            _Rule(_hit("doctor"), agendar_emerg, goto="agendamento_data"),
+            _Rule(
+                _YES_W | _hit("arm_left") | _hit("jaw"),
+                _Reply("Obrigado. Agora responda **Sim** ou **Não**: você sente falta de ar, náusea ou suor frio agora?", "emergencia_irradia_sim"),
+                goto="emergencia_sintomas",
+                update=_set_ctx("emergency_irradia", lambda t: True),
+            ),
+            _Rule(
+                _NO_W | _hit("arm_right"),
+                _Reply("Entendi. Agora responda **Sim** ou **Não**: você sente falta de ar, náusea ou suor frio agora?", "emergencia_irradia_nao"),
+                goto="emergencia_sintomas",
+                update=_set_ctx("emergency_irradia", lambda t: False),
+            ),
+            # Se a pessoa está confusa ("sim ou não o quê?"), deixa explícito qual pergunta está ativa.
+            _Rule(
+                _hit("confused"),
+                _Reply(
+                    "Só para eu seguir a triagem: **a dor/pressão se espalha para o braço esquerdo ou para a mandíbula?** (Sim/Não)",
+                    "emergencia_clarificar",
+                ),
+            ),
+            # Escape hatch: não fica preso pedindo Sim/Não para sempre.
+            _Rule(
+                _attempts("emergency_attempts"),
+                _Reply(
+                    "Tudo bem. Eu não quero te prender em perguntas.\n\n"
+                    "Você prefere:\n"
+                    "- agendar uma consulta, ou\n"
+                    "- descrever rapidamente o que está sentindo (ex.: dor no peito, falta de ar, palpitações)?",
+                    "emergencia_escape",
+                ),
+                goto="start",
+            ),
+            _Rule(
+                _ALWAYS,
+                _Reply(
+                    "Responda com **Sim** ou **Não**: a dor/pressão se espalha para o braço esquerdo ou para a mandíbula?",
+                    "emergencia_irradia_reprompt",
+                ),
+            ),
+        ),
+        # Emergência (pergunta 2) - sintomas associados
+        "emergencia_sintomas": (
+            cancel,
+            _Rule(_hit("doctor"), agendar_emerg, goto="agendamento_data"),
+            _Rule(
+                _YES_W | _hit("alarm"),
+                _Reply(
+                    "Sinais de alerta identificados.\n\n"
+                    "Procure **atendimento de emergência imediatamente**.\n\n"
+                    "Se você quiser, depois disso eu posso ajudar a pré-agendar um retorno com cardiologista.",
+                    "emergencia_alta",
+                    entities=(("risk", "alto"),),
+                ),
+                goto="start",
+            ),
+            _Rule(
+                _NO_W,
+                _Reply(
+                    "Entendi. Mesmo sem outros sinais agora, dor no peito merece avaliação.\n\n"
+                    "Quer pré-agendar uma consulta? Para qual dia você gostaria de marcar?",
+                    "emergencia_media",
+                    entities=(("risk", "moderado"),),
+                ),
+                goto="agendamento_data",
+            ),
+            _Rule(
+                _hit("confused"),
+                _Reply("Só para eu seguir: **você sente falta de ar, náusea ou suor frio agora?** (Sim/Não)", "emergencia_clarificar_2"),
+            ),
+            _Rule(
+                _attempts("emergency_attempts_2"),
+                _Reply(
+                    "Tudo bem. Quer que eu pré-agende uma consulta ou prefere descrever o sintoma principal com outras palavras?",
+                    "emergencia_escape_2",
+                ),
+                goto="start",
+            ),
+            _Rule(
+                _ALWAYS,
+                _Reply("Responda com **Sim** ou **Não**: você sente falta de ar, náusea ou suor frio agora?", "emergencia_sintomas_reprompt"),
+            ),
+        ),
+        # Aguardando data do agendamento; depois da data, pede observacao/motivo (estado dedicado).
+        "agendamento_data": (
+            cancel,
+            _Rule(_DATE_W, date_reply, goto="agendamento_observacao"),
+            _Rule(_ALWAYS, _Reply("Me diga uma data para eu pré-agendar (ex: `10/03/2026`).", "pedir_data")),
+        ),
+        "agendamento_observacao": (cancel, _Rule(_ALWAYS, observacao_reply, goto="start")),
+        # Esclarecendo localizacao/descricao de dor (antes de assumir dor no peito)
+        "dor_esclarecimento": (
+            cancel,
+            # Se o usuario negar explicitamente "peito", NAO dispare emergencia.
+            _Rule(
+                _hit("neg") & _hit("chest"),
+                _Reply(
+                    "Entendi, então **não é dor no peito**.\n\n"
+                    "Para eu não te orientar errado, me diga onde é a dor (ex.: barriga, costas, cabeça, dente...) "
+                    "e se você tem algum sintoma como falta de ar, palpitações, tontura, náusea ou suor frio.",
+                    "esclarecer_dor",
+                    entities=(("dor_no_peito", "nao"),),
+                ),
+                goto="start",
+            ),
+            # Se mencionar peito sem negacao, ai sim segue o fluxo de emergencia (pergunta binária, não o texto do export).
+            _Rule(_hit("chest"), _Reply(irradia_q, "dor_no_peito", 0.9), goto="emergencia_irradia"),
+            # Palavras de localizacao fora do escopo cardiologico: faz redirecionamento.
+            _Rule(
+                _hit("offscope"),
+                _Reply(
+                    "Entendi. Isso parece fugir do meu foco (cardiologia).\n\n"
+                    "Se você quiser, eu posso ajudar a **organizar** o que você está sentindo (para levar a uma consulta) "
+                    "ou, se houver sintomas cardíacos, seguir com uma triagem por aqui.\n\n"
+                    "Você prefere organizar as informações ou falar de sintomas como dor no peito, falta de ar ou palpitações?",
+                    "fora_escopo",
+                ),
+                goto="start",
+            ),
+            _Rule(
+                _ALWAYS,
+                _Reply(
+                    "Entendi. Só para eu acertar:\n\nOnde exatamente é a dor (peito, costas, barriga, cabeça, dente...)?",
+                    "esclarecer_dor",
+                ),
+            ),
+        ),
+        # Dor no braço -> coletar lado
+        "braco_lado": (
+            cancel,
+            _RECORD,
+            _Rule(_ARM_SIDE_W, arm_side_reply, goto="braco_peito", update=_set_ctx("arm_side", _arm_side)),
+            _Rule(_ALWAYS, _Reply("Só para eu registrar: é no braço **esquerdo** ou **direito**?", "braco_lado_perguntar")),
+        ),
+        # Dor no braço -> pergunta se há dor no peito
+        "braco_peito": (
+            cancel,
+            _RECORD,
+            _Rule(_hit("doctor"), agendar_braco, goto="agendamento_data"),
+            _Rule(_YES_W | _hit("chest"), _Reply("Entendi. " + irradia_q, "dor_no_peito"), goto="emergencia_irradia"),
+            _Rule(
+                _NO_W,
+                _Reply(
+                    "Entendi. Responda **Sim** ou **Não**: você tem falta de ar, tontura, náusea ou suor frio junto dessa dor?",
+                    "braco_sem_peito",
+                ),
+                goto="braco_sintomas",
+            ),
+            # Evita travar o usuario: explica a pergunta e oferece saida.
+            _Rule(
+                _hit("confused_arm"),
+                _Reply(
+                    "Só para eu entender o risco: **além do braço, você sente dor/pressão no peito?** (Sim/Não)",
+                    "braco_peito_clarificar",
+                ),
+            ),
+            _Rule(
+                _attempts("braco_attempts"),
+                _Reply(
+                    "Tudo bem. Sem essa resposta eu não quero te orientar errado.\n\n"
+                    "Você prefere:\n"
+                    "- pré-agendar uma consulta, ou\n"
+                    "- descrever a dor em 1 frase (ex.: pontada, formigamento, começou quando)?",
+                    "braco_escape",
+                ),
+                goto="start",
+            ),
+            _Rule(_ALWAYS, _Reply("Para eu seguir: além do braço, você sente dor/pressão no **peito**? (Sim/Não)", "braco_peito_reprompt")),
+        ),
+        # Dor no braço -> sintomas associados
+        "braco_sintomas": (
+            cancel,
+            _RECORD,
+            _Rule(_hit("doctor"), agendar_braco, goto="agendamento_data"),
+            _Rule(
+                _YES_W | _hit("alarm"),
+                _Reply(
+                    "Entendi. Esses sinais podem indicar maior risco. Procure avaliação médica com urgência. Se quiser, posso pré-agendar uma consulta.",
+                    "braco_alerta",
+                    entities=(("risk", "moderado"),),
+                ),
+                goto="start",
+            ),
+            _Rule(
+                _NO_W,
+                _Reply(
+                    "Entendi. Posso pré-agendar uma consulta para você investigar isso com calma. Para qual dia você gostaria de marcar?",
+                    "agendar_consulta",
+                ),
+                goto="agendamento_data",
+            ),
+            _Rule(
+                _ALWAYS,
+                _Reply(
+                    "Responda com **Sim** ou **Não**: você tem falta de ar, tontura, náusea ou suor frio junto dessa dor?",
+                    "braco_sintomas_reprompt",
+                ),
+            ),
+        ),
+    }
+    automata: dict[frozenset[str], _KeywordAutomaton] = {}
+
+    def compile_state(steps: tuple[Any, ...]) -> _CompiledState:
+        labels: set[str] = set()
+        for step in steps:
+            if step is _CLASSIFY:
+                labels.update(_INTENT_LABELS)
+            elif isinstance(step, _Rule):
+                labels.update(step.when.labels)
+        key = frozenset(labels)
+        if key not in automata:
+            automata[key] = _KeywordAutomaton({label: _KEYWORDS[label] for label in sorted(key)})
+        return _CompiledState(automaton=automata[key], steps=steps)
+
+    if set(table) != set(_STATES):
+        raise AssertionError(f"tabela do diálogo fora de `_STATES`: {sorted(set(table) ^ set(_STATES))}")
+    return tuple(compile_state(table[state]) for state in _STATES)
+
+
+@dataclass(frozen=True)
+class _Dialog:
+    """Uma versão do skill (índice + tabela compilada), trocada por inteiro numa única atribuição."""
+
+    idx: _SkillIndex
+    states: tuple[_CompiledState, ...]
+    # Motor alternativo de intencoes (CARDIOIA_INTENT_ENGINE=tfidf); None = Jaccard por exemplo.
+    intent_engine: TfidfIntentEngine | None = None
+
+
+def _build_dialog(idx: _SkillIndex) -> _Dialog:
+    if not idx.example_tokens:
+        raise ValueError("skill sem intents/exemplos")
+    engine = TfidfIntentEngine(idx.intents) if intent_engine_name() == "tfidf" else None
+    return _Dialog(idx=idx, states=_compile_dialog(idx), intent_engine=engine)
 
 
 class MockAssistantService:
@@ -62,20 +859,67 @@ class MockAssistantService:
 
     Requisito-chave: o chatbot deve "conversar" localmente usando como base
     o export `watson_skill_export.json` (intents/entities/dialog_nodes).
+
+    O diálogo é uma tabela de transições compilada (`_compile_dialog`): cada turno faz uma
+    única varredura de palavras-chave e percorre só as regras do estado atual.
     """
 
     def __init__(self) -> None:
-        self._skill = self._load_skill()
-        self._idx = self._index_skill(self._skill)
-        self._sessions: dict[str, dict[str, Any]] = {}  # session_id -> context
+        self._dialog = _build_dialog(self._load_index())
+        self._intent_automaton = _KeywordAutomaton({label: _KEYWORDS[label] for label in _INTENT_LABELS})
+        self._sessions: dict[str, _SessionContext] = {}
+        self.history_size = _default_history_size()
+        # Incrementado a cada recarga do skill (invalida caches de resposta).
+        self.skill_version = 1
+
+    @property
+    def _idx(self) -> _SkillIndex:
+        return self._dialog.idx
+
+    def reload_skill(self) -> None:
+        """
+        Relê `watson_skill_export.json` e recompila o diálogo (sessões são preservadas).
+
+        A versão nova é montada e validada por fora e entra com uma única atribuição: turnos em
+        andamento terminam na versão antiga; se o export estiver inválido, a antiga continua.
+        """
+        self._dialog = _build_dialog(self._load_index())
+        self.skill_version += 1
 
     @staticmethod
-    def _load_skill() -> dict[str, Any]:
+    def _skill_path() -> str:
         repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
         skill_path = os.path.join(repo_root, "watson_skill_export.json")
         if not os.path.exists(skill_path):
             raise FileNotFoundError("Arquivo watson_skill_export.json não encontrado na raiz do repositório.")
-        return json.loads(open(skill_path, "r", encoding="utf-8").read())
+        return skill_path
+
+    @classmethod
+    def _load_skill(cls) -> dict[str, Any]:
+        return json.loads(open(cls._skill_path(), "r", encoding="utf-8").read())
+
+    @classmethod
+    def _load_index(cls) -> _SkillIndex:
+        """
+        Índice do skill a partir do artefato binário pré-compilado (`scripts/build_skill_artifact.py`)
+        quando ele corresponde ao export atual; senão indexa o JSON e regrava o artefato.
+        """
+        source = cls._skill_path()
+        artifact = default_artifact_path()
+        payload = read_artifact(artifact, source)
+        if payload is not None:
+            try:
+                return _SkillIndex.from_payload(payload)
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                print(f"Artefato do skill inválido ({artifact}): {e}")
+
+        idx = cls._index_skill(cls._load_skill())
+        if autobuild_enabled():
+            try:
+                write_artifact(artifact, source, idx.to_payload())
+            except OSError as e:
+                print(f"Não foi possível gravar o artefato do skill ({artifact}): {e}")
+        return idx
 
     @staticmethod
     def _index_skill(skill: dict[str, Any]) -> _SkillIndex:
@@ -96,107 +940,76 @@ class MockAssistantService:
             cond = dn.get("conditions")
             if isinstance(cond, str) and cond.strip():
                 dialogs_by_condition[cond.strip()] = dn
+        templates = {}
+        for cond, dn in dialogs_by_condition.items():
+            txt = _extract_dialog_text(dn)
+            if txt:
+                templates[cond] = txt
 
-        return _SkillIndex(intents=intents, dialogs_by_condition=dialogs_by_condition)
+        example_tokens = tuple((name, frozenset(tokenize(ex))) for name, examples in intents.items() for ex in examples)
+        return _SkillIndex(intents=intents, templates=templates, example_tokens=example_tokens)
 
     def create_session(self) -> str:
         session_id = str(uuid.uuid4())
-        self._sessions[session_id] = {
-            "state": "start",
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "history": [],
-        }
+        self._sessions[session_id] = _SessionContext(self.history_size)
         return session_id
 
-    @staticmethod
-    def _arm_side(norm: str) -> str | None:
-        if any(w in norm for w in ["esquerdo", "esquerda"]):
-            return "esquerdo"
-        if any(w in norm for w in ["direito", "direita"]):
-            return "direito"
-        return None
-
-    @staticmethod
-    def _wants_doctor(norm: str) -> bool:
-        # "onde acho um medico", "quero um medico", "hospital", etc.
-        return any(
-            w in norm
-            for w in [
-                "onde acho",
-                "onde eu acho",
-                "onde encontro",
-                "um medico",
-                "um médico",
-                "medico",
-                "médico",
-                "hospital",
-                "pronto socorro",
-                "pronto atendimento",
-                "consulta",
-                "agendar",
-                "marcar",
-            ]
-        )
-
-    @staticmethod
-    def _is_cancel(norm: str) -> bool:
-        return any(w in norm for w in ["cancelar", "cancela", "sair", "parar", "para", "pare", "deixa pra la", "deixa pra lá"])
+    def cache_state(self, session_id: str) -> str | None:
+        """Escopo de cache do próximo turno: só o estado inicial é determinístico (sem contexto)."""
+        ctx = self._sessions.get(session_id)
+        if ctx is None or ctx.state != _START:
+            return None
+        return "local:start"
 
-    @staticmethod
-    def _looks_like_date(msg: str) -> bool:
-        msg = (msg or "").strip()
-        if re.search(r"\b(\d{1,2})/(\d{1,2})/(\d{2,4})\b", msg):
-            return True
-        if re.search(r"\b(\d{1,2})-(\d{1,2})-(\d{2,4})\b", msg):
-            return True
-        # palavras comuns de data
-        norm = _strip_accents_lower(msg)
-        if any(w in norm for w in ["hoje", "amanha", "segunda", "terca", "quarta", "quinta", "sexta", "sabado", "domingo"]):
-            return True
-        if re.search(r"\bdia\s+\d{1,2}\b", norm):
-            return True
-        return False
-
-    def _best_intent(self, message: str) -> tuple[str | None, float]:
-        msg_tokens = _tokenize(message)
+    def _best_intent(
+        self, message: str | NormalizedText, hits: set[str] | None = None, dialog: _Dialog | None = None
+    ) -> tuple[str | None, float]:
+        text = normalize(message)
+        msg_tokens = text.token_set
         best_name = None
         best_score = 0.0
-
-        for name, examples in self._idx.intents.items():
-            for ex in examples:
-                score = _jaccard(msg_tokens, _tokenize(ex))
+        dialog = dialog or self._dialog
+
+        if dialog.intent_engine is not None:
+            # TF-IDF esparso (`backend/intent_engine.py`); os reforços/guard rails abaixo valem igual.
+            best_name, best_score = dialog.intent_engine.best(text)
+        elif msg_tokens:
+            n = len(msg_tokens)
+            for name, ex_tokens in dialog.idx.example_tokens:
+                if not ex_tokens:
+                    continue
+                inter = len(msg_tokens & ex_tokens)
+                score = inter / max(1, n + len(ex_tokens) - inter)
                 if score > best_score:
                     best_name, best_score = name, score
 
-        # Evita falso-positivo: se a similaridade for muito baixa, trate como "sem intenção".
-        if best_score < 0.34:
-            best_name = None
+            # Evita falso-positivo: se a similaridade for muito baixa, trate como "sem intenção".
+            if best_score < 0.34:
+                best_name = None
 
         # reforços por palavras-chave (em saúde isso melhora bastante)
-        norm = _strip_accents_lower(message)
+        if hits is None:
+            hits = self._intent_automaton.scan(text.folded)
         # Negacao explicita evita falso positivo para dor no peito.
-        if ("nao" in norm or "não" in norm) and "peito" in norm and "dor" not in norm:
+        if "neg" in hits and "chest" in hits and "pain" not in hits:
             return None, 0.0
-        if any(w in norm for w in ["dor no peito", "infarto", "socorro", "aperto no peito"]):
+        if "chest_emergency" in hits:
             return "dor_no_peito", 1.0
-        if any(w in norm for w in ["agendar", "marcar", "consulta", "cardiologista", "horario"]):
+        if "schedule" in hits:
             return "agendar_consulta", max(best_score, 0.9)
-        if any(w in norm for w in ["ola", "oi", "bom dia", "boa tarde", "boa noite"]):
+        if "greeting" in hits:
             return "saudacao", max(best_score, 0.85)
 
         # Guard rail importante: não trate "dor no braço" como "dor no peito" só por similaridade.
         # Isso evita o falso-positivo mais comum no modo LOCAL (Jaccard com exemplos do Watson).
-        if best_name == "dor_no_peito" and not any(w in norm for w in ["peito", "torax", "tórax", "aperto no peito"]):
+        if best_name == "dor_no_peito" and "chest_area" not in hits:
             best_name = None
             best_score = 0.0
 
         return best_name, best_score
 
     def _dialog_text_for_condition(self, condition: str) -> str | None:
-        node = self._idx.dialogs_by_condition.get(condition)
-        if not node:
-            return None
-        return _extract_dialog_text(node)
+        return self._dialog.idx.templates.get(condition)
 
     def send_message(self, session_id: str, message_text: str, user_id: str | None = None) -> dict[str, Any]:
         ctx = self._sessions.get(session_id)
@@ -205,460 +1018,22 @@ class MockAssistantService:
             ctx = self._sessions[session_id]
 
         raw = message_text or ""
-        norm = _strip_accents_lower(raw)
-        state = ctx.get("state", "start")
-
-        is_yes = norm in ["sim", "s", "claro", "isso", "com certeza", "ok", "certo", "aham", "uhum", "sinto", "tenho"]
-        is_no = norm in ["nao", "não", "n", "negativo", "nao tenho", "não tenho"]
-
-        # Cancelamento global (não deve prender usuário em nenhum fluxo).
-        if self._is_cancel(norm):
-            ctx["state"] = "start"
-            return {
-                "text": "Tudo bem. Como você prefere seguir agora: agendar uma consulta ou descrever um sintoma (dor no peito, falta de ar, palpitações)?",
-                "intents": [{"intent": "cancelar", "confidence": 1.0}],
-                "entities": [],
-            }
-
-        # Atalho "humano" para entradas muito vagas.
-        if state == "start" and any(w in norm for w in ["to ruim", "tô ruim", "to mal", "tô mal", "passando mal", "mal"]):
-            return {
-                "text": (
-                    "Entendi. Para eu te ajudar sem adivinhar:\n\n"
-                    "1) Qual é o sintoma principal agora? (ex.: dor no peito, falta de ar, palpitações, tontura)\n"
-                    "2) Isso começou há quanto tempo?\n\n"
-                    "Se preferir, você também pode dizer: \"quero agendar uma consulta\"."
-                ),
-                "intents": [{"intent": "sintoma_vago", "confidence": 1.0}],
-                "entities": [],
-            }
-
-        # Estado: emergência (pergunta 1) - irradiação
-        if state in ["emergencia_confirmacao", "emergencia_irradia"]:
-            # Compat: estados antigos caem aqui (emergencia_confirmacao).
-            ctx["state"] = "emergencia_irradia"
-
-            # Se o usuário tentar "sair" perguntando por médico, não trave o fluxo.
-            if self._wants_doctor(norm):
-                ctx["state"] = "agendamento_data"
-                return {
-                    "text": "Posso pré-agendar uma consulta por aqui. Para qual dia você gostaria de marcar? (Ex: 10/03/2026, amanhã, segunda que vem)",
-                    "intents": [{"intent": "agendar_consulta", "confidence": 1.0}],
-                    "entities": [],
-                }
-
-            # Aceita "no direito/no esquerdo" como resposta válida para a pergunta de irradiação ao braço esquerdo.
-            arm_side = self._arm_side(norm)
-            if arm_side == "direito":
-                is_no = True
-            if arm_side == "esquerdo":
-                is_yes = True
-
-            mentions_jaw = any(w in norm for w in ["mandibula", "mandíbula"])
-            if mentions_jaw:
-                is_yes = True
-
-            if is_yes:
-                ctx["emergency_irradia"] = True
-                ctx["state"] = "emergencia_sintomas"
-                return {
-                    "text": "Obrigado. Agora responda **Sim** ou **Não**: você sente falta de ar, náusea ou suor frio agora?",
-                    "intents": [{"intent": "emergencia_irradia_sim", "confidence": 1.0}],
-                    "entities": [],
-                }
-            if is_no:
-                ctx["emergency_irradia"] = False
-                ctx["state"] = "emergencia_sintomas"
-                return {
-                    "text": "Entendi. Agora responda **Sim** ou **Não**: você sente falta de ar, náusea ou suor frio agora?",
-                    "intents": [{"intent": "emergencia_irradia_nao", "confidence": 1.0}],
-                    "entities": [],
-                }
-
-            # Se a pessoa está confusa ("sim ou não o quê?"), deixa explícito qual pergunta está ativa.
-            if any(w in norm for w in ["sim ou nao", "sim ou não", "o que", "oq", "do que"]):
-                return {
-                    "text": "Só para eu seguir a triagem: **a dor/pressão se espalha para o braço esquerdo ou para a mandíbula?** (Sim/Não)",
-                    "intents": [{"intent": "emergencia_clarificar", "confidence": 1.0}],
-                    "entities": [],
-                }
-
-            # Escape hatch: não fica preso pedindo Sim/Não para sempre.
-            ctx["emergency_attempts"] = int(ctx.get("emergency_attempts") or 0) + 1
-            if ctx["emergency_attempts"] >= 2:
-                ctx["state"] = "start"
-                return {
-                    "text": (
-                        "Tudo bem. Eu não quero te prender em perguntas.\n\n"
-                        "Você prefere:\n"
-                        "- agendar uma consulta, ou\n"
-                        "- descrever rapidamente o que está sentindo (ex.: dor no peito, falta de ar, palpitações)?"
-                    ),
-                    "intents": [{"intent": "emergencia_escape", "confidence": 1.0}],
-                    "entities": [],
-                }
-
-            return {
-                "text": "Responda com **Sim** ou **Não**: a dor/pressão se espalha para o braço esquerdo ou para a mandíbula?",
-                "intents": [{"intent": "emergencia_irradia_reprompt", "confidence": 1.0}],
-                "entities": [],
-            }
-
-        # Estado: emergência (pergunta 2) - sintomas associados
-        if state == "emergencia_sintomas":
-            if self._wants_doctor(norm):
-                ctx["state"] = "agendamento_data"
-                return {
-                    "text": "Posso pré-agendar uma consulta por aqui. Para qual dia você gostaria de marcar? (Ex: 10/03/2026, amanhã, segunda que vem)",
-                    "intents": [{"intent": "agendar_consulta", "confidence": 1.0}],
-                    "entities": [],
-                }
-
-            if is_yes or any(w in norm for w in ["falta de ar", "suor frio", "nausea", "náusea", "tontura", "desmaio"]):
-                ctx["state"] = "start"
-                return {
-                    "text": (
-                        "Sinais de alerta identificados.\n\n"
-                        "Procure **atendimento de emergência imediatamente**.\n\n"
-                        "Se você quiser, depois disso eu posso ajudar a pré-agendar um retorno com cardiologista."
-                    ),
-                    "intents": [{"intent": "emergencia_alta", "confidence": 1.0}],
-                    "entities": [{"entity": "risk", "value": "alto"}],
-                }
-
-            if is_no:
-                ctx["state"] = "agendamento_data"
-                return {
-                    "text": (
-                        "Entendi. Mesmo sem outros sinais agora, dor no peito merece avaliação.\n\n"
-                        "Quer pré-agendar uma consulta? Para qual dia você gostaria de marcar?"
-                    ),
-                    "intents": [{"intent": "emergencia_media", "confidence": 1.0}],
-                    "entities": [{"entity": "risk", "value": "moderado"}],
-                }
-
-            if any(w in norm for w in ["sim ou nao", "sim ou não", "o que", "oq", "do que"]):
-                return {
-                    "text": "Só para eu seguir: **você sente falta de ar, náusea ou suor frio agora?** (Sim/Não)",
-                    "intents": [{"intent": "emergencia_clarificar_2", "confidence": 1.0}],
-                    "entities": [],
-                }
-
-            ctx["emergency_attempts_2"] = int(ctx.get("emergency_attempts_2") or 0) + 1
-            if ctx["emergency_attempts_2"] >= 2:
-                ctx["state"] = "start"
-                return {
-                    "text": "Tudo bem. Quer que eu pré-agende uma consulta ou prefere descrever o sintoma principal com outras palavras?",
-                    "intents": [{"intent": "emergencia_escape_2", "confidence": 1.0}],
-                    "entities": [],
-                }
-
-            return {
-                "text": "Responda com **Sim** ou **Não**: você sente falta de ar, náusea ou suor frio agora?",
-                "intents": [{"intent": "emergencia_sintomas_reprompt", "confidence": 1.0}],
-                "entities": [],
-            }
-
-        # Estado: aguardando data do agendamento
-        if state == "agendamento_data":
-            if self._looks_like_date(raw):
-                # Depois da data, pedimos uma observacao/motivo (estado dedicado) para nao entrar em loop.
-                ctx["state"] = "agendamento_observacao"
-                txt = self._dialog_text_for_condition("@sys-date") or f"Entendido. Consulta pré-agendada para **{raw.strip()}**."
-                # substitui placeholder usado no export
-                txt = txt.replace("<? @sys-date ?>", raw.strip())
-                return {
-                    "text": txt,
-                    "intents": [{"intent": "informar_data", "confidence": 1.0}],
-                    "entities": [{"entity": "sys-date", "value": raw.strip()}],
-                }
-            return {
-                "text": "Me diga uma data para eu pré-agendar (ex: `10/03/2026`).",
-                "intents": [{"intent": "pedir_data", "confidence": 1.0}],
-                "entities": [],
-            }
-
-        # Estado: coletando observacao/motivo do agendamento
-        if state == "agendamento_observacao":
-            ctx["state"] = "start"
-            motivo = raw.strip()
-            if not motivo:
-                return {
-                    "text": "Tudo bem. Consulta pré-agendada. Posso te ajudar com mais alguma coisa?",
-                    "intents": [{"intent": "confirmar_agendamento", "confidence": 1.0}],
-                    "entities": [],
-                }
-            # Se o usuario mandar outra data aqui, trate como observacao mesmo (nao reinicia fluxo).
-            return {
-                "text": f"Perfeito. Registrei a observação: **{motivo}**.\n\nPosso te ajudar com mais alguma coisa?",
-                "intents": [{"intent": "confirmar_agendamento", "confidence": 1.0}],
-                "entities": [{"entity": "observacao", "value": motivo}],
-            }
-
-        # Estado: esclarecendo localizacao/descricao de dor (antes de assumir dor no peito)
-        if state == "dor_esclarecimento":
-            # Se o usuario negar explicitamente "peito", NAO dispare emergencia.
-            if ("nao" in norm or "não" in norm) and "peito" in norm:
-                ctx["state"] = "start"
-                return {
-                    "text": (
-                        "Entendi, então **não é dor no peito**.\n\n"
-                        "Para eu não te orientar errado, me diga onde é a dor (ex.: barriga, costas, cabeça, dente...) "
-                        "e se você tem algum sintoma como falta de ar, palpitações, tontura, náusea ou suor frio."
-                    ),
-                    "intents": [{"intent": "esclarecer_dor", "confidence": 1.0}],
-                    "entities": [{"entity": "dor_no_peito", "value": "nao"}],
-                }
-
-            # Se mencionar peito sem negacao, ai sim segue o fluxo de emergencia.
-            if "peito" in norm:
-                ctx["state"] = "emergencia_irradia"
-                # No modo LOCAL, preferimos uma pergunta binária (uma coisa por vez),
-                # em vez de reutilizar o texto do export (que costuma juntar 2 perguntas).
-                return {
-                    "text": "Responda **Sim** ou **Não**: a dor/pressão se espalha para o braço esquerdo ou para a mandíbula?",
-                    "intents": [{"intent": "dor_no_peito", "confidence": 0.9}],
-                    "entities": [],
-                }
-
-            # Palavras de localizacao fora do escopo cardiologico: faz redirecionamento.
-            if any(w in norm for w in ["dente", "dent", "rabiga", "bunda", "anus", "ânus"]):
-                ctx["state"] = "start"
-                return {
-                    "text": (
-                        "Entendi. Isso parece fugir do meu foco (cardiologia).\n\n"
-                        "Se você quiser, eu posso ajudar a **organizar** o que você está sentindo (para levar a uma consulta) "
-                        "ou, se houver sintomas cardíacos, seguir com uma triagem por aqui.\n\n"
-                        "Você prefere organizar as informações ou falar de sintomas como dor no peito, falta de ar ou palpitações?"
-                    ),
-                    "intents": [{"intent": "fora_escopo", "confidence": 1.0}],
-                    "entities": [],
-                }
-
-            # Se nao deu para entender, continua perguntando.
-            return {
-                "text": (
-                    "Entendi. Só para eu acertar:\n\n"
-                    "Onde exatamente é a dor (peito, costas, barriga, cabeça, dente...)?"
-                ),
-                "intents": [{"intent": "esclarecer_dor", "confidence": 1.0}],
-                "entities": [],
-            }
-
-        # Classifica intenção a partir das intents do JSON
-        intent, score = self._best_intent(raw)
-        ctx.get("history", []).append(
-            {"role": "user", "text": raw.strip(), "ts": datetime.now(timezone.utc).isoformat()}
-        )
-
-        # Dor no braço (muito comum em conversa humana): não dispare emergência direto.
-        if "dor" in norm and any(w in norm for w in ["braco", "braço"]) and "peito" not in norm and state == "start":
-            ctx["state"] = "braco_lado"
-            return {
-                "text": "Entendi: dor no braço. É no braço **esquerdo** ou **direito**?",
-                "intents": [{"intent": "dor_no_braco", "confidence": 1.0}],
-                "entities": [],
-            }
-
-        # Fluxo: dor no braço -> coletar lado
-        if state == "braco_lado":
-            side = self._arm_side(norm)
-            if side:
-                ctx["arm_side"] = side
-                ctx["state"] = "braco_peito"
-                return {
-                    "text": "Obrigado. Agora responda **Sim** ou **Não**: você também sente dor/pressão no **peito**?",
-                    "intents": [{"intent": "braco_lado_informado", "confidence": 1.0}],
-                    "entities": [{"entity": "arm_side", "value": side}],
-                }
-            return {
-                "text": "Só para eu registrar: é no braço **esquerdo** ou **direito**?",
-                "intents": [{"intent": "braco_lado_perguntar", "confidence": 1.0}],
-                "entities": [],
-            }
-
-        # Fluxo: dor no braço -> pergunta se há dor no peito
-        if state == "braco_peito":
-            if self._wants_doctor(norm):
-                ctx["state"] = "agendamento_data"
-                return {
-                    "text": "Posso pré-agendar uma consulta por aqui. Para qual dia você gostaria de marcar?",
-                    "intents": [{"intent": "agendar_consulta", "confidence": 1.0}],
-                    "entities": [],
-                }
-            if is_yes or "peito" in norm:
-                ctx["state"] = "emergencia_irradia"
-                return {
-                    "text": "Entendi. Responda **Sim** ou **Não**: a dor/pressão se espalha para o braço esquerdo ou para a mandíbula?",
-                    "intents": [{"intent": "dor_no_peito", "confidence": 1.0}],
-                    "entities": [],
-                }
-            if is_no:
-                ctx["state"] = "braco_sintomas"
-                return {
-                    "text": "Entendi. Responda **Sim** ou **Não**: você tem falta de ar, tontura, náusea ou suor frio junto dessa dor?",
-                    "intents": [{"intent": "braco_sem_peito", "confidence": 1.0}],
-                    "entities": [],
-                }
-            # Evita travar o usuario: explica a pergunta e oferece saida.
-            if any(w in norm for w in ["sim ou nao", "sim ou não", "o que", "oq", "do que", "como assim"]):
-                return {
-                    "text": "Só para eu entender o risco: **além do braço, você sente dor/pressão no peito?** (Sim/Não)",
-                    "intents": [{"intent": "braco_peito_clarificar", "confidence": 1.0}],
-                    "entities": [],
-                }
-
-            ctx["braco_attempts"] = int(ctx.get("braco_attempts") or 0) + 1
-            if ctx["braco_attempts"] >= 2:
-                ctx["state"] = "start"
-                return {
-                    "text": (
-                        "Tudo bem. Sem essa resposta eu não quero te orientar errado.\n\n"
-                        "Você prefere:\n"
-                        "- pré-agendar uma consulta, ou\n"
-                        "- descrever a dor em 1 frase (ex.: pontada, formigamento, começou quando)?"
-                    ),
-                    "intents": [{"intent": "braco_escape", "confidence": 1.0}],
-                    "entities": [],
-                }
-
-            return {
-                "text": "Para eu seguir: além do braço, você sente dor/pressão no **peito**? (Sim/Não)",
-                "intents": [{"intent": "braco_peito_reprompt", "confidence": 1.0}],
-                "entities": [],
-            }
-
-        # Fluxo: dor no braço -> sintomas associados
-        if state == "braco_sintomas":
-            if self._wants_doctor(norm):
-                ctx["state"] = "agendamento_data"
-                return {
-                    "text": "Posso pré-agendar uma consulta por aqui. Para qual dia você gostaria de marcar?",
-                    "intents": [{"intent": "agendar_consulta", "confidence": 1.0}],
-                    "entities": [],
-                }
-            if is_yes or any(w in norm for w in ["falta de ar", "tontura", "nausea", "náusea", "suor frio", "desmaio"]):
-                ctx["state"] = "start"
-                return {
-                    "text": "Entendi. Esses sinais podem indicar maior risco. Procure avaliação médica com urgência. Se quiser, posso pré-agendar uma consulta.",
-                    "intents": [{"intent": "braco_alerta", "confidence": 1.0}],
-                    "entities": [{"entity": "risk", "value": "moderado"}],
-                }
-            if is_no:
-                ctx["state"] = "agendamento_data"
-                return {
-                    "text": "Entendi. Posso pré-agendar uma consulta para você investigar isso com calma. Para qual dia você gostaria de marcar?",
-                    "intents": [{"intent": "agendar_consulta", "confidence": 1.0}],
-                    "entities": [],
-                }
-            return {
-                "text": "Responda com **Sim** ou **Não**: você tem falta de ar, tontura, náusea ou suor frio junto dessa dor?",
-                "intents": [{"intent": "braco_sintomas_reprompt", "confidence": 1.0}],
-                "entities": [],
-            }
-
-        # Dor fora do contexto cardiologico: pede esclarecimento antes de disparar emergencia.
-        if "dor" in norm and intent is None:
-            ctx["state"] = "dor_esclarecimento"
-            return {
-                "text": (
-                    "Entendi que você está com dor.\n\n"
-                    "Para eu te orientar melhor, me diga:\n"
-                    "1) Onde é a dor (peito, costas, barriga, cabeça, dente...)?\n"
-                    "2) Começou quando?\n"
-                    "3) Tem falta de ar, tontura, náusea ou suor frio junto?"
-                ),
-                "intents": [{"intent": "esclarecer_dor", "confidence": 1.0}],
-                "entities": [],
-            }
-
-        # Sintomas claramente fora do escopo cardiologico: faz redirecionamento sem travar fluxo.
-        if any(w in norm for w in ["dente", "dent", "rabiga", "bunda", "anus", "ânus"]) and intent != "dor_no_peito":
-            return {
-                "text": (
-                    "Entendi. Isso parece fugir do meu foco (cardiologia).\n\n"
-                    "Se você quiser, eu posso:\n"
-                    "- ajudar a **organizar** as informações (para levar a uma consulta)\n"
-                    "- ou **pré-agendar** uma consulta com cardiologista, se houver sintomas cardíacos.\n\n"
-                    "Você quer organizar as informações ou falar de sintomas como dor no peito, falta de ar ou palpitações?"
-                ),
-                "intents": [{"intent": "fora_escopo", "confidence": 1.0}],
-                "entities": [],
-            }
-
-        if intent == "dor_no_peito":
-            ctx["state"] = "emergencia_irradia"
-            return {
-                "text": "Responda **Sim** ou **Não**: a dor/pressão se espalha para o braço esquerdo ou para a mandíbula?",
-                "intents": [{"intent": intent, "confidence": score}],
-                "entities": [],
-            }
-
-        if intent == "agendar_consulta":
-            ctx["state"] = "agendamento_data"
-            txt = self._dialog_text_for_condition("#agendar_consulta") or "Certo, vamos agendar. Para qual dia você gostaria de marcar a consulta?"
-            return {"text": txt, "intents": [{"intent": intent, "confidence": score}], "entities": []}
-
-        if intent == "falta_de_ar":
-            txt = self._dialog_text_for_condition("#falta_de_ar") or (
-                "Entendi. Falta de ar pode ter várias causas.\n\n"
-                "Você está com dor no peito, tontura ou lábios arroxeados agora?"
-            )
-            return {"text": txt, "intents": [{"intent": intent, "confidence": score}], "entities": []}
-
-        if intent == "info_pressao":
-            txt = self._dialog_text_for_condition("#info_pressao") or (
-                "Pressão alta é quando a pressão arterial fica frequentemente elevada.\n\n"
-                "Se você tiver uma medida recente (ex: 150/95), pode me dizer?"
-            )
-            return {"text": txt, "intents": [{"intent": intent, "confidence": score}], "entities": []}
-
-        if intent == "agradecimento":
-            txt = self._dialog_text_for_condition("#agradecimento") or "De nada. Como posso te ajudar?"
-            return {"text": txt, "intents": [{"intent": intent, "confidence": score}], "entities": []}
-
-        if intent == "saudacao":
-            txt = self._dialog_text_for_condition("#saudacao") or "Olá! Como posso ajudar?"
-            return {"text": txt, "intents": [{"intent": intent, "confidence": score}], "entities": []}
-
-        # Sim/Não fora de contexto: conversa humanizada precisa pedir esclarecimento.
-        if is_yes or is_no:
-            return {
-                "text": (
-                    "Entendi. Só para eu não te orientar errado:\n\n"
-                    "1) Você quer **agendar uma consulta**?\n"
-                    "ou\n"
-                    "2) Você está com **algum sintoma agora** (dor no peito, falta de ar, palpitações)?\n\n"
-                    "Me diga qual opção faz mais sentido para você."
-                ),
-                "intents": [{"intent": "esclarecer_contexto", "confidence": 1.0}],
-                "entities": [],
-            }
-
-        # Fallback do JSON
-        txt = self._dialog_text_for_condition("anything_else") or "Desculpe, não entendi. Tente: \"Quero agendar uma consulta\"."
-
-        # Heurística útil (não substitui o Watson): leitura de pressão no formato 150/95
-        m = re.search(r"\b(\d{2,3})\s*/\s*(\d{2,3})\b", raw)
-        if m:
-            sys = int(m.group(1))
-            dia = int(m.group(2))
-            if sys >= 180 or dia >= 120:
-                return {
-                    "text": f"Uma medida de **{sys}/{dia}** pode indicar urgência.\n\nSe você estiver com sintomas (dor no peito, falta de ar, confusão), procure atendimento imediatamente.",
-                    "intents": [{"intent": "info_pressao", "confidence": 0.9}],
-                    "entities": [{"entity": "pressao", "value": f"{sys}/{dia}"}],
-                }
-            if sys >= 140 or dia >= 90:
-                return {
-                    "text": f"Uma medida de **{sys}/{dia}** está acima do ideal.\n\nSe isso for frequente, vale agendar uma avaliação. Você quer pré-agendar uma consulta?",
-                    "intents": [{"intent": "info_pressao", "confidence": 0.9}],
-                    "entities": [{"entity": "pressao", "value": f"{sys}/{dia}"}],
-                }
-            return {
-                "text": f"**{sys}/{dia}** parece dentro de um intervalo comum.\n\nSe houver sintomas ou dúvidas, posso ajudar a organizar as informações ou pré-agendar uma consulta.",
-                "intents": [{"intent": "info_pressao", "confidence": 0.7}],
-                "entities": [{"entity": "pressao", "value": f"{sys}/{dia}"}],
-            }
-
-        return {"text": txt, "intents": [], "entities": []}
+        text = normalize(raw)
+        norm = text.folded
+        dialog = self._dialog
+        compiled = dialog.states[ctx.state]
+        turn = _Turn(ctx, raw, norm, compiled.automaton.scan(norm))
+        for step in compiled.steps:
+            if step is _CLASSIFY or step is _RECORD:
+                if step is _CLASSIFY:
+                    turn.intent, turn.score = self._best_intent(text, turn.hits, dialog)
+                ctx.record(turn.intent)
+                continue
+            if not step.when(turn):
+                continue
+            if step.update is not None:
+                step.update(turn)
+            if step.goto is not None:
+                ctx.state = _STATE_CODES[step.goto]
+            return step.reply(turn)
+        raise AssertionError(f"estado sem regra final: {ctx.state_name}")
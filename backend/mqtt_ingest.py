@@ -0,0 +1,407 @@
+from __future__ import annotations
+
+import json
+import os
+import queue
+import random
+import socket
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from backend.metrics import METRICS
+from backend.phase3_vitals import risk_check_local
+from backend.vitals_store import VitalsStore, device_time_ms
+
+METRICS.describe("cardioia_mqtt_messages_total", "counter", "Mensagens MQTT de sinais vitais por resultado (stored/invalid/dropped/failed).")
+METRICS.describe("cardioia_mqtt_ingest_lag_seconds", "histogram", "Atraso entre o `ts` da leitura no dispositivo e a gravacao.")
+METRICS.describe("cardioia_mqtt_batch_seconds", "histogram", "Duracao de cada lote (parse + gravacao + regras de alerta).")
+METRICS.describe("cardioia_mqtt_connects_total", "counter", "Conexoes ao broker MQTT (result=ok|error) e quedas (result=lost).")
+METRICS.describe("cardioia_mqtt_alerts_total", "counter", "Alertas da regra da Fase 3 disparados por leituras recebidas via MQTT.")
+
+DEFAULT_TOPIC = "cardioia/grupo1/vitals"  # o mesmo dos dispositivos da Fase 3 (`FASE3/tools/mqtt_evidence.py`)
+
+
+def mqtt_ingest_enabled() -> bool:
+    return os.getenv("CARDIOIA_MQTT_INGEST", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class _Message:
+    topic: str
+    payload: bytes
+    received_at: float
+    ack: Callable[[], Any] | None
+
+
+class Backoff:
+    """Espera exponencial com jitter entre tentativas de conexao; `reset()` depois de conectar."""
+
+    def __init__(self, base_s: float = 1.0, max_s: float = 60.0, rng: random.Random | None = None) -> None:
+        self.base_s = base_s
+        self.max_s = max_s
+        self.attempt = 0
+        self._rng = rng or random.Random()
+
+    def next_delay(self) -> float:
+        ceiling = min(self.max_s, self.base_s * 2**self.attempt)
+        self.attempt += 1
+        # "Full jitter": varios workers/pontes reconectando nao batem no broker ao mesmo tempo.
+        return self._rng.uniform(ceiling / 2, ceiling)
+
+    def reset(self) -> None:
+        self.attempt = 0
+
+
+class MqttIngestBridge:
+    """
+    Ponte MQTT -> serie temporal de sinais vitais + regra de alerta da Fase 3.
+
+    O callback do cliente MQTT so enfileira (`handle`); uma thread junta as mensagens em lotes
+    (`batch_size` ou `batch_ms`, o que vier primeiro), grava um bloco por paciente no `VitalsStore`
+    e so entao confirma (QoS 1 com ack manual, paho-mqtt >= 2): se o processo cair no meio do lote,
+    o broker reenvia (pelo menos uma vez). Paciente: `patient_id`/`device_id` do payload, nivel extra
+    do topico (`cardioia/grupo1/vitals/<paciente>`) ou `default_patient`.
+    """
+
+    def __init__(
+        self,
+        store: VitalsStore,
+        topic: str | None = None,
+        batch_size: int | None = None,
+        batch_ms: float | None = None,
+        max_queue: int | None = None,
+        default_patient: str | None = None,
+        on_alert: Callable[[dict[str, Any]], Any] | None = None,
+    ) -> None:
+        self.store = store
+        self.topic = (topic or os.getenv("CARDIOIA_MQTT_TOPIC") or DEFAULT_TOPIC).strip()
+        self.batch_size = max(1, batch_size or int(_env_float("CARDIOIA_MQTT_BATCH_SIZE", 200)))
+        self.batch_s = (batch_ms if batch_ms is not None else _env_float("CARDIOIA_MQTT_BATCH_MS", 250)) / 1000
+        self.default_patient = default_patient or (os.getenv("CARDIOIA_MQTT_DEFAULT_PATIENT") or "fase3").strip()
+        self.on_alert = on_alert
+        # Alertas republicados no broker (QoS 1) para quem acompanha em tempo real (ex.: o simulador mede a latencia).
+        self.alert_topic = (os.getenv("CARDIOIA_MQTT_ALERT_TOPIC") or "").strip()
+        self._queue: queue.Queue[_Message] = queue.Queue(maxsize=max_queue or int(_env_float("CARDIOIA_MQTT_QUEUE", 10000)))
+        self._process_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._pid: int | None = None
+        self._client: Any = None
+
+        self.started_at = time.time()
+        self.connected = False
+        self.connects = 0
+        self.disconnects = 0
+        self.last_error: str | None = None
+        self.received = 0
+        self.stored = 0
+        self.invalid = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.alerts: deque[dict[str, Any]] = deque(maxlen=50)
+        self._lags: deque[float] = deque(maxlen=1024)
+        self._recent: deque[tuple[float, int]] = deque()  # (fim do lote, leituras) nos ultimos 60 s
+
+    # --- entrada (thread do cliente MQTT) ---
+
+    def handle(self, topic: str, payload: bytes | str, ack: Callable[[], Any] | None = None) -> bool:
+        """Enfileira uma mensagem. Fila cheia por mais de 1 s => descartada (e sem ack: o broker reenvia)."""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        with self._stats_lock:
+            self.received += 1
+        try:
+            self._queue.put(_Message(topic, payload, time.time(), ack), timeout=1.0)
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            METRICS.inc("cardioia_mqtt_messages_total", result="dropped")
+            return False
+
+    # --- lotes ---
+
+    def _next_batch(self, wait_s: float) -> list[_Message]:
+        try:
+            batch = [self._queue.get(timeout=wait_s)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_s
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self) -> int:
+        """Processa o que estiver na fila agora (testes, desligamento). Retorna leituras gravadas."""
+        total = 0
+        while True:
+            batch = self._next_batch(0)
+            if not batch:
+                return total
+            total += self.process(batch)
+
+    def _patient_for(self, topic: str, reading: dict[str, Any]) -> str:
+        pid = reading.get("patient_id", reading.get("device_id"))
+        if pid is not None:
+            return str(pid)
+        base = self.topic.split("/")
+        levels = topic.split("/")
+        if "#" not in base and len(levels) > len(base) and all(b in ("+", lvl) for b, lvl in zip(base, levels)):
+            return levels[len(base)]
+        return self.default_patient
+
+    def process(self, batch: list[_Message]) -> int:
+        with self._process_lock:
+            t0 = time.perf_counter()
+            by_patient: dict[str, list[dict[str, Any]]] = {}
+            invalid = 0
+            for msg in batch:
+                try:
+                    data = json.loads(msg.payload)
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    data = None
+                readings = data if isinstance(data, list) else [data]
+                if not all(isinstance(r, dict) for r in readings):
+                    invalid += 1
+                    continue
+                for reading in readings:
+                    # Sem `ts`, ou com uptime do ESP32 no lugar do relogio, vale a hora em que a mensagem chegou.
+                    try:
+                        reading["ts"] = device_time_ms(reading.get("ts"), msg.received_at)
+                    except ValueError:
+                        invalid += 1
+                        continue
+                    reading["_ts_s"] = reading["ts"] / 1000
+                    by_patient.setdefault(self._patient_for(msg.topic, reading), []).append(reading)
+
+            stored = failed = 0
+            alerts: list[dict[str, Any]] = []
+            lags: list[float] = []
+            for patient, readings in by_patient.items():
+                try:
+                    stored += self.store.append(patient, readings)
+                except ValueError as e:  # paciente invalido: descarta (reenviar nao resolveria)
+                    invalid += len(readings)
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    continue
+                except OSError as e:
+                    failed += len(readings)
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    continue
+                now = time.time()
+                for reading in readings:
+                    lags.append(max(0.0, now - reading["_ts_s"]))
+                    risk = risk_check_local(_float(reading.get("temp")), _float(reading.get("bpm", reading.get("heart_rate"))))
+                    if risk["alerts"]:
+                        alerts.append({"patient_id": patient, "ts": reading["ts"], **risk})
+
+            # Ack so depois de gravar; um lote com falha fica sem ack e o broker reenvia na reconexao.
+            if not failed:
+                for msg in batch:
+                    if msg.ack is not None:
+                        try:
+                            msg.ack()
+                        except Exception as e:
+                            self.last_error = f"ack: {e}"
+
+            end = time.time()
+            with self._stats_lock:
+                self.batches += 1
+                self.stored += stored
+                self.invalid += invalid
+                self.failed += failed
+                self._lags.extend(lags)
+                self.alerts.extend(alerts)
+                self._recent.append((end, stored))
+                while self._recent and self._recent[0][0] < end - 60:
+                    self._recent.popleft()
+        METRICS.observe("cardioia_mqtt_batch_seconds", time.perf_counter() - t0)
+        for result, count in (("stored", stored), ("invalid", invalid), ("failed", failed)):
+            if count:
+                METRICS.inc("cardioia_mqtt_messages_total", count, result=result)
+        for lag in lags:
+            METRICS.observe("cardioia_mqtt_ingest_lag_seconds", lag)
+        for alert in alerts:
+            for name in alert["alerts"]:
+                METRICS.inc("cardioia_mqtt_alerts_total", alert=name)
+            if self.on_alert is not None:
+                self.on_alert(alert)
+            if self.alert_topic and self._client is not None:
+                self._client.publish(self.alert_topic, json.dumps(alert, ensure_ascii=False), qos=1)
+        return stored
+
+    def _drain(self) -> None:
+        while not self._stop.is_set():
+            batch = self._next_batch(0.5)
+            if batch:
+                try:
+                    self.process(batch)
+                except Exception as e:
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    print(f"MQTT ingest: erro ao processar lote: {e}")
+        self.flush()
+
+    # --- conexao (paho-mqtt, opcional) ---
+
+    def _build_client(self) -> Any:
+        import paho.mqtt.client as mqtt  # opcional: so quando CARDIOIA_MQTT_INGEST=1
+
+        fixed_id = (os.getenv("CARDIOIA_MQTT_CLIENT_ID") or "").strip()
+        client_id = fixed_id or f"cardioia-ingest-{socket.gethostname()}-{os.getpid()}"
+        # Sessao persistente so com id fixo: o broker guarda as mensagens QoS 1 enquanto estamos fora.
+        kwargs: dict[str, Any] = {"client_id": client_id, "clean_session": not fixed_id}
+        if hasattr(mqtt, "CallbackAPIVersion"):  # paho-mqtt >= 2: ack manual depois da gravacao
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, manual_ack=True, **kwargs)
+            manual_ack = True
+        else:
+            client = mqtt.Client(**kwargs)
+            manual_ack = False
+
+        user = (os.getenv("CARDIOIA_MQTT_USERNAME") or "").strip()
+        if user:
+            client.username_pw_set(user, os.getenv("CARDIOIA_MQTT_PASSWORD") or "")
+        if os.getenv("CARDIOIA_MQTT_TLS", "0").strip().lower() in ("1", "true", "yes", "on"):
+            import ssl
+
+            client.tls_set_context(ssl.create_default_context())
+        client.reconnect_delay_set(min_delay=1, max_delay=int(_env_float("CARDIOIA_MQTT_BACKOFF_MAX_S", 60)))
+
+        qos = int(_env_float("CARDIOIA_MQTT_QOS", 1))
+        shared = (os.getenv("CARDIOIA_MQTT_SHARED_GROUP") or "").strip()
+        # O topico base e o nivel com o paciente (`.../vitals/<paciente>`). Assinatura compartilhada:
+        # varios workers/pontes dividem as mensagens em vez de duplicar.
+        topics = [self.topic] if self.topic.endswith("#") else [self.topic, f"{self.topic}/+"]
+        subscriptions = [(f"$share/{shared}/{t}" if shared else t, qos) for t in topics]
+
+        # Callbacks aceitam as assinaturas do paho 1.x e 2.x (reason code como int ou `ReasonCode`).
+        def on_connect(c: Any, _userdata: Any, _flags: Any, rc: Any, *_: Any) -> None:
+            if rc != 0:
+                self.last_error = f"connack rc={rc}"
+                METRICS.inc("cardioia_mqtt_connects_total", result="error")
+                return
+            self.connected = True
+            self.connects += 1
+            METRICS.inc("cardioia_mqtt_connects_total", result="ok")
+            c.subscribe(subscriptions)  # de novo a cada reconexao (sessao limpa perde a assinatura)
+
+        def on_disconnect(_c: Any, _userdata: Any, *args: Any) -> None:
+            rc = args[1] if len(args) > 2 else args[0]
+            self.connected = False
+            if rc != 0:
+                self.disconnects += 1
+                METRICS.inc("cardioia_mqtt_connects_total", result="lost")
+
+        def on_message(c: Any, _userdata: Any, msg: Any) -> None:
+            ack = (lambda mid=msg.mid, q=msg.qos: c.ack(mid, q)) if manual_ack and msg.qos > 0 else None
+            self.handle(msg.topic, msg.payload, ack)
+
+        client.on_connect = on_connect
+        client.on_disconnect = on_disconnect
+        client.on_message = on_message
+        return client
+
+    def _run_client(self) -> None:
+        host = (os.getenv("CARDIOIA_MQTT_HOST") or "127.0.0.1").strip()
+        port = int(_env_float("CARDIOIA_MQTT_PORT", 1883))
+        backoff = Backoff(max_s=_env_float("CARDIOIA_MQTT_BACKOFF_MAX_S", 60))
+        try:
+            self._client = self._build_client()
+        except ImportError:
+            self.last_error = "paho-mqtt nao instalado"
+            print("MQTT ingest indisponivel: instale com `pip install paho-mqtt`.")
+            return
+        while not self._stop.is_set():
+            try:
+                self._client.connect(host, port, keepalive=30)
+                backoff.reset()
+                # Depois da primeira conexao o proprio paho reconecta (espera exponencial ate o maximo).
+                self._client.loop_forever(retry_first_connection=True)
+            except Exception as e:
+                self.connected = False
+                self.last_error = f"{type(e).__name__}: {e}"
+                METRICS.inc("cardioia_mqtt_connects_total", result="error")
+            if not self._stop.is_set():
+                self._stop.wait(backoff.next_delay())
+
+    def ensure_started(self) -> None:
+        """Sobe as threads (cliente + lotes) uma vez por processo; seguro com preload + fork do gunicorn."""
+        if self._threads and self._pid == os.getpid() and all(t.is_alive() for t in self._threads):
+            return
+        with self._start_lock:
+            if self._threads and self._pid == os.getpid() and all(t.is_alive() for t in self._threads):
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._drain, name="cardioia-mqtt-batches", daemon=True),
+                threading.Thread(target=self._run_client, name="cardioia-mqtt-client", daemon=True),
+            ]
+            for t in self._threads:
+                t.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._client is not None:
+            try:
+                self._client.disconnect()
+            except Exception:
+                pass
+        for t in self._threads:
+            t.join(timeout)
+
+    def stats(self) -> dict[str, Any]:
+        with self._stats_lock:
+            lags = sorted(self._lags)
+            now = time.time()
+            window = min(60.0, max(1e-9, now - self.started_at))
+            recent = sum(n for t, n in self._recent if t >= now - window)
+            return {
+                "topic": self.topic,
+                "connected": self.connected,
+                "connects": self.connects,
+                "disconnects": self.disconnects,
+                "last_error": self.last_error,
+                "received": self.received,
+                "stored": self.stored,
+                "invalid": self.invalid,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches,
+                "avg_batch": round(self.stored / self.batches, 2) if self.batches else 0.0,
+                "queue": self._queue.qsize(),
+                "readings_per_s": round(recent / window, 2),
+                "lag_p50_s": _quantile(lags, 0.5),
+                "lag_p95_s": _quantile(lags, 0.95),
+                "lag_max_s": round(lags[-1], 4) if lags else None,
+                "recent_alerts": list(self.alerts)[-5:],
+            }
+
+
+def _quantile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(q * len(values)))], 4)
+
+
+def _float(value: Any) -> float | None:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
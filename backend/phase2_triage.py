@@ -5,6 +5,11 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
+from backend.single_flight import group
+from backend.text_normalization import NormalizedText, normalize, phase2_normalize
+
+_TRIAGE_FLIGHTS = group("phase2_triage")
+
 
 @dataclass(frozen=True)
 class Phase2Triage:
@@ -37,13 +42,16 @@ class Phase2TriageService:
 
         mod = importlib.util.module_from_spec(spec)
         spec.loader.exec_module(mod)  # type: ignore[attr-defined]
+        # Mesma normalizacao da Fase 2, mas aceitando um `NormalizedText`: `heuristic_risk` e
+        # `match_sentence` reaproveitam a visao ja calculada em vez de normalizar o texto duas vezes.
+        mod.normalize = phase2_normalize
         return mod
 
     def _load_rules(self):
         if self._mod is None:
             return None
 
-        km = self._phase2_dir / "data" / "knowledge_map.csv"
+        km = self.knowledge_map_path
         if not km.exists():
             return None
 
@@ -52,9 +60,35 @@ class Phase2TriageService:
         except Exception:
             return None
 
-    def triage(self, text: str) -> Phase2Triage:
-        text = (text or "").strip()
-        if not text:
+    @property
+    def knowledge_map_path(self) -> Path:
+        return self._phase2_dir / "data" / "knowledge_map.csv"
+
+    def reload_rules(self) -> int:
+        """
+        Relê o knowledge map e troca as regras numa unica atribuicao. A versao nova e' validada
+        antes (ValueError se vazia/malformada); em caso de erro as regras atuais continuam.
+        """
+        if self._mod is None:
+            raise ValueError("modulo da Fase 2 indisponivel")
+        rules = self._mod.load_knowledge_map(self.knowledge_map_path)
+        if not rules:
+            raise ValueError("knowledge map vazio")
+        for rule in rules:
+            if len(rule) != 3 or not all(isinstance(part, str) for part in rule) or not rule[2]:
+                raise ValueError(f"regra invalida no knowledge map: {rule!r}")
+        self._rules = rules
+        return len(rules)
+
+    def triage(self, text: str | NormalizedText) -> Phase2Triage:
+        nt = normalize(text)
+        if nt.raw != nt.raw.strip():
+            nt = normalize(nt.raw.strip())
+        # Textos identicos (na visao da Fase 2) em paralelo compartilham uma unica varredura das regras.
+        return _TRIAGE_FLIGHTS.do((self, nt.phase2), lambda: self._triage(nt))
+
+    def _triage(self, nt: NormalizedText) -> Phase2Triage:
+        if not nt.raw:
             return Phase2Triage(risk="indefinido", diagnosis={"disease": "Indefinido", "matched": [], "confidence": 0.0})
 
         if self._mod is None:
@@ -65,14 +99,15 @@ class Phase2TriageService:
             )
 
         try:
-            risk = str(self._mod.heuristic_risk(text))
+            risk = str(self._mod.heuristic_risk(nt))
         except Exception:
             risk = "indefinido"
 
         diagnosis: dict[str, Any] = {"disease": "Indefinido", "matched": [], "confidence": 0.0}
-        if self._rules is not None:
+        rules = self._rules  # lido uma vez: `reload_rules` pode trocar a lista no meio da requisicao
+        if rules is not None:
             try:
-                diagnosis = dict(self._mod.suggest_diagnosis(text, self._rules))
+                diagnosis = dict(self._mod.suggest_diagnosis(nt, rules))
             except Exception:
                 diagnosis = {"disease": "Indefinido", "matched": [], "confidence": 0.0}
 
@@ -7,6 +7,8 @@ import urllib.request
 from dataclasses import dataclass
 from typing import Any
 
+from backend.metrics import dependency_call
+
 
 def risk_check_local(temp: float | None, bpm: float | None) -> dict[str, Any]:
     """
@@ -34,10 +36,12 @@ def try_post_phase3(vitals_payload: dict[str, Any]) -> dict[str, Any] | None:
 
     data = json.dumps(vitals_payload).encode("utf-8")
     req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"}, method="POST")
-    try:
-        with urllib.request.urlopen(req, timeout=2.5) as resp:
-            body = resp.read().decode("utf-8", errors="replace")
-            return json.loads(body)
-    except (urllib.error.URLError, TimeoutError, json.JSONDecodeError):
-        return None
+    with dependency_call("phase3", "post_vitals") as call:
+        try:
+            with urllib.request.urlopen(req, timeout=2.5) as resp:
+                body = resp.read().decode("utf-8", errors="replace")
+                return json.loads(body)
+        except (urllib.error.URLError, TimeoutError, json.JSONDecodeError):
+            call.fail()
+            return None
 
@@ -6,6 +6,8 @@ import urllib.error
 import urllib.request
 from typing import Any
 
+from backend.metrics import dependency_call
+
 
 def try_get_phase4_health() -> dict[str, Any] | None:
     base = (os.getenv("PHASE4_CV_URL") or "").strip()
@@ -14,10 +16,12 @@ def try_get_phase4_health() -> dict[str, Any] | None:
 
     url = base.rstrip("/") + "/health"
     req = urllib.request.Request(url, method="GET")
-    try:
-        with urllib.request.urlopen(req, timeout=2.5) as resp:
-            body = resp.read().decode("utf-8", errors="replace")
-            return json.loads(body)
-    except (urllib.error.URLError, TimeoutError, json.JSONDecodeError):
-        return None
+    with dependency_call("phase4", "health") as call:
+        try:
+            with urllib.request.urlopen(req, timeout=2.5) as resp:
+                body = resp.read().decode("utf-8", errors="replace")
+                return json.loads(body)
+        except (urllib.error.URLError, TimeoutError, json.JSONDecodeError):
+            call.fail()
+            return None
 
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from typing import Any
+
+PROFILE_HEADER = "X-CardioIA-Profile"
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def admin_token_ok(token: str | None) -> bool:
+    """Rotas/recursos de admin so existem com `CARDIOIA_ADMIN_TOKEN` configurado."""
+    expected = (os.getenv("CARDIOIA_ADMIN_TOKEN") or "").strip()
+    return bool(expected) and hmac.compare_digest((token or "").strip().encode(), expected.encode())
+
+
+class SamplingProfiler:
+    """
+    Profiler por amostragem para requisicoes ao vivo.
+
+    Uma thread de amostragem le `sys._current_frames()` a cada `interval_s`, mas so enquanto
+    houver requisicoes marcadas para profiling, e so olha as threads dessas requisicoes. As
+    pilhas sao agregadas no formato "collapsed" (`raiz;...;folha contagem`), aceito por
+    flamegraph.pl / speedscope.
+
+    Custo e memoria limitados:
+    - no maximo `max_concurrent` requisicoes perfiladas ao mesmo tempo;
+    - pilhas truncadas em `max_depth` quadros;
+    - no maximo `max_stacks` pilhas distintas (o excedente vai para "<rota>;[outras]").
+    """
+
+    def __init__(
+        self,
+        interval_s: float | None = None,
+        sample_rate: float = 0.0,
+        max_stacks: int | None = None,
+        max_depth: int = 64,
+        max_concurrent: int = 4,
+    ) -> None:
+        self.interval_s = (
+            _env_float("CARDIOIA_PROFILER_INTERVAL_MS", 5.0) / 1000.0 if interval_s is None else interval_s
+        )
+        self.sample_rate = sample_rate
+        self.max_stacks = _env_int("CARDIOIA_PROFILER_MAX_STACKS", 5000) if max_stacks is None else max_stacks
+        self.max_depth = max_depth
+        self.max_concurrent = max_concurrent
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._active: dict[int, str] = {}  # thread id -> rotulo (rota)
+        self._stacks: dict[str, int] = {}
+        self._labels: dict[Any, str] = {}  # code object -> "arquivo:funcao"
+        self.samples = 0
+        self.profiled_requests = 0
+        self.overflow = 0
+
+    # --- decisao por requisicao ---
+
+    def should_profile(self, forced: bool = False) -> bool:
+        if forced:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, label: str, thread_id: int | None = None) -> bool:
+        """Marca a thread (padrao: a atual) para amostragem. Retorna False se o limite estiver cheio."""
+        tid = threading.get_ident() if thread_id is None else thread_id
+        with self._lock:
+            if len(self._active) >= self.max_concurrent and tid not in self._active:
+                return False
+            self._active[tid] = label
+            self.profiled_requests += 1
+            self._ensure_thread()
+            self._wake.set()
+        return True
+
+    def stop(self, thread_id: int | None = None) -> None:
+        tid = threading.get_ident() if thread_id is None else thread_id
+        with self._lock:
+            self._active.pop(tid, None)
+
+    # --- amostragem ---
+
+    def _ensure_thread(self) -> None:
+        # Criada sob demanda (depois do fork, no worker que recebeu a requisicao).
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="cardioia-profiler", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            with self._lock:
+                targets = dict(self._active)
+                if not targets:
+                    self._wake.clear()
+                    continue
+            frames = sys._current_frames()
+            for tid, label in targets.items():
+                frame = frames.get(tid)
+                if frame is not None:
+                    self._record(label, frame)
+            del frames
+            time.sleep(self.interval_s)
+
+    def _frame_label(self, code: Any) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            label = f"{os.path.basename(code.co_filename)}:{name}"
+            self._labels[code] = label
+        return label
+
+    def _record(self, label: str, frame: Any) -> None:
+        parts: list[str] = []
+        while frame is not None and len(parts) < self.max_depth:
+            parts.append(self._frame_label(frame.f_code))
+            frame = frame.f_back
+        parts.append(label)
+        key = ";".join(reversed(parts))
+        with self._lock:
+            self.samples += 1
+            if key in self._stacks:
+                self._stacks[key] += 1
+            elif len(self._stacks) < self.max_stacks:
+                self._stacks[key] = 1
+            else:
+                self.overflow += 1
+                other = f"{label};[outras]"
+                self._stacks[other] = self._stacks.get(other, 0) + 1
+
+    # --- saida ---
+
+    def collapsed(self) -> str:
+        with self._lock:
+            items = sorted(self._stacks.items(), key=lambda kv: kv[1], reverse=True)
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+            self.profiled_requests = 0
+            self.overflow = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "interval_ms": round(self.interval_s * 1000, 3),
+                "active": len(self._active),
+                "profiled_requests": self.profiled_requests,
+                "samples": self.samples,
+                "stacks": len(self._stacks),
+                "max_stacks": self.max_stacks,
+                "overflow": self.overflow,
+            }
+
+
+def install_profiler(app: Any, profiler: SamplingProfiler) -> None:
+    """
+    Perfila as requisicoes sorteadas (`sample_rate`) ou pedidas explicitamente com
+    `X-CardioIA-Profile: 1` + `X-Admin-Token`. O rotulo raiz e' "METODO /rota".
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _profiler_start() -> None:
+        if request.path.startswith("/api/admin/"):
+            return
+        forced = request.headers.get(PROFILE_HEADER) == "1" and admin_token_ok(request.headers.get(ADMIN_TOKEN_HEADER))
+        if not profiler.should_profile(forced):
+            return
+        rule = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        if profiler.start(f"{request.method} {rule}"):
+            g._profiled_thread = threading.get_ident()
+
+    @app.teardown_request
+    def _profiler_stop(_exc: BaseException | None) -> None:
+        # Com `stream_with_context` o teardown so roda no fim do stream: o corpo SSE tambem e' amostrado.
+        tid = g.pop("_profiled_thread", None)
+        if tid is not None:
+            profiler.stop(tid)
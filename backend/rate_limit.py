@@ -0,0 +1,420 @@
+from __future__ import annotations
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from backend.metrics import METRICS
+
+METRICS.describe("cardioia_rate_limit_total", "counter", "Decisoes do limitador por rota e resultado (allowed/limited/error).")
+METRICS.describe("cardioia_rate_limit_check_seconds", "histogram", "Latencia da verificacao do limitador (inclui SQLite/Redis).")
+METRICS.describe("cardioia_llm_inflight", "gauge", "Chamadas a LLM (Watson/Gemini) em andamento neste processo.")
+METRICS.describe("cardioia_llm_queue_wait_seconds", "histogram", "Espera por uma vaga de chamada a LLM.")
+METRICS.describe("cardioia_llm_rejected_total", "counter", "Chamadas a LLM recusadas por excesso de concorrencia.")
+
+# Rotas limitadas por padrao (endpoint do Flask = nome da funcao da rota): `capacidade/segundos`,
+# ou seja, rajada de ate `capacidade` requisicoes, repostas a `capacidade/segundos` por segundo.
+DEFAULT_LIMITS = "message=30/60,message_stream=30/60,clinical_extract=10/60,clinical_extract_stream=10/60"
+
+
+def rate_limit_enabled() -> bool:
+    return os.getenv("CARDIOIA_RATE_LIMIT", "1").strip().lower() not in ("0", "false", "no")
+
+
+@dataclass(frozen=True)
+class Limit:
+    capacity: float
+    per_seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.per_seconds
+
+
+def parse_limits(spec: str) -> dict[str, Limit]:
+    """`"message=30/60,clinical_extract=10/60"` -> {endpoint: Limit}. Entradas invalidas sao ignoradas."""
+    limits: dict[str, Limit] = {}
+    for item in (spec or "").split(","):
+        name, _, value = item.partition("=")
+        capacity, _, seconds = value.partition("/")
+        try:
+            limit = Limit(float(capacity), float(seconds or 1))
+        except ValueError:
+            if item.strip():
+                print(f"Limite ignorado (use rota=capacidade/segundos): {item.strip()}")
+            continue
+        if name.strip() and limit.capacity > 0 and limit.per_seconds > 0:
+            limits[name.strip()] = limit
+    return limits
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    limit: Limit
+    remaining: float
+    retry_after_s: float
+
+
+def _take(tokens: float, updated: float, limit: Limit, now: float, cost: float) -> tuple[bool, float]:
+    """Balde de fichas: repoe pelo tempo decorrido (ate a capacidade) e tenta gastar `cost`."""
+    tokens = min(limit.capacity, tokens + max(0.0, now - updated) * limit.rate)
+    if tokens >= cost:
+        return True, tokens - cost
+    return False, tokens
+
+
+class MemoryBucketStore:
+    """Baldes no proprio processo (cada worker do gunicorn limita separadamente). LRU de `max_keys`."""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self.max_keys = max(1, max_keys)
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit, now: float, cost: float = 1.0) -> tuple[bool, float]:
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (limit.capacity, now))
+            allowed, tokens = _take(tokens, updated, limit, now, cost)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                # Balde esquecido volta cheio: so perde quem estava limitado ha muito tempo.
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+
+class SQLiteBucketStore:
+    """
+    Baldes num arquivo SQLite compartilhado pelos workers da mesma maquina. `BEGIN IMMEDIATE`
+    serializa o ler-calcular-gravar entre processos; baldes ja cheios sao removidos de tempos em tempos.
+
+    A conexao e' aberta por processo, no primeiro uso: o app e' criado no master do gunicorn
+    (`preload_app`) e uma conexao SQLite nao pode atravessar o fork.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str | Path, prune_every: int = 1000) -> None:
+        self.path = Path(path)
+        self.prune_every = max(1, prune_every)
+        self._ops = 0
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._pid = 0
+        self._inherited: list[sqlite3.Connection] = []
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    full_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_buckets_full_at ON buckets(full_at)")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        # Chamado com `_lock`. Conexao herdada de outro pid (fork) fica guardada sem uso e sem
+        # fechar: fechar no filho mexeria nas travas do arquivo que pertencem ao pai.
+        if self._conn is None or self._pid != os.getpid():
+            if self._conn is not None:
+                self._inherited.append(self._conn)
+            self._conn = self._connect()
+            self._pid = os.getpid()
+        return self._conn
+
+    def take(self, key: str, limit: Limit, now: float, cost: float = 1.0) -> tuple[bool, float]:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens, updated = row if row is not None else (limit.capacity, now)
+                allowed, tokens = _take(tokens, updated, limit, now, cost)
+                full_at = now + (limit.capacity - tokens) / limit.rate
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)",
+                    (key, tokens, now, full_at),
+                )
+                self._ops += 1
+                if self._ops % self.prune_every == 0:
+                    conn.execute("DELETE FROM buckets WHERE full_at < ?", (now,))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return allowed, tokens
+
+
+# Mesmo calculo de `_take`, atomico no servidor Redis (ou compativel: Valkey, KeyDB, Dragonfly).
+_REDIS_TAKE = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 't', 'u')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'u', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBucketStore:
+    """Baldes num Redis compartilhado por todas as maquinas (requer `pip install redis`)."""
+
+    name = "redis"
+
+    def __init__(self, url: str) -> None:
+        import redis  # opcional: so quando CARDIOIA_RATE_LIMIT_BACKEND=redis
+
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(_REDIS_TAKE)
+
+    def take(self, key: str, limit: Limit, now: float, cost: float = 1.0) -> tuple[bool, float]:
+        allowed, tokens = self._script(keys=[key], args=[limit.capacity, limit.rate, now, cost])
+        return bool(int(allowed)), float(tokens)
+
+
+class RateLimiter:
+    """
+    Limite por usuario e por rota (balde de fichas). Falha do armazenamento (SQLite travado, Redis
+    fora do ar) libera a requisicao: o limitador protege as cotas, mas nao pode derrubar o chat.
+
+    O `user_id` vem do cliente, entao cada IP tem tambem um balde proprio com `ip_factor` vezes o
+    limite da rota (varios usuarios atras do mesmo NAT): trocar de `user_id` a cada chamada nao
+    escapa do limite. `ip_factor=0` desliga o balde por IP.
+    """
+
+    def __init__(
+        self,
+        store: Any,
+        limits: dict[str, Limit],
+        prefix: str = "cardioia:rl:",
+        clock: Callable[[], float] = time.time,
+        ip_factor: float = 4.0,
+    ) -> None:
+        self.store = store
+        self.limits = limits
+        self.prefix = prefix
+        self._clock = clock
+        self.ip_factor = max(0.0, ip_factor)
+
+    def check_client(self, route: str, user_id: str | None, ip: str, cost: float = 1.0) -> Decision | None:
+        """
+        Balde do IP e, quando o cliente informa `user_id`, tambem o do usuario; vale o que negar. O do
+        usuario e' consultado primeiro: um usuario ja limitado nao gasta as fichas do IP compartilhado.
+        """
+        if not user_id:
+            return self.check(route, f"ip:{ip}", cost)
+        by_user = self.check(route, f"user:{user_id}", cost)
+        if by_user is None or not by_user.allowed or self.ip_factor <= 0:
+            return by_user
+        by_ip = self.check(route, f"ip:{ip}", cost, scale=self.ip_factor)
+        return by_ip if by_ip is not None and not by_ip.allowed else by_user
+
+    def check(self, route: str, user_id: str, cost: float = 1.0, scale: float = 1.0) -> Decision | None:
+        limit = self.limits.get(route)
+        if limit is None:
+            return None
+        if scale != 1.0:
+            limit = Limit(limit.capacity * scale, limit.per_seconds)
+        started = time.perf_counter()
+        try:
+            allowed, tokens = self.store.take(f"{self.prefix}{route}:{user_id}", limit, self._clock(), cost)
+        except Exception as e:
+            print(f"Limitador indisponivel ({self.store.name}); liberando a requisicao: {e}")
+            METRICS.inc("cardioia_rate_limit_total", route=route, result="error")
+            return Decision(True, limit, limit.capacity, 0.0)
+        finally:
+            METRICS.observe("cardioia_rate_limit_check_seconds", time.perf_counter() - started, backend=self.store.name)
+        METRICS.inc("cardioia_rate_limit_total", route=route, result="allowed" if allowed else "limited")
+        retry_after = 0.0 if allowed else (cost - tokens) / limit.rate
+        return Decision(allowed, limit, tokens, retry_after)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "backend": self.store.name,
+            "limits": {name: f"{lim.capacity:g}/{lim.per_seconds:g}s" for name, lim in self.limits.items()},
+            "ip_factor": self.ip_factor,
+        }
+
+
+def build_rate_limiter() -> RateLimiter:
+    """Limitador a partir do ambiente (`CARDIOIA_RATE_LIMIT_*`); backend indisponivel cai para memoria."""
+    limits = parse_limits(os.getenv("CARDIOIA_RATE_LIMITS") or DEFAULT_LIMITS)
+    backend = (os.getenv("CARDIOIA_RATE_LIMIT_BACKEND") or "memory").strip().lower()
+    store: Any = None
+    try:
+        if backend == "sqlite":
+            repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+            path = (os.getenv("CARDIOIA_RATE_LIMIT_SQLITE_PATH") or "").strip() or os.path.join(
+                repo_root, "backend", "data", "rate_limit.db"
+            )
+            store = SQLiteBucketStore(path)
+        elif backend == "redis":
+            store = RedisBucketStore((os.getenv("CARDIOIA_RATE_LIMIT_REDIS_URL") or "redis://localhost:6379/0").strip())
+    except Exception as e:
+        print(f"Backend de rate limit '{backend}' indisponivel; usando memoria: {e}")
+    return RateLimiter(store or MemoryBucketStore(), limits, ip_factor=_env_number("CARDIOIA_RATE_LIMIT_IP_FACTOR", 4.0))
+
+
+def install_rate_limits(app: Any, limiter: RateLimiter) -> None:
+    """
+    Aplica o limitador nas rotas configuradas. O usuario e' o `user_id` do corpo JSON ou o header
+    `X-User-Id`; o IP do cliente tem um balde proprio (ver `RateLimiter.check_client`). Acima do
+    limite: 429 com `Retry-After`.
+    """
+    from flask import g, jsonify, request
+
+    @app.before_request
+    def _rate_limit() -> Any:
+        route = request.endpoint
+        if route not in limiter.limits:
+            return None
+        body = request.get_json(silent=True) if request.is_json else None
+        user_id = (body or {}).get("user_id") if isinstance(body, dict) else None
+        user_id = user_id or request.headers.get("X-User-Id")
+        decision = limiter.check_client(route, str(user_id) if user_id else None, request.remote_addr or "anonimo")
+        if decision is None:
+            return None
+        g._rate_limit = decision
+        if decision.allowed:
+            return None
+        retry_after = max(1, math.ceil(decision.retry_after_s))
+        response = jsonify(
+            {
+                "error": "Muitas requisições. Aguarde alguns segundos e tente novamente.",
+                "retry_after_s": retry_after,
+            }
+        )
+        response.status_code = 429
+        response.headers["Retry-After"] = str(retry_after)
+        return response
+
+    @app.after_request
+    def _rate_limit_headers(response: Any) -> Any:
+        decision = g.pop("_rate_limit", None)
+        if decision is not None:
+            response.headers["X-RateLimit-Limit"] = f"{decision.limit.capacity:g}"
+            response.headers["X-RateLimit-Remaining"] = str(int(decision.remaining))
+        return response
+
+
+class ConcurrencyLimitExceeded(RuntimeError):
+    pass
+
+
+class ConcurrencyLimiter:
+    """
+    Teto de chamadas simultaneas a LLM (Watson/Gemini) no processo. Quem passa do teto espera ate
+    `timeout_s` por uma vaga; depois disso recebe `ConcurrencyLimitExceeded`, que os servicos tratam
+    com fallback local (sem contar como falha da dependencia no circuit breaker), em vez de empilhar
+    threads numa API lenta.
+    Com gunicorn o teto global e' dividido entre os workers (ver `build_llm_limiter`).
+    """
+
+    def __init__(self, max_concurrent: int = 8, timeout_s: float = 10.0, global_max: int | None = None, workers: int = 1) -> None:
+        self.max_concurrent = max(1, max_concurrent)
+        self.global_max = global_max or self.max_concurrent
+        self.workers = max(1, workers)
+        self.timeout_s = timeout_s
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+        self.inflight = 0
+        self.peak = 0
+        self.rejected = 0
+
+    @contextmanager
+    def slot(self, dependency: str) -> Iterator[None]:
+        started = time.perf_counter()
+        acquired = self._slots.acquire(timeout=self.timeout_s)
+        METRICS.observe("cardioia_llm_queue_wait_seconds", time.perf_counter() - started, dependency=dependency)
+        if not acquired:
+            with self._lock:
+                self.rejected += 1
+            METRICS.inc("cardioia_llm_rejected_total", dependency=dependency)
+            raise ConcurrencyLimitExceeded(f"{dependency}: {self.max_concurrent} chamadas em andamento")
+        with self._lock:
+            self.inflight += 1
+            self.peak = max(self.peak, self.inflight)
+        METRICS.inc("cardioia_llm_inflight", dependency=dependency)
+        try:
+            yield
+        finally:
+            METRICS.inc("cardioia_llm_inflight", -1, dependency=dependency)
+            with self._lock:
+                self.inflight -= 1
+            self._slots.release()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "global_max": self.global_max,
+                "workers": self.workers,
+                "timeout_s": self.timeout_s,
+                "inflight": self.inflight,
+                "peak": self.peak,
+                "rejected": self.rejected,
+            }
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def build_llm_limiter() -> ConcurrencyLimiter:
+    """
+    `CARDIOIA_LLM_MAX_CONCURRENCY` e' o teto da maquina, dividido pelos processos que atendem
+    requisicoes (`CARDIOIA_LLM_WORKERS`, preenchido pelo `gunicorn.conf.py` com o numero de workers):
+    cada worker fica com `teto // workers` vagas, no minimo 1. A divisao e' estatica -- um worker
+    ocioso nao empresta vagas aos outros --, mas o total nunca passa do teto (salvo workers > teto).
+    """
+    global_max = max(1, int(_env_number("CARDIOIA_LLM_MAX_CONCURRENCY", 8)))
+    workers = max(1, int(_env_number("CARDIOIA_LLM_WORKERS", 1)))
+    return ConcurrencyLimiter(
+        max_concurrent=max(1, global_max // workers),
+        timeout_s=_env_number("CARDIOIA_LLM_QUEUE_TIMEOUT_S", 10.0),
+        global_max=global_max,
+        workers=workers,
+    )
+
+
+LLM_LIMITER = build_llm_limiter()
+
+
+def llm_slot(dependency: str) -> Any:
+    """`with llm_slot("gemini"): ...` -- reserva uma vaga no teto global de chamadas a LLM."""
+    return LLM_LIMITER.slot(dependency)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from backend.mock_assistant import MockAssistantService
+from backend.text_normalization import normalize
+
+
+DEFAULT_CACHEABLE_INTENTS = ("saudacao", "agradecimento", "info_pressao")
+
+
+class ResponseCache:
+    """
+    Cache LRU com TTL para respostas do assistente.
+
+    Guarda apenas o dicionário da resposta; métricas simples permitem acompanhar a taxa de acerto.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data: OrderedDict[Hashable, tuple[float, dict[str, Any]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> dict[str, Any] | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if self._clock() >= expires_at:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: dict[str, Any]) -> None:
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            self.stores += 1
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+class CachedAssistantService:
+    """
+    Envolve um assistente (Watson, LOCAL ou o roteador de failover) com cache de respostas.
+
+    Chave: (escopo, versão do skill, texto normalizado). O escopo vem de `cache_state(session_id)`:
+    - LOCAL: só cacheia turnos no estado `start` que continuam em `start` (sem efeito no fluxo).
+    - Watson: só cacheia respostas cuja intenção principal foi declarada como cacheável.
+    """
+
+    def __init__(self, inner: Any, cache: ResponseCache | None = None, cacheable_intents: set[str] | None = None) -> None:
+        self.inner = inner
+        self.cache = cache or ResponseCache()
+        self.cacheable_intents = set(cacheable_intents if cacheable_intents is not None else DEFAULT_CACHEABLE_INTENTS)
+
+    @classmethod
+    def from_env(cls, inner: Any) -> "CachedAssistantService":
+        try:
+            max_entries = int(os.getenv("CARDIOIA_RESPONSE_CACHE_SIZE") or 1024)
+        except ValueError:
+            max_entries = 1024
+        try:
+            ttl = float(os.getenv("CARDIOIA_RESPONSE_CACHE_TTL_S") or 300)
+        except ValueError:
+            ttl = 300.0
+        raw_intents = os.getenv("CARDIOIA_CACHEABLE_INTENTS")
+        intents = {i.strip() for i in raw_intents.split(",") if i.strip()} if raw_intents is not None else None
+        return cls(inner, ResponseCache(max_entries=max_entries, ttl_seconds=ttl), intents)
+
+    def __getattr__(self, name: str) -> Any:
+        # Demais atributos (assistant_id, environment_id, stats...) vêm do assistente real.
+        return getattr(self.inner, name)
+
+    @property
+    def active_backend(self) -> str:
+        default = "local" if isinstance(self.inner, MockAssistantService) else "watson"
+        return getattr(self.inner, "active_backend", default)
+
+    def _cache_state(self, session_id: str) -> str | None:
+        fn = getattr(self.inner, "cache_state", None)
+        if fn is None:
+            return "watson"
+        return fn(session_id)
+
+    def create_session(self) -> str | None:
+        return self.inner.create_session()
+
+    def send_message(self, session_id: str, message_text: str, user_id: str | None = None) -> dict[str, Any]:
+        scope = self._cache_state(session_id)
+        if scope is None:
+            return self.inner.send_message(session_id, message_text, user_id=user_id)
+
+        key = (scope, getattr(self.inner, "skill_version", 0), normalize(message_text).folded)
+        hit = self.cache.get(key)
+        if hit is not None:
+            return dict(hit)
+
+        resp = self.inner.send_message(session_id, message_text, user_id=user_id)
+        if resp.get("error_type") or self._cache_state(session_id) != scope:
+            return resp
+        # Roteador de failover: uma falha isolada do Watson e' atendida pelo LOCAL com o circuito
+        # ainda fechado (escopo "watson"); essa resposta nao pode ficar no cache dos turnos do Watson.
+        served = resp.get("backend")
+        if served is not None and served != scope.partition(":")[0]:
+            return resp
+
+        if scope == "watson":
+            intents = resp.get("intents") or []
+            top = intents[0].get("intent") if intents and isinstance(intents[0], dict) else None
+            if top not in self.cacheable_intents:
+                return resp
+
+        self.cache.put(key, dict(resp))
+        return resp
+
+    def reload_skill(self) -> None:
+        """Recarrega o skill (quando suportado) e invalida o cache."""
+        reload = getattr(self.inner, "reload_skill", None)
+        if reload is not None:
+            reload()
+        self.cache.invalidate()
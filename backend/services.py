@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable
+
+
+class ServiceRegistry:
+    """
+    Registro de serviços do backend com inicialização preguiçosa.
+
+    Cada serviço é construído uma única vez, no primeiro `get`, e compartilhado por todas as rotas
+    (ex.: um único motor de triagem da Fase 2 para `/api/phase2/triage` e `/api/clinical/extract`).
+    Assim o `create_app` fica barato e imports pesados (Watson, Gemini, RPA) só acontecem quando
+    alguma rota realmente precisa deles.
+    """
+
+    def __init__(self) -> None:
+        self._factories: dict[str, Callable[["ServiceRegistry"], Any]] = {}
+        self._instances: dict[str, Any] = {}
+        self._build_ms: dict[str, float] = {}
+        # RLock: uma fábrica pode depender de outro serviço (get dentro de get).
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[["ServiceRegistry"], Any]) -> None:
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name in self._instances:
+                return self._instances[name]
+            factory = self._factories.get(name)
+            if factory is None:
+                raise KeyError(f"Serviço não registrado: {name}")
+            started = time.perf_counter()
+            instance = factory(self)
+            self._build_ms[name] = round((time.perf_counter() - started) * 1000, 2)
+            self._instances[name] = instance
+            return instance
+
+    def peek(self, name: str) -> Any | None:
+        """Retorna o serviço só se ele já tiver sido construído (não dispara a inicialização)."""
+        return self._instances.get(name)
+
+    def set(self, name: str, instance: Any) -> None:
+        """Substitui a instância (útil em testes e em recargas)."""
+        with self._lock:
+            self._instances[name] = instance
+
+    def warm(self, *names: str) -> None:
+        for name in names or tuple(self._factories):
+            self.get(name)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            name: {"built": name in self._instances, "build_ms": self._build_ms.get(name)}
+            for name in self._factories
+        }
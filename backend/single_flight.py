@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import functools
+import threading
+from typing import Any, Callable, Hashable, TypeVar
+
+from backend.metrics import METRICS
+
+METRICS.describe("cardioia_single_flight_total", "counter", "Chamadas coalescidas (result=coalesced) ou com erro por grupo.")
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "leader")
+
+    def __init__(self) -> None:
+        # Criado so quando aparece alguem para esperar: no caso comum (sem concorrencia) o custo
+        # por chamada fica num lock e num dict.
+        self.done: threading.Event | None = None
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.leader = threading.get_ident()
+
+
+class SingleFlight:
+    """
+    Coalescencia de chamadas identicas em andamento ("single flight").
+
+    `do(key, fn)`: a primeira chamada com a chave executa `fn`; as que chegam enquanto ela roda
+    esperam e recebem o mesmo resultado (ou a mesma excecao). Nada fica guardado depois que a
+    chamada termina -- para isso existem os caches. O resultado e' compartilhado entre os
+    chamadores, entao nao deve ser alterado por eles.
+    """
+
+    def __init__(self, name: str = "default") -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            # Mesma thread pedindo a mesma chave (recursao): executa direto em vez de esperar por si mesma.
+            if call is not None and call.leader != threading.get_ident():
+                if call.done is None:
+                    call.done = threading.Event()
+                done = call.done
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            METRICS.inc("cardioia_single_flight_total", group=self.name, result="coalesced")
+            done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            METRICS.inc("cardioia_single_flight_total", group=self.name, result="error")
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                done = call.done
+            if done is not None:
+                done.set()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            calls = self.executions + self.coalesced
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "coalesced_rate": round(self.coalesced / calls, 4) if calls else 0.0,
+                "errors": self.errors,
+                "inflight": len(self._calls),
+            }
+
+
+_GROUPS: dict[str, SingleFlight] = {}
+_GROUPS_LOCK = threading.Lock()
+
+
+def group(name: str) -> SingleFlight:
+    """Grupo nomeado e compartilhado no processo (as estatisticas saem em `stats()`)."""
+    with _GROUPS_LOCK:
+        found = _GROUPS.get(name)
+        if found is None:
+            found = _GROUPS[name] = SingleFlight(name)
+        return found
+
+
+def single_flight(name: str, key: Callable[..., Hashable] | None = None) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """
+    Decorador: chamadas simultaneas com a mesma chave compartilham uma execucao.
+
+    `key` recebe os mesmos argumentos da funcao (inclusive `self`) e deve devolver a entrada ja
+    normalizada; sem ele a chave e' a tupla dos argumentos. Em metodos, inclua `self` na chave
+    para nao misturar instancias diferentes.
+    """
+
+    def decorate(fn: Callable[..., T]) -> Callable[..., T]:
+        flights = group(name)
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            k = key(*args, **kwargs) if key is not None else (args, tuple(sorted(kwargs.items())))
+            return flights.do(k, lambda: fn(*args, **kwargs))
+
+        wrapper.single_flight = flights  # type: ignore[attr-defined]
+        return wrapper
+
+    return decorate
+
+
+def stats() -> dict[str, dict[str, Any]]:
+    with _GROUPS_LOCK:
+        groups = list(_GROUPS.values())
+    return {g.name: g.stats() for g in groups}
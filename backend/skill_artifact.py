@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+import zlib
+from typing import Any
+
+# Artefato binario do skill (ver `MockAssistantService._load_index`):
+#   cabecalho fixo | payload `marshal`
+# O cabecalho identifica o formato e o arquivo de origem (sha256, tamanho, mtime); o crc32 do
+# payload detecta arquivo truncado/corrompido. Qualquer divergencia => artefato ignorado.
+MAGIC = b"CIASKILL"
+FORMAT_VERSION = 1
+# magic, versao do formato, versao do marshal, sha256 da origem, tamanho da origem,
+# mtime_ns da origem, crc32 do payload, tamanho do payload
+_HEADER = struct.Struct("<8sHH32sQqIQ")
+_MTIME_OFFSET = struct.calcsize("<8sHH32sQ")
+
+
+def default_artifact_path() -> str:
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    path = (os.getenv("CARDIOIA_SKILL_ARTIFACT") or "").strip()
+    return path or os.path.join(repo_root, "backend", "data", "watson_skill.bin")
+
+
+def autobuild_enabled() -> bool:
+    return os.getenv("CARDIOIA_SKILL_ARTIFACT_AUTOBUILD", "1").strip().lower() not in ("0", "false", "no")
+
+
+def _sha256(path: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def write_artifact(target: str, source: str, payload: dict[str, Any]) -> int:
+    """Grava o artefato de forma atomica (arquivo temporario + `os.replace`). Retorna o tamanho."""
+    st = os.stat(source)
+    body = marshal.dumps(payload, marshal.version)
+    header = _HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        marshal.version,
+        _sha256(source),
+        st.st_size,
+        st.st_mtime_ns,
+        zlib.crc32(body),
+        len(body),
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(body)
+    os.replace(tmp, target)
+    return len(header) + len(body)
+
+
+def artifact_status(target: str, source: str) -> str:
+    """"fresh", "missing", "stale" ou "invalid" (sem carregar o payload)."""
+    try:
+        with open(target, "rb") as f:
+            raw = f.read(_HEADER.size)
+    except OSError:
+        return "missing"
+    return _check_header(raw, source, target)[0]
+
+
+def _restamp(target: str, mtime_ns: int) -> None:
+    """Grava o mtime novo no cabecalho (so' esse campo, no lugar): a proxima partida nao refaz o hash."""
+    try:
+        with open(target, "r+b") as f:
+            f.seek(_MTIME_OFFSET)
+            f.write(struct.pack("<q", mtime_ns))
+    except OSError:
+        pass  # artefato somente leitura: continua valendo, so' paga o hash a cada partida
+
+
+def _check_header(raw: bytes, source: str, target: str | None = None) -> tuple[str, tuple | None]:
+    if len(raw) < _HEADER.size:
+        return "invalid", None
+    header = _HEADER.unpack_from(raw, 0)
+    magic, version, marshal_version, sha, size, mtime_ns, _crc, _length = header
+    if magic != MAGIC or version != FORMAT_VERSION or marshal_version > marshal.version:
+        return "invalid", None
+    try:
+        st = os.stat(source)
+    except OSError:
+        return "stale", None
+    if st.st_size != size:
+        return "stale", None
+    # Mesmo tamanho e mtime: confia no cabecalho. Mtime diferente (ex.: checkout do git)
+    # ainda vale se o conteudo for identico; o cabecalho passa a registrar o mtime novo.
+    if st.st_mtime_ns != mtime_ns:
+        if _sha256(source) != sha:
+            return "stale", None
+        if target is not None:
+            _restamp(target, st.st_mtime_ns)
+    return "fresh", header
+
+
+def read_artifact(target: str, source: str) -> dict[str, Any] | None:
+    """
+    Le o payload via `mmap` (sem copiar o arquivo para um buffer intermediario; as paginas ficam
+    no page cache, compartilhadas entre os workers). Retorna None se faltar, estiver velho ou corrompido.
+    """
+    try:
+        f = open(target, "rb")
+    except OSError:
+        return None
+    with f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        with mm:
+            status, header = _check_header(mm[: _HEADER.size], source, target)
+            if status != "fresh" or header is None:
+                return None
+            crc, length = header[6], header[7]
+            if _HEADER.size + length != len(mm):
+                return None
+            view = memoryview(mm)[_HEADER.size :]
+            try:
+                if zlib.crc32(view) != crc:
+                    return None
+                payload = marshal.loads(view)
+            except (EOFError, ValueError, TypeError):
+                return None
+            finally:
+                view.release()
+    return payload if isinstance(payload, dict) else None
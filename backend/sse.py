@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Iterable, Iterator
+
+from flask import Response, stream_with_context
+
+
+# Tipos de evento emitidos pelas rotas `/stream` (o frontend trata cada um separadamente).
+EVENT_TYPES = ("meta", "triage", "vitals", "token", "done", "error")
+
+
+def format_event(event: str, data: Any, event_id: int | None = None) -> str:
+    """Serializa um evento no formato `text/event-stream` (dados sempre em JSON, uma linha)."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+def _with_errors(events: Iterable[tuple[str, Any]]) -> Iterator[str]:
+    event_id = 0
+    try:
+        for event, data in events:
+            yield format_event(event, data, event_id)
+            event_id += 1
+    except Exception as e:
+        # O status 200 ja foi enviado: o erro vira um evento tipado para o cliente.
+        print(f"Erro durante streaming: {e}")
+        yield format_event("error", {"error": str(e) or e.__class__.__name__}, event_id)
+
+
+def event_stream(events: Iterable[tuple[str, Any]]) -> Response:
+    """
+    Resposta SSE a partir de um gerador de (evento, dados).
+
+    Cada evento sai assim que e' produzido (sem buffer do proxy/servidor), entao as partes
+    rapidas (triagem, vitais) chegam antes da resposta do Watson/Gemini.
+    """
+    resp = Response(stream_with_context(_with_errors(events)), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    # nginx: nao bufferizar a resposta.
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
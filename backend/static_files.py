@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+import os
+import threading
+from typing import Iterable
+
+from flask import Response, abort, request, send_file
+from werkzeug.security import safe_join
+
+# Tipos que valem a pena comprimir (texto). PDFs e imagens ja sao comprimidos: vao sempre
+# como identidade, com suporte a Range.
+COMPRESSIBLE_EXTENSIONS = frozenset(
+    {".html", ".js", ".mjs", ".css", ".svg", ".json", ".map", ".txt", ".md", ".csv", ".xml"}
+)
+# Variantes pre-comprimidas, em ordem de preferencia (ver `scripts/precompress_static.py`).
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def is_compressible(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def variant_is_fresh(source_stat: os.stat_result, variant_path: str) -> bool:
+    """
+    Uma variante so vale se tiver o mesmo mtime do original (o script de pre-compressao copia
+    o mtime). Se o original mudar depois, a variante antiga e' ignorada ate ser regerada.
+    """
+    try:
+        return os.stat(variant_path).st_mtime_ns == source_stat.st_mtime_ns
+    except OSError:
+        return False
+
+
+class StaticFiles:
+    """
+    Serve arquivos de um diretorio com cache HTTP:
+
+    - ETag forte (hash do conteudo, calculado uma vez por versao do arquivo) e 304 via
+      If-None-Match / If-Modified-Since;
+    - variantes `.br` / `.gz` geradas no build, escolhidas pelo Accept-Encoding (`Vary` incluso);
+    - `Cache-Control: immutable` para assets com hash no nome (Vite) e `no-cache` para HTML;
+    - Range (206) para PDFs/imagens grandes; respostas inteiras usam `wsgi.file_wrapper`
+      (sendfile no gunicorn, sem copiar o arquivo para o processo Python).
+    """
+
+    def __init__(
+        self,
+        root: str,
+        immutable_prefixes: Iterable[str] = (),
+        max_age: int | None = None,
+    ) -> None:
+        self.root = os.path.abspath(root)
+        self.immutable_prefixes = tuple(immutable_prefixes)
+        self.max_age = _env_int("CARDIOIA_STATIC_MAX_AGE", 3600) if max_age is None else max_age
+        self._etags: dict[str, tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+
+    def _resolve(self, filename: str) -> str:
+        filename = (filename or "").replace("\\", "/")
+        # Arquivos ocultos (.env, .git/...) nunca sao servidos.
+        if any(part.startswith(".") for part in filename.split("/") if part):
+            abort(404)
+        path = safe_join(self.root, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        return path
+
+    def etag(self, path: str, st: os.stat_result) -> str:
+        cached = self._etags.get(path)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        tag = digest.hexdigest()[:32]
+        with self._lock:
+            self._etags[path] = (st.st_mtime_ns, st.st_size, tag)
+        return tag
+
+    def _pick_encoding(self, path: str, st: os.stat_result) -> tuple[str | None, str]:
+        # Range sobre o corpo comprimido confunde clientes; pedidos parciais vao sem variante.
+        if request.range is not None:
+            return None, path
+        accepted = request.accept_encodings
+        for encoding, suffix in ENCODINGS:
+            if accepted.quality(encoding) > 0 and variant_is_fresh(st, path + suffix):
+                return encoding, path + suffix
+        return None, path
+
+    def _cache_control(self, response: Response, filename: str) -> None:
+        cc = response.cache_control
+        cc.no_cache = None
+        if filename.startswith(self.immutable_prefixes):
+            cc.public = True
+            cc.max_age = IMMUTABLE_MAX_AGE
+            cc.immutable = True
+        elif filename.endswith(".html"):
+            # Sempre revalida (barato com ETag) para pegar o build novo com os hashes novos.
+            cc.no_cache = True
+        else:
+            cc.public = True
+            cc.max_age = self.max_age
+
+    def send(self, filename: str) -> Response:
+        path = self._resolve(filename)
+        st = os.stat(path)
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        tag = self.etag(path, st)
+
+        encoding, send_path = (None, path)
+        if is_compressible(path):
+            encoding, send_path = self._pick_encoding(path, st)
+
+        response = send_file(
+            send_path,
+            mimetype=mimetype,
+            download_name=os.path.basename(path),
+            conditional=True,
+            etag=f"{tag}-{encoding}" if encoding else tag,
+            last_modified=st.st_mtime,
+            max_age=None,
+        )
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        if is_compressible(path):
+            response.vary.add("Accept-Encoding")
+        response.accept_ranges = "bytes" if encoding is None else "none"
+        self._cache_control(response, filename.replace("\\", "/"))
+        return response
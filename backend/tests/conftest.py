@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _skill_artifact_outside_the_tree(tmp_path_factory, monkeypatch):
+    # O autobuild do artefato do skill gravaria em `backend/data/` (arvore do repositorio);
+    # nos testes ele vai para um diretorio temporario compartilhado pela sessao.
+    monkeypatch.setenv("CARDIOIA_SKILL_ARTIFACT", str(tmp_path_factory.getbasetemp() / "watson_skill.bin"))
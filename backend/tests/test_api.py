@@ -1,3 +1,4 @@
+import json
 import os
 
 import pytest
@@ -99,3 +100,185 @@ def test_local_emergencia_aceita_resposta_livre_sem_travar(client):
     assert r3.status_code == 200
     t3 = (r3.get_json().get("response") or "").lower()
     assert ("pré-agendar" in t3) or ("agendar" in t3)
+
+
+def test_response_cache_serves_repeated_start_turns(client):
+    for uid in ["c1", "c2"]:
+        res = client.post("/api/message", json={"message": "O que é pressão alta?", "user_id": uid})
+        assert res.status_code == 200
+    stats = client.get("/api/status").get_json()["response_cache"]
+    assert stats["hits"] >= 1
+
+    # Turnos que mudam o estado do fluxo nao podem ser cacheados.
+    r1 = client.post("/api/message", json={"message": "Quero agendar uma consulta", "user_id": "c3"})
+    r2 = client.post("/api/message", json={"message": "amanhã", "user_id": "c3"})
+    assert "amanhã" in r2.get_json()["response"]
+    assert r1.get_json()["response"] != r2.get_json()["response"]
+
+
+def test_response_cache_invalidated_on_skill_reload():
+    from backend.mock_assistant import MockAssistantService
+    from backend.response_cache import CachedAssistantService
+
+    svc = CachedAssistantService(MockAssistantService())
+    sid = svc.create_session()
+    svc.send_message(sid, "oi")
+    svc.send_message(sid, "Oi ")
+    assert svc.cache.stats()["hits"] == 1
+
+    svc.reload_skill()
+    assert svc.cache.stats()["size"] == 0
+    svc.send_message(sid, "oi")
+    assert svc.cache.stats()["hits"] == 1
+
+
+def test_services_are_lazy_and_triage_is_shared(client):
+    services = client.application.config["services"]
+    assert services.peek("phase2_triage") is None
+
+    client.post("/api/clinical/extract", json={"text": "dor no peito"})
+    triage = services.peek("phase2_triage")
+    assert triage is not None
+    assert services.get("clinical_extraction")._triage is triage
+    assert services.peek("automation") is None
+
+
+def _sse_events(res):
+    events = []
+    for block in res.get_data(as_text=True).split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line and not line.startswith(":"))
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_message_stream_emits_fast_events_first(client):
+    res = client.post("/api/message/stream", json={"message": "Dor no peito, pressão 150/95", "user_id": "s1"})
+    assert res.status_code == 200
+    assert res.mimetype == "text/event-stream"
+    events = _sse_events(res)
+    assert [e for e, _ in events] == ["meta", "triage", "vitals", "token", "done"]
+    assert events[2][1]["pressao_arterial"] == "150/95"
+    done = events[-1][1]
+    assert events[3][1]["text"] == done["response"]
+    assert set(done) == {"response", "intents", "entities"}
+
+
+def test_clinical_extract_stream_streams_llm_tokens(client, tmp_path, monkeypatch):
+    from backend.clinical_extraction import ClinicalExtractionService, GeminiClinicalExtractor
+    from backend.fake_gemini import FakeGeminiModel
+
+    monkeypatch.setenv("CARDIOIA_EXTRACTION_CACHE_PATH", str(tmp_path / "cache.db"))
+    services = client.application.config["services"]
+    gemini = GeminiClinicalExtractor(model=FakeGeminiModel())
+    services.set("clinical_extraction", ClinicalExtractionService(gemini=gemini, triage=services.get("phase2_triage")))
+
+    text = "Paciente com dor no peito, PA 160/100, FC 110 bpm"
+    events = _sse_events(client.post("/api/clinical/extract/stream", json={"text": text}))
+    kinds = [e for e, _ in events]
+    assert kinds[:4] == ["meta", "triage", "vitals", "token"] and kinds[-1] == "done"
+    streamed = "".join(d["text"] for e, d in events if e == "token")
+    done = events[-1][1]
+    assert done["source"] == "gemini"
+    assert json.loads(streamed) == done["structured"]
+    # Segunda vez vem do cache: sem tokens, mesmo resultado.
+    again = _sse_events(client.post("/api/clinical/extract/stream", json={"text": text}))
+    assert "token" not in [e for e, _ in again] and again[-1][1] == done
+    assert client.post("/api/clinical/extract/stream", json={"text": " "}).status_code == 400
+
+
+def test_static_and_docs_use_http_caching(client):
+    home = client.get("/")
+    assert home.status_code == 200 and home.headers["Cache-Control"] == "no-cache"
+    assert client.get("/", headers={"If-None-Match": home.headers["ETag"]}).status_code == 304
+
+    pdf = client.get("/docs/fase5/relatorio_conversacional.pdf", headers={"Range": "bytes=0-3"})
+    assert pdf.status_code == 206 and pdf.data == b"%PDF"
+    assert client.get("/docs/root/.env").status_code == 404
+
+
+def test_metrics_endpoint_reports_routes_and_dependencies(client, tmp_path, monkeypatch):
+    from backend.clinical_extraction import ClinicalExtractionService, GeminiClinicalExtractor
+    from backend.fake_gemini import FakeGeminiModel
+
+    monkeypatch.setenv("CARDIOIA_EXTRACTION_CACHE_PATH", str(tmp_path / "cache.db"))
+    gemini = GeminiClinicalExtractor(model=FakeGeminiModel())
+    client.application.config["services"].set("clinical_extraction", ClinicalExtractionService(gemini=gemini))
+    client.post("/api/message", json={"message": "Olá", "user_id": "m1"})
+    client.post("/api/clinical/extract", json={"text": "dor no peito há 2h"})
+    client.get("/docs/fase5/nao-existe.pdf")
+
+    res = client.get("/api/metrics")
+    assert res.status_code == 200 and res.mimetype == "text/plain"
+    text = res.get_data(as_text=True)
+    assert 'cardioia_http_requests_total{route="/api/message",method="POST",status="200"}' in text
+    assert 'route="/docs/<path:doc_path>",method="GET",status="404"' in text
+    assert 'cardioia_http_request_duration_seconds_count{route="/api/message",method="POST"}' in text
+    assert 'cardioia_dependency_call_duration_seconds_count{dependency="gemini",operation="extract"}' in text
+
+
+def test_admin_profiler_requires_token_and_profiles_on_header(client, monkeypatch):
+    assert client.get("/api/admin/profiler").status_code == 404
+    monkeypatch.setenv("CARDIOIA_ADMIN_TOKEN", "s3cret")
+    assert client.get("/api/admin/profiler", headers={"X-Admin-Token": "errado"}).status_code == 403
+
+    admin = {"X-Admin-Token": "s3cret"}
+    profiler = client.application.config["profiler"]
+    # Header sem token valido nao liga o profiler.
+    client.post("/api/message", json={"message": "Olá", "user_id": "p1"}, headers={"X-CardioIA-Profile": "1"})
+    assert profiler.stats()["profiled_requests"] == 0
+    client.post("/api/message", json={"message": "Olá", "user_id": "p1"}, headers={"X-CardioIA-Profile": "1", **admin})
+    assert profiler.stats()["profiled_requests"] == 1 and profiler.stats()["active"] == 0
+
+    res = client.post("/api/admin/profiler", json={"sample_rate": 2, "reset": True}, headers=admin)
+    assert res.get_json()["sample_rate"] == 1.0 and res.get_json()["profiled_requests"] == 0
+    res = client.get("/api/admin/profiler?format=json", headers=admin)
+    assert res.status_code == 200 and set(res.get_json()) >= {"samples", "stacks", "collapsed"}
+
+
+def test_rate_limit_returns_429_per_user_and_route(monkeypatch):
+    monkeypatch.setenv("CARDIOIA_ASSISTANT_MODE", "local")
+    monkeypatch.setenv("CARDIOIA_RATE_LIMITS", "message=2/60")
+    from backend.app import create_app
+
+    client = create_app().test_client()
+    for _ in range(2):
+        res = client.post("/api/message", json={"message": "Olá", "user_id": "rl1"})
+        assert res.status_code == 200
+    res = client.post("/api/message", json={"message": "Olá", "user_id": "rl1"})
+    assert res.status_code == 429 and int(res.headers["Retry-After"]) >= 1
+    # Outro usuario e outras rotas seguem liberados.
+    assert client.post("/api/message", json={"message": "Olá", "user_id": "rl2"}).status_code == 200
+    assert client.post("/api/phase2/triage", json={"text": "dor no peito", "user_id": "rl1"}).status_code == 200
+    assert 'cardioia_rate_limit_total{route="message",result="limited"}' in client.get("/api/metrics").get_data(as_text=True)
+
+    # Trocar de `user_id` a cada chamada nao escapa: o IP tem balde proprio (2 x 4 fichas).
+    codes = [
+        client.post("/api/message", json={"message": "Olá", "user_id": f"rot{i}"}, environ_base={"REMOTE_ADDR": "10.0.0.9"}).status_code
+        for i in range(10)
+    ]
+    assert codes == [200] * 8 + [429] * 2
+
+
+def test_rate_limit_by_ip_behind_a_trusted_proxy(monkeypatch):
+    monkeypatch.setenv("CARDIOIA_ASSISTANT_MODE", "local")
+    monkeypatch.setenv("CARDIOIA_RATE_LIMITS", "message=2/60")
+    from backend.app import create_app
+
+    def codes(client, forwarded_for):
+        headers = {"X-Forwarded-For": forwarded_for}
+        return [
+            client.post("/api/message", json={"message": "Olá"}, headers=headers, environ_base={"REMOTE_ADDR": "10.0.0.1"}).status_code
+            for _ in range(3)
+        ]
+
+    # Sem proxy confiavel o header e' ignorado: forjar `X-Forwarded-For` nao da um balde novo.
+    client = create_app().test_client()
+    assert codes(client, "203.0.113.7") == [200, 200, 429]
+    assert codes(client, "203.0.113.8") == [429] * 3
+
+    # Atras do nginx: cada cliente tem o proprio balde, em vez de todos dividirem o IP do proxy.
+    monkeypatch.setenv("CARDIOIA_TRUSTED_PROXIES", "1")
+    client = create_app().test_client()
+    assert codes(client, "203.0.113.7") == [200, 200, 429]
+    assert codes(client, "203.0.113.8") == [200, 200, 429]
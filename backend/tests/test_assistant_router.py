@@ -0,0 +1,105 @@
+from backend.assistant_router import CircuitBreaker, FailoverAssistantService
+from backend.mock_assistant import MockAssistantService
+from backend.response_cache import CachedAssistantService
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _FlakyWatson:
+    assistant_id = "a1"
+    environment_id = "e1"
+
+    def __init__(self):
+        self.down = False
+        self.calls = 0
+
+    def create_session(self):
+        return "w-session"
+
+    def send_message(self, session_id, message_text, user_id=None):
+        self.calls += 1
+        if self.down:
+            return {"text": "Erro de comunicação com o Watson: timeout", "error_type": "service_error"}
+        return {"text": f"watson: {message_text}", "intents": [], "entities": []}
+
+
+def _router():
+    clock = _FakeClock()
+    breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=2, open_seconds=10, half_open_probes=1, clock=clock)
+    watson = _FlakyWatson()
+    return FailoverAssistantService(watson, MockAssistantService(), breaker), watson, clock
+
+
+def test_failover_trips_and_serves_local_without_calling_watson():
+    router, watson, _clock = _router()
+    sid = router.create_session()
+    assert router.send_message(sid, "Olá")["text"].startswith("watson:")
+
+    watson.down = True
+    # Falhas nunca chegam ao usuário como texto de erro: a mensagem é servida pelo modo local.
+    for _ in range(2):
+        assert "Erro de comunicação" not in router.send_message(sid, "Olá")["text"]
+    assert router.breaker.state == CircuitBreaker.OPEN
+
+    calls = watson.calls
+    router.send_message(sid, "Quero agendar uma consulta")
+    assert watson.calls == calls
+    assert router.active_backend == "local"
+
+
+def test_failover_half_open_probe_closes_circuit():
+    router, watson, clock = _router()
+    sid = router.create_session()
+    watson.down = True
+    router.send_message(sid, "oi")
+    router.send_message(sid, "oi")
+    assert router.breaker.state == CircuitBreaker.OPEN
+
+    watson.down = False
+    clock.now += 11
+    assert router.breaker.state == CircuitBreaker.HALF_OPEN
+    assert router.send_message(sid, "oi")["text"] == "watson: oi"
+    assert router.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cache_keeps_local_fallback_out_of_the_watson_scope():
+    router, watson, _clock = _router()
+    cached = CachedAssistantService(router, cacheable_intents={"saudacao"})
+    sid = cached.create_session()
+
+    # Uma falha isolada nao abre o circuito: o LOCAL atende, mas o escopo ainda e' "watson".
+    watson.down = True
+    local = cached.send_message(sid, "Olá")
+    assert local["backend"] == "local" and router.breaker.state == CircuitBreaker.CLOSED
+    assert cached.cache.stats()["stores"] == 0
+
+    watson.down = False
+    assert cached.send_message(sid, "Olá")["text"] == "watson: Olá"
+
+
+def test_saturated_llm_cap_serves_local_and_keeps_the_breaker_closed(monkeypatch):
+    from backend import rate_limit
+    from backend.watson_service import WatsonService
+
+    for name in ("WATSON_API_KEY", "WATSON_URL", "WATSON_ASSISTANT_ID", "WATSON_ENVIRONMENT_ID"):
+        monkeypatch.setenv(name, "teste")
+    limiter = rate_limit.ConcurrencyLimiter(max_concurrent=1, timeout_s=0.01)
+    monkeypatch.setattr(rate_limit, "LLM_LIMITER", limiter)
+    watson = WatsonService()
+    monkeypatch.setattr(watson, "create_session", lambda: "w-session")
+    router = FailoverAssistantService(watson, MockAssistantService(), _router()[0].breaker)
+    sid = router.create_session()
+
+    # Vaga unica ocupada: o Watson nunca e' chamado, o LOCAL responde e o circuito continua fechado.
+    with limiter.slot("watson"):
+        replies = [router.send_message(sid, "Olá") for _ in range(4)]
+    assert {r["backend"] for r in replies} == {"local"}
+    assert limiter.stats()["rejected"] == 4
+    assert router.breaker.state == CircuitBreaker.CLOSED
+    assert router.breaker.snapshot()["window_calls"] == 0
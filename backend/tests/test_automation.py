@@ -0,0 +1,87 @@
+import json
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.automation_adapter import AutomationAdapter
+
+
+@pytest.fixture()
+def adapter(tmp_path, monkeypatch):
+    # Offline: o robo nunca chama o Gemini nos testes.
+    monkeypatch.setenv("GEMINI_API_KEY", "")
+    adapter = AutomationAdapter()
+    adapter.db_path, adapter.log_path = tmp_path / "patients.db", tmp_path / "logs.json"
+    adapter._db_setup.DB_PATH = str(adapter.db_path)
+    adapter._rpa.DB_PATH, adapter._rpa.LOG_PATH = str(adapter.db_path), str(adapter.log_path)
+    assert adapter.ensure_db()
+    return adapter
+
+
+def test_concurrent_cycles_across_processes_keep_every_entry(adapter, tmp_path):
+    rpa = adapter._rpa
+    # Outro processo (como o CLI ao lado do servidor) rodando ciclos no mesmo logs.json.
+    code = (
+        "import importlib.util, sys\n"
+        "spec = importlib.util.spec_from_file_location('rpa', sys.argv[1])\n"
+        "rpa = importlib.util.module_from_spec(spec); spec.loader.exec_module(rpa)\n"
+        "rpa.DB_PATH, rpa.LOG_PATH = sys.argv[2], sys.argv[3]\n"
+        "for _ in range(10): rpa.run_rpa_cycle()\n"
+    )
+    other = subprocess.Popen(
+        [sys.executable, "-c", code, rpa.__file__, str(adapter.db_path), str(adapter.log_path)],
+        stdout=subprocess.DEVNULL,
+        env={"GEMINI_API_KEY": "", "PATH": ""},
+    )
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        summaries = list(pool.map(lambda _: rpa.run_rpa_cycle(), range(20)))
+    assert other.wait(30) == 0
+
+    # Banco de exemplo: 1 anomalia por ciclo; nenhum alerta perdido, nenhum temporario largado.
+    assert {s["alerts"] for s in summaries} == {1}
+    assert len(adapter.read_logs()) == 30
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["logs.json", "logs.json.lock", "patients.db"]
+
+
+def test_run_once_coalesces_and_damaged_logs_are_not_empty(adapter, tmp_path, monkeypatch):
+    rpa = adapter._rpa
+    started, release = threading.Event(), threading.Event()
+    describe = rpa.analyze_risk_with_ai
+
+    def slow(*args):
+        started.set()
+        release.wait(5)
+        return describe(*args)
+
+    monkeypatch.setattr(rpa, "analyze_risk_with_ai", slow)
+    flights = AutomationAdapter.run_once.single_flight
+    before = flights.stats()
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        leader = pool.submit(adapter.run_once)
+        started.wait(5)
+        followers = [pool.submit(adapter.run_once) for _ in range(4)]
+        while flights.stats()["coalesced"] - before["coalesced"] < 4:
+            threading.Event().wait(0.001)
+        release.set()
+        results = [leader.result()] + [f.result() for f in followers]
+    assert all(r is results[0] for r in results) and results[0] == {"ok": True, "records": 2, "alerts": 1}
+    assert flights.stats()["executions"] - before["executions"] == 1
+    assert len(adapter.read_logs()) == 1
+
+    # Arquivo truncado: leitura falha alto; o proximo ciclo preserva o original e recomeca.
+    adapter.log_path.write_text(json.dumps(adapter.read_logs())[:20], encoding="utf-8")
+    with pytest.raises(ValueError):
+        adapter.read_logs()
+    assert adapter.run_once()["ok"] is True
+    assert len(adapter.read_logs()) == 1
+    assert len(list(tmp_path.glob("logs.json.corrupt-*"))) == 1
+
+
+def test_bad_lock_timeout_env_keeps_the_robot_loadable(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "")
+    monkeypatch.setenv("CARDIOIA_RPA_LOCK_TIMEOUT", "trinta")
+    rpa = AutomationAdapter()._rpa
+    assert rpa is not None and rpa.LOCK_TIMEOUT_S == 30.0
@@ -0,0 +1,147 @@
+import os
+
+import pytest
+
+from backend.clinical_extraction import GeminiClinicalExtractor
+from backend.extraction_cache import ExtractionCache
+
+
+class _Resp:
+    def __init__(self, text):
+        self.text = text
+
+
+class _CountingModel:
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        return _Resp(self.reply)
+
+
+def _extractor(model, cache_path, monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    ext = GeminiClinicalExtractor()
+    ext._model = model
+    ext._model_name = "fake-model"
+    ext._cache = ExtractionCache(cache_path, max_entries=2)
+    return ext
+
+
+def test_extraction_cache_skips_llm_and_survives_restart(tmp_path, monkeypatch):
+    model = _CountingModel('{"queixa_principal": "dor no peito", "sintomas": []}')
+    ext = _extractor(model, tmp_path / "cache.db", monkeypatch)
+
+    first, _ = ext.extract("Dor no peito  ha 2 horas")
+    again, _ = ext.extract("Dor no peito ha 2 horas")
+    assert first == again and model.calls == 1
+
+    # "Reinicio": nova instancia apontando para o mesmo arquivo.
+    restarted = _extractor(model, tmp_path / "cache.db", monkeypatch)
+    assert restarted.extract("Dor no peito ha 2 horas")[0] == first
+    assert model.calls == 1
+    assert restarted.cache_stats()["hits"] == 1
+
+
+def test_extraction_cache_negative_entries_and_eviction(tmp_path, monkeypatch):
+    model = _CountingModel("desculpe, nao consegui")
+    ext = _extractor(model, tmp_path / "cache.db", monkeypatch)
+
+    assert ext.extract("texto confuso") == (None, "desculpe, nao consegui")
+    assert ext.extract("texto confuso") == (None, None)
+    assert model.calls == 1
+    assert ext.cache_stats()["negative_hits"] == 1
+
+    ext.extract("outro texto")
+    ext.extract("mais um texto")
+    stats = ext.cache_stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1
+
+
+
+def test_extraction_cache_hits_only_write_last_access_after_the_interval(tmp_path):
+    now = [1000.0]
+    cache = ExtractionCache(tmp_path / "cache.db", max_entries=2, touch_interval_seconds=60, clock=lambda: now[0])
+    cache.put("a", {"v": 1})
+    now[0] += 1
+    cache.put("b", {"v": 2})
+
+    # Acertos seguidos nao escrevem no arquivo (nem pegam a trava de escrita).
+    writes = cache._conn.total_changes
+    for _ in range(7):
+        now[0] += 10
+        assert cache.get("a") == (True, {"v": 1})
+    assert cache._conn.total_changes == writes + 1  # so' o acerto 60 s depois do `put`
+
+    # A ordem de remocao continua a do ultimo acesso registrado: "a" foi usada, "b" sai.
+    cache.put("c", {"v": 3})
+    assert cache.get("a")[0] and not cache.get("b")[0]
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork so' em POSIX")
+def test_extraction_cache_is_fork_safe_and_evicts_across_processes(tmp_path):
+    # Pre-carregado no master: cada worker abre a propria conexao e o limite vale para o arquivo.
+    cache = ExtractionCache(tmp_path / "cache.db", max_entries=2)
+    cache.put("a", {"v": 1})
+    parent_conn = cache._conn
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover - filho
+        cache.put("b", {"v": 2})
+        os._exit(0 if cache._conn is not parent_conn and cache.get("a")[0] else 1)
+    assert os.waitpid(pid, 0)[1] == 0
+    cache.put("c", {"v": 3})
+    assert cache._conn is parent_conn
+    assert cache.stats()["entries"] == 2 and cache.stats()["evictions"] == 1
+
+
+def test_vitals_extractor_single_pass_keeps_legacy_results():
+    from backend.clinical_extraction import _extract_vitals_simple
+
+    assert _extract_vitals_simple("Minha pressao esta 150/95 e FC 88 bpm") == {
+        "pressao_arterial": "150/95",
+        "frequencia_cardiaca_bpm": 88,
+    }
+    # Sobreposicao: o mesmo numero alimenta FC (palavra-chave) e PA.
+    assert _extract_vitals_simple("fc 120/80") == {"pressao_arterial": "120/80", "frequencia_cardiaca_bpm": 120}
+    assert _extract_vitals_simple("88 bpm, bpm 90; temp 38,2 C")["frequencia_cardiaca_bpm"] == 90
+
+
+def test_vitals_extractor_new_phrasings_and_batch():
+    from backend.vitals_extractor import VitalsExtractor
+
+    docs = iter(["pressao 150 x 95 mmHg, pulso de 92", "febre de 101 °F", "sem medicoes"])
+    out = list(VitalsExtractor().extract_many(docs))
+    assert out[0] == {"pressao_arterial": "150/95", "frequencia_cardiaca_bpm": 92}
+    assert out[1] == {"temperatura_c": 38.3}
+    assert out[2] == {}
+
+
+def test_batch_extraction_packs_notes_and_resplits_failures(tmp_path, monkeypatch):
+    from backend.fake_gemini import FakeGeminiModel
+
+    monkeypatch.setenv("CARDIOIA_EXTRACTION_CACHE_PATH", str(tmp_path / "cache.db"))
+    model = FakeGeminiModel(drop_ids={"n2"})
+    ext = GeminiClinicalExtractor(model=model)
+
+    notes = [f"Dor no peito, FC {80 + i} bpm" for i in range(8)] + ["Dor no peito, FC 80 bpm"]
+    out = ext.extract_many(notes, batch_size=8, max_workers=2)
+
+    assert [o["sinais_vitais"]["frequencia_cardiaca_bpm"] for o in out] == [80 + i for i in range(8)] + [80]
+    # 1 lote de 8 + a nota omitida (n2) reprocessada individualmente; a duplicata nao gera chamada.
+    assert model.calls == 2
+
+    # Segunda passada: tudo vem do cache.
+    ext.extract_many(notes)
+    assert model.calls == 2
+
+
+def test_batch_extraction_service_falls_back_locally_on_malformed_output(tmp_path, monkeypatch):
+    from backend.clinical_extraction import ClinicalExtractionService
+    from backend.fake_gemini import FakeGeminiModel
+
+    monkeypatch.setenv("CARDIOIA_EXTRACTION_CACHE", "0")
+    svc = ClinicalExtractionService(gemini=GeminiClinicalExtractor(model=FakeGeminiModel(malformed=True)))
+    results = svc.extract_many(["PA 150/95", "FC 90 bpm"], batch_size=2)
+    assert [r.source for r in results] == ["local", "local"]
+    assert results[0].structured["sinais_vitais"]["pressao_arterial"] == "150/95"
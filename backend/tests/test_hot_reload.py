@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from backend.hot_reload import HotReloader
+from backend.metrics import METRICS
+from backend.mock_assistant import MockAssistantService
+
+
+def _touch(path, text):
+    path.write_text(text, encoding="utf-8")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def test_reloader_detects_changes_and_keeps_going_after_failure(tmp_path):
+    data = tmp_path / "map.csv"
+    data.write_text("v1", encoding="utf-8")
+    loaded = []
+
+    def reload():
+        text = data.read_text(encoding="utf-8")
+        if text == "quebrado":
+            raise ValueError("arquivo invalido")
+        loaded.append(text)
+
+    reloader = HotReloader(interval_s=60, settle_s=0)
+    reloader.watch("mapa", [str(data)], reload)
+    assert reloader.check_once() == []
+
+    _touch(data, "v2")
+    assert reloader.check_once() == ["mapa"] and loaded == ["v2"]
+    assert reloader.check_once() == []  # sem nova mudanca, sem nova recarga
+
+    _touch(data, "quebrado")
+    assert reloader.check_once() == [] and loaded == ["v2"]
+    stats = reloader.stats()["targets"]["mapa"]
+    assert stats["reloads"] == 1 and stats["failures"] == 1 and "ValueError" in stats["last_error"]
+
+    _touch(data, "v3")
+    assert reloader.check_once() == ["mapa"] and loaded == ["v2", "v3"]
+    assert reloader.stats()["targets"]["mapa"]["last_error"] is None
+    assert 'cardioia_reload_duration_seconds_count{target="mapa"}' in METRICS.render()
+
+
+def test_invalid_skill_keeps_current_dialog(monkeypatch, tmp_path):
+    monkeypatch.setenv("CARDIOIA_SKILL_ARTIFACT_AUTOBUILD", "0")
+    svc = MockAssistantService()
+    dialog = svc._dialog
+    sid = svc.create_session()
+
+    monkeypatch.setattr(MockAssistantService, "_load_skill", classmethod(lambda cls: {"intents": []}))
+    monkeypatch.setattr(MockAssistantService, "_skill_path", staticmethod(lambda: str(tmp_path / "missing.json")))
+    with pytest.raises(ValueError):
+        svc.reload_skill()
+    assert svc._dialog is dialog and svc.skill_version == 1
+    assert svc.send_message(sid, "quero agendar uma consulta")["intents"][0]["intent"] == "agendar_consulta"
@@ -0,0 +1,37 @@
+from backend.intent_engine import TfidfIntentEngine
+from backend.mock_assistant import MockAssistantService
+
+INTENTS = {
+    "dor_no_peito": ["estou com dor no peito", "aperto no peito forte"],
+    "agendar_consulta": ["quero agendar uma consulta", "marcar consulta com cardiologista"],
+    "falta_de_ar": ["tenho falta de ar", "respiracao curta"],
+}
+
+
+def test_tfidf_ranks_top_k_and_batches():
+    engine = TfidfIntentEngine(INTENTS)
+    top = engine.classify("Estou com uma dor forte no peito", k=2)
+    assert top[0][0] == "dor_no_peito" and len(top) <= 2
+    assert all(a[1] >= b[1] for a, b in zip(top, top[1:]))
+    # Trigramas de caracteres cobrem flexao/erro de digitacao ("consultas", "cardiologsta").
+    assert engine.best("agendar consultas com cardiologsta")[0] == "agendar_consulta"
+    assert engine.best("meu dente ta doendo") == (None, engine.best("meu dente ta doendo")[1])
+
+    msgs = ["quero agendar uma consulta", "tenho falta de ar", "Quero agendar uma consulta!"]
+    batch = engine.classify_many(msgs, k=1)
+    assert [b[0][0] for b in batch] == ["agendar_consulta", "falta_de_ar", "agendar_consulta"]
+    assert batch[0] is batch[2]  # mesma mensagem normalizada calculada uma vez
+    assert batch == [engine.classify(m, k=1) for m in msgs]
+
+
+def test_tfidf_engine_keeps_assistant_guard_rails(monkeypatch):
+    monkeypatch.setenv("CARDIOIA_INTENT_ENGINE", "tfidf")
+    monkeypatch.setenv("CARDIOIA_RESPONSE_CACHE", "0")
+    svc = MockAssistantService()
+    assert svc._dialog.intent_engine is not None
+
+    sid = svc.create_session()
+    assert svc.send_message(sid, "quero agendar uma consulta")["intents"][0]["intent"] == "agendar_consulta"
+    # "dor no braço" continua sem virar "dor no peito" so por similaridade.
+    assert svc._best_intent("dor no braço")[0] is None
+    assert svc._best_intent("estou com dor no peito")[0] == "dor_no_peito"
@@ -0,0 +1,33 @@
+import threading
+
+from backend.metrics import Metrics
+
+
+def test_per_thread_shards_merge_into_prometheus_text():
+    m = Metrics(buckets=(0.1, 1.0))
+    m.describe("jobs_total", "counter", "Jobs.")
+
+    def work():
+        for _ in range(1000):
+            m.inc("jobs_total", kind="a")
+        m.observe("job_seconds", 0.05, kind="a")
+        m.observe("job_seconds", 0.5, kind="a")
+        m.observe("job_seconds", 5.0, kind="a")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    work()  # shard da thread principal (viva) + shards aposentados
+
+    text = m.render()
+    assert "# HELP jobs_total Jobs.\n# TYPE jobs_total counter\n" in text
+    assert 'jobs_total{kind="a"} 5000' in text
+    assert "# TYPE job_seconds histogram" in text
+    assert 'job_seconds_bucket{kind="a",le="0.1"} 5' in text
+    assert 'job_seconds_bucket{kind="a",le="1"} 10' in text
+    assert 'job_seconds_bucket{kind="a",le="+Inf"} 15' in text
+    assert 'job_seconds_count{kind="a"} 15' in text
+    assert len(m._shards) == 1  # threads mortas foram incorporadas
+    assert m.render() == text
@@ -0,0 +1,59 @@
+import random
+
+from backend.mock_assistant import _KEYWORDS, MockAssistantService, _KeywordAutomaton, _SessionContext
+
+
+def test_keyword_automaton_matches_substring_semantics():
+    automaton = _KeywordAutomaton(_KEYWORDS)
+    alphabet = "abcdeimnoprstu áç"
+    rng = random.Random(3)
+    samples = ["dor no peito", "normal", "parar", "oito", "sim ou nao", "dente", "pronto socorro"]
+    samples += ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40))) for _ in range(2000)]
+    for text in samples:
+        expected = {label for label, words in _KEYWORDS.items() if any(w in text for w in words)}
+        assert automaton.scan(text) == expected, text
+
+
+def test_dialog_table_flows_and_legacy_state_alias():
+    svc = MockAssistantService()
+    sid = svc.create_session()
+    assert svc.send_message(sid, "dor no braço")["intents"][0]["intent"] == "dor_no_braco"
+    r = svc.send_message(sid, "no esquerdo")
+    assert r["entities"] == [{"entity": "arm_side", "value": "esquerdo"}]
+    assert svc.send_message(sid, "sim")["intents"][0]["intent"] == "dor_no_peito"
+    assert svc._sessions[sid].state_name == "emergencia_irradia"
+    # Historico so registra turnos que passam pela classificacao (inicio e fluxo do braco).
+    assert svc._sessions[sid].turn_count == 3 and svc._sessions[sid].arm_side == "esquerdo"
+
+    sid = svc.create_session()
+    svc._sessions[sid].state_name = "emergencia_confirmacao"
+    r = svc.send_message(sid, "mandíbula")
+    assert r["intents"][0]["intent"] == "emergencia_irradia_sim"
+    assert svc._sessions[sid].emergency_irradia is True
+
+    # Cancelamento global vale em qualquer estado.
+    assert svc.send_message(sid, "deixa pra lá")["intents"][0]["intent"] == "cancelar"
+    assert svc._sessions[sid].state_name == "start"
+
+
+def test_session_context_history_is_bounded_and_serializable():
+    ctx = _SessionContext(capacity=4, created_at=1_700_000_000)
+    for i, intent in enumerate(["saudacao", None, "dor_no_peito", "agendar_consulta", "saudacao", "nova_intencao"]):
+        ctx.record(intent, ts=1_700_000_000 + i)
+    assert ctx.turn_count == 6
+    assert ctx.turns() == [
+        (1_700_000_002, "dor_no_peito"),
+        (1_700_000_003, "agendar_consulta"),
+        (1_700_000_004, "saudacao"),
+        (1_700_000_005, "nova_intencao"),
+    ]
+    ctx.state_name, ctx.arm_side, ctx.braco_attempts = "braco_peito", "direito", 2
+
+    data = ctx.to_bytes()
+    assert len(data) < 128
+    again = _SessionContext.from_bytes(data)
+    assert again.turns() == ctx.turns() and again.turn_count == 6 and again.created_at == ctx.created_at
+    assert (again.state_name, again.arm_side, again.braco_attempts, again.emergency_irradia) == ("braco_peito", "direito", 2, None)
+    again.record("saudacao", ts=1_700_000_006)
+    assert again.turns()[-1] == (1_700_000_006, "saudacao") and len(again.turns()) == 4
+
@@ -0,0 +1,80 @@
+import json
+import random
+import time
+
+from backend.mqtt_ingest import Backoff, MqttIngestBridge
+from backend.vitals_store import VitalsStore
+
+
+def test_bridge_batches_stores_and_acks_after_write(tmp_path):
+    store = VitalsStore(str(tmp_path))
+    alerts = []
+    bridge = MqttIngestBridge(store, topic="cardioia/+/vitals", batch_size=50, batch_ms=0, default_patient="fase3", on_alert=alerts.append)
+    acked = []
+    now = int(time.time())
+
+    # Payload da Fase 3 (ts em segundos, temp/hum/bpm), lista de leituras, paciente no topico e lixo.
+    for i in range(120):
+        payload = {"ts": now - 120 + i, "temp": 36.6, "hum": 55.0, "bpm": 125 if i == 7 else 75}
+        bridge.handle("cardioia/grupo1/vitals", json.dumps(payload), ack=lambda i=i: acked.append(i))
+    bridge.handle("cardioia/grupo1/vitals/42", json.dumps([{"ts": now, "bpm": 80}, {"ts": now + 1, "temp": 38.4}]))
+    bridge.handle("cardioia/grupo1/vitals", b"\xff nao e json")
+    bridge.handle("cardioia/grupo1/vitals", json.dumps({"patient_id": "../x", "bpm": 70}))
+
+    assert bridge.flush() == 122
+    stats = bridge.stats()
+    assert stats["received"] == 123 and stats["stored"] == 122 and stats["invalid"] == 2 and stats["batches"] == 3
+    assert sorted(acked) == list(range(120)) and stats["queue"] == 0
+    assert stats["lag_p95_s"] >= 100 and stats["readings_per_s"] > 0
+    assert [a["alerts"] for a in alerts] == [["Taquicardia"], ["Febre"]] and alerts[1]["patient_id"] == "42"
+
+    day = store.query("fase3", (now - 200) * 1000, (now + 10) * 1000, resolution_ms=None, fields=["heart_rate"])
+    assert day["points"] == 120 and day["series"]["heart_rate"][7] == 125.0
+    assert store.query("42", now * 1000, (now + 2) * 1000, resolution_ms=None)["points"] == 2
+
+
+
+def test_uptime_ts_from_the_esp32_is_stored_at_arrival_time(tmp_path):
+    store = VitalsStore(str(tmp_path))
+    bridge = MqttIngestBridge(store, batch_ms=0, default_patient="fase3")
+    before = time.time()
+
+    # Sketch da Fase 3 sem NTP: `ts` = millis()/1000 (segundos desde o boot); e um relogio adiantado.
+    bridge.handle("cardioia/grupo1/vitals", json.dumps({"ts": 159, "temp": 36.5, "bpm": 72}))
+    bridge.handle("cardioia/grupo1/vitals", json.dumps({"ts": before + 86400, "bpm": 74}))
+    assert bridge.flush() == 2
+    assert bridge.stats()["lag_max_s"] < 60
+
+    day = store.query("fase3", int((before - 86400) * 1000), int(time.time() * 1000) + 1, resolution_ms=None)
+    assert day["points"] == 2 and all(ts >= int(before * 1000) for ts in day["t"])
+
+
+def test_failed_write_is_not_acked_and_backoff_is_bounded(tmp_path):
+    blocker = tmp_path / "store"
+    blocker.write_text("nao e um diretorio", encoding="utf-8")
+    bridge = MqttIngestBridge(VitalsStore(str(blocker)), batch_ms=0)
+    acked = []
+    bridge.handle("cardioia/grupo1/vitals", json.dumps({"bpm": 90}), ack=lambda: acked.append(1))
+    assert bridge.flush() == 0 and acked == [] and bridge.stats()["failed"] == 1
+
+    backoff = Backoff(base_s=1, max_s=8, rng=random.Random(1))
+    delays = [backoff.next_delay() for _ in range(6)]
+    assert all(0.5 <= d <= 1 for d in delays[:1]) and all(4 <= d <= 8 for d in delays[3:])
+    backoff.reset()
+    assert backoff.next_delay() <= 1
+
+
+def test_bridge_starts_with_the_app_without_http_traffic(monkeypatch, tmp_path):
+    # Worker sem requisicoes (recem-reiniciado) ainda precisa assinar o topico dos dispositivos.
+    monkeypatch.setenv("CARDIOIA_ASSISTANT_MODE", "local")
+    monkeypatch.setenv("CARDIOIA_VITALS_STORE_PATH", str(tmp_path))
+    monkeypatch.setenv("CARDIOIA_MQTT_INGEST", "1")
+    monkeypatch.setenv("CARDIOIA_MQTT_PORT", "1")  # sem broker: o cliente fica tentando com espera
+    from backend.app import create_app
+
+    assert create_app(start_background=False).config["services"].peek("mqtt_ingest") is None  # master do gunicorn
+    bridge = create_app().config["services"].peek("mqtt_ingest")
+    try:
+        assert bridge is not None and len(bridge._threads) == 2
+    finally:
+        bridge.stop()
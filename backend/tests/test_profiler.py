@@ -0,0 +1,34 @@
+import threading
+import time
+
+from backend.profiler import SamplingProfiler
+
+
+def _busy_marker(stop):
+    while not stop.is_set():
+        sum(range(200))
+
+
+def test_sampler_collapses_stacks_of_profiled_threads_only():
+    prof = SamplingProfiler(interval_s=0.001, max_stacks=50)
+    stop = threading.Event()
+    profiled = threading.Thread(target=_busy_marker, args=(stop,))
+    ignored = threading.Thread(target=_busy_marker, args=(stop,), name="ignored")
+    profiled.start()
+    ignored.start()
+    assert prof.start("POST /api/message", thread_id=profiled.ident)
+    time.sleep(0.1)
+    prof.stop(profiled.ident)
+    stop.set()
+    profiled.join()
+    ignored.join()
+
+    lines = prof.collapsed().splitlines()
+    assert lines and all(line.startswith("POST /api/message;") for line in lines)
+    assert any("test_profiler.py:_busy_marker" in line for line in lines)
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) == prof.stats()["samples"]
+    assert prof.stats()["active"] == 0
+
+    # Limite de concorrencia.
+    small = SamplingProfiler(max_concurrent=1)
+    assert small.start("a", thread_id=1) and not small.start("b", thread_id=2)
@@ -0,0 +1,89 @@
+import os
+import threading
+
+import pytest
+
+from backend.rate_limit import (
+    ConcurrencyLimiter,
+    ConcurrencyLimitExceeded,
+    Limit,
+    MemoryBucketStore,
+    RateLimiter,
+    SQLiteBucketStore,
+    build_llm_limiter,
+    parse_limits,
+)
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_token_bucket_refills_over_time(tmp_path, backend):
+    now = [1000.0]
+    store = MemoryBucketStore() if backend == "memory" else SQLiteBucketStore(tmp_path / "rl.db")
+    limiter = RateLimiter(store, parse_limits("message=3/30,bad=x"), clock=lambda: now[0])
+    assert limiter.limits == {"message": Limit(3.0, 30.0)}
+    assert limiter.check("other", "u1") is None
+
+    assert [limiter.check("message", "u1").allowed for _ in range(4)] == [True, True, True, False]
+    denied = limiter.check("message", "u1")
+    assert not denied.allowed and denied.retry_after_s == pytest.approx(10.0)
+    assert limiter.check("message", "u2").allowed
+
+    now[0] += 10.0  # 1 ficha a cada 10 s
+    assert limiter.check("message", "u1").allowed
+    assert not limiter.check("message", "u1").allowed
+
+
+
+def test_limited_user_does_not_drain_the_shared_ip_bucket():
+    limiter = RateLimiter(MemoryBucketStore(), parse_limits("message=3/30"), clock=lambda: 1000.0, ip_factor=2)
+    # Um usuario insistindo atras do NAT: so as 3 chamadas liberadas contam no balde do IP (6).
+    assert [limiter.check_client("message", "u1", "10.0.0.9").allowed for _ in range(10)] == [True] * 3 + [False] * 7
+    assert [limiter.check_client("message", "u2", "10.0.0.9").allowed for _ in range(4)] == [True] * 3 + [False]
+    # Trocar de `user_id` nao escapa: o IP esgotou.
+    assert not limiter.check_client("message", "u3", "10.0.0.9").allowed
+    assert limiter.check_client("message", "u3", "10.0.0.10").allowed
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork so' em POSIX")
+def test_sqlite_store_reconnects_after_fork(tmp_path):
+    # Como no gunicorn com `preload_app`: o store nasce no master e cada worker abre a propria conexao.
+    store = SQLiteBucketStore(tmp_path / "rl.db")
+    limiter = RateLimiter(store, {"message": Limit(2, 60)}, clock=lambda: 1000.0)
+    assert limiter.check("message", "u1").allowed
+    parent_conn = store._conn
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover - filho
+        ok = limiter.check("message", "u1").allowed and store._conn is not parent_conn
+        os._exit(0 if ok else 1)
+    assert os.waitpid(pid, 0)[1] == 0
+    assert store._conn is parent_conn
+    assert not limiter.check("message", "u1").allowed  # o filho gastou a segunda ficha no mesmo arquivo
+
+
+def test_llm_concurrency_cap_rejects_after_timeout(monkeypatch):
+    limiter = ConcurrencyLimiter(max_concurrent=1, timeout_s=0.05)
+    inside, release = threading.Event(), threading.Event()
+
+    def hold():
+        with limiter.slot("gemini"):
+            inside.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=hold)
+    worker.start()
+    inside.wait(5)
+    with pytest.raises(ConcurrencyLimitExceeded):
+        with limiter.slot("gemini"):
+            pass
+    release.set()
+    worker.join()
+    with limiter.slot("gemini"):
+        pass
+    stats = limiter.stats()
+    assert stats["inflight"] == 0 and stats["peak"] == 1 and stats["rejected"] == 1
+
+    # Teto da maquina dividido entre os workers do gunicorn (no minimo 1 vaga por worker).
+    monkeypatch.setenv("CARDIOIA_LLM_MAX_CONCURRENCY", "8")
+    monkeypatch.setenv("CARDIOIA_LLM_WORKERS", "3")
+    assert build_llm_limiter().max_concurrent == 2
+    monkeypatch.setenv("CARDIOIA_LLM_WORKERS", "16")
+    assert build_llm_limiter().stats()["max_concurrent"] == 1
@@ -0,0 +1,48 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.clinical_extraction import ClinicalExtractionService, GeminiClinicalExtractor
+from backend.fake_gemini import FakeGeminiModel
+from backend.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution_and_errors():
+    flights = SingleFlight("teste")
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def slow():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return {"ok": True}
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(flights.do, "k", slow)
+        started.wait(5)
+        followers = [pool.submit(flights.do, "k", slow) for _ in range(3)]
+        while flights.stats()["coalesced"] < 3:
+            threading.Event().wait(0.001)
+        release.set()
+        results = [leader.result()] + [f.result() for f in followers]
+    assert len(runs) == 1 and all(r is results[0] for r in results)
+    assert flights.stats() == {"executions": 1, "coalesced": 3, "coalesced_rate": 0.75, "errors": 0, "inflight": 0}
+
+    # Terminada a chamada, a proxima executa de novo; excecoes chegam a quem esperava; recursao nao trava.
+    with pytest.raises(ValueError):
+        flights.do("k", lambda: (_ for _ in ()).throw(ValueError("falhou")))
+    assert flights.do("r", lambda: flights.do("r", lambda: 42)) == 42
+    assert flights.stats()["errors"] == 1 and flights.stats()["inflight"] == 0
+
+
+def test_identical_concurrent_extractions_call_gemini_once(tmp_path, monkeypatch):
+    monkeypatch.setenv("CARDIOIA_EXTRACTION_CACHE", "0")
+    model = FakeGeminiModel(latency_s=0.2)
+    svc = ClinicalExtractionService(gemini=GeminiClinicalExtractor(model=model))
+    texts = ["Dor no peito  e falta de ar, PA 150/95", "Dor no peito e falta de ar, PA 150/95 "] * 3
+    with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+        results = list(pool.map(svc.extract, texts))
+    assert model.calls == 1
+    assert {r.source for r in results} == {"gemini"} and all(r is results[0] for r in results)
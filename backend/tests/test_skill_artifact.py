@@ -0,0 +1,45 @@
+import os
+
+from backend import skill_artifact
+from backend.mock_assistant import MockAssistantService, _SkillIndex
+from backend.skill_artifact import artifact_status, read_artifact, write_artifact
+
+
+def test_artifact_roundtrip_and_staleness(tmp_path, monkeypatch):
+    source = tmp_path / "skill.json"
+    source.write_bytes(open(MockAssistantService._skill_path(), "rb").read())
+    target = str(tmp_path / "skill.bin")
+    idx = MockAssistantService._index_skill(MockAssistantService._load_skill())
+
+    assert artifact_status(target, str(source)) == "missing"
+    write_artifact(target, str(source), idx.to_payload())
+    assert _SkillIndex.from_payload(read_artifact(target, str(source))) == idx
+
+    # Mtime diferente com o mesmo conteudo (ex.: checkout) continua valendo.
+    st = source.stat()
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert artifact_status(target, str(source)) == "fresh"
+    # ...e o cabecalho guarda o mtime novo: as proximas partidas nao refazem o hash do export.
+    with monkeypatch.context() as m:
+        m.setattr(skill_artifact, "_sha256", lambda _path: b"")
+        assert _SkillIndex.from_payload(read_artifact(target, str(source))) == idx
+
+    # Payload corrompido ou export alterado: artefato ignorado.
+    data = bytearray(open(target, "rb").read())
+    data[-5] ^= 0xFF
+    open(target, "wb").write(bytes(data))
+    assert read_artifact(target, str(source)) is None
+    write_artifact(target, str(source), idx.to_payload())
+    source.write_text(source.read_text(encoding="utf-8") + " ", encoding="utf-8")
+    assert artifact_status(target, str(source)) == "stale" and read_artifact(target, str(source)) is None
+
+
+def test_service_rebuilds_stale_artifact(tmp_path, monkeypatch):
+    target = tmp_path / "watson_skill.bin"
+    monkeypatch.setenv("CARDIOIA_SKILL_ARTIFACT", str(target))
+    svc = MockAssistantService()
+    assert artifact_status(str(target), MockAssistantService._skill_path()) == "fresh"
+    again = MockAssistantService()
+    assert again._idx == svc._idx
+    sid = again.create_session()
+    assert again.send_message(sid, "quero agendar uma consulta")["intents"][0]["intent"] == "agendar_consulta"
@@ -0,0 +1,65 @@
+import gzip
+import os
+
+from flask import Flask
+
+from backend.static_files import StaticFiles
+
+
+def _app(root):
+    app = Flask(__name__, static_folder=None)
+    files = StaticFiles(str(root), immutable_prefixes=("assets/",))
+    app.add_url_rule("/s/<path:filename>", "s", files.send)
+    return app.test_client()
+
+
+def test_precompressed_variant_etag_and_304(tmp_path):
+    (tmp_path / "assets").mkdir()
+    js = tmp_path / "assets" / "app-abc123.js"
+    js.write_text("console.log('cardio');\n" * 200)
+    gz = tmp_path / "assets" / "app-abc123.js.gz"
+    gz.write_bytes(gzip.compress(js.read_bytes()))
+    st = js.stat()
+    os.utime(gz, ns=(st.st_atime_ns, st.st_mtime_ns))
+    client = _app(tmp_path)
+
+    res = client.get("/s/assets/app-abc123.js", headers={"Accept-Encoding": "br, gzip"})
+    assert res.status_code == 200
+    assert res.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in res.headers["Vary"]
+    assert res.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert res.headers["Content-Disposition"] == "inline; filename=app-abc123.js"
+    assert gzip.decompress(res.data) == js.read_bytes()
+    etag = res.headers["ETag"]
+    assert not etag.startswith("W/") and etag.endswith('-gzip"')
+
+    res = client.get("/s/assets/app-abc123.js", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert res.status_code == 304
+
+    # Sem gzip aceito -> identidade, com ETag propria.
+    plain = client.get("/s/assets/app-abc123.js")
+    assert "Content-Encoding" not in plain.headers and plain.data == js.read_bytes()
+    assert plain.headers["ETag"] != etag
+
+    # Original alterado: a variante antiga deixa de ser usada.
+    js.write_text("console.log('v2');\n" * 200)
+    os.utime(js, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    res = client.get("/s/assets/app-abc123.js", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in res.headers and res.data == js.read_bytes()
+
+
+def test_range_requests_html_revalidation_and_hidden_files(tmp_path):
+    (tmp_path / "relatorio.pdf").write_bytes(bytes(range(256)) * 64)
+    (tmp_path / "index.html").write_text("<html></html>")
+    (tmp_path / ".env").write_text("SECRET=1")
+    client = _app(tmp_path)
+
+    res = client.get("/s/relatorio.pdf", headers={"Range": "bytes=256-511"})
+    assert res.status_code == 206
+    assert res.headers["Content-Range"] == "bytes 256-511/16384"
+    assert res.data == bytes(range(256))
+    assert res.headers["Accept-Ranges"] == "bytes"
+
+    assert client.get("/s/index.html").headers["Cache-Control"] == "no-cache"
+    assert client.get("/s/.env").status_code == 404
+    assert client.get("/s/../relatorio.pdf").status_code == 404
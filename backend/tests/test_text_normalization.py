@@ -0,0 +1,35 @@
+import random
+import re
+import unicodedata
+
+from backend.phase2_triage import Phase2TriageService
+from backend.text_normalization import NormalizedText, fold, fold_many, normalize, phase2_many, tokenize
+
+
+def _legacy_fold(s):
+    s = (s or "").strip().lower()
+    s = "".join(ch for ch in unicodedata.normalize("NFKD", s) if not unicodedata.combining(ch))
+    return re.sub(r"\s+", " ", s)
+
+
+def test_fold_and_phase2_match_legacy_normalizers():
+    rng = random.Random(11)
+    alphabet = "aeiou ÁÉÍÓÚãõçÇ\t\n\xa0´¨¼µΣσİß①²-/:!"
+    texts = ["  Dor no PEITO  há 2h ", "Ç´a", "ΑΣ ΣΑ", "¼ de comprimido", ""]
+    texts += ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30))) for _ in range(3000)]
+    for t in texts:
+        assert fold(t) == _legacy_fold(t), repr(t)
+        assert NormalizedText(t).phase2 == re.sub(r"[^a-zà-ú0-9\s]", " ", t.lower()), repr(t)
+    assert fold_many(texts) == [_legacy_fold(t) for t in texts]
+    assert phase2_many(texts) == [NormalizedText(t).phase2 for t in texts]
+    assert tokenize("Pressão: 150/95, sem ALERGIAS!") == ["pressao:", "150/95", "sem", "alergias"]
+
+
+def test_normalized_views_are_memoized_and_shared_with_triage():
+    nt = normalize("Dor no peito e falta de ar")
+    assert normalize("Dor no peito e falta de ar") is nt
+    assert normalize(nt) is nt
+    assert nt.token_set == frozenset(["dor", "no", "peito", "e", "falta", "de", "ar"])
+
+    svc = Phase2TriageService()
+    assert svc.triage(nt) == svc.triage("  Dor no peito e falta de ar  ")
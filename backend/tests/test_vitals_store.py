@@ -0,0 +1,79 @@
+import math
+import os
+import random
+import time
+
+from backend.vitals_store import VitalsStore
+
+T0 = 1_699_999_200_000  # epoch ms, alinhado a hora
+
+
+def _readings(n, start_ms, step_ms, rng):
+    return [
+        {"ts": (start_ms + i * step_ms) / 1000, "bpm": rng.randint(55, 140), "temp": round(rng.uniform(36, 39.5), 1)}
+        for i in range(n)
+    ]
+
+
+def test_range_downsample_and_torn_tail(tmp_path):
+    rng = random.Random(3)
+    store = VitalsStore(str(tmp_path), chunk_s=3600, max_points=50)
+    readings = _readings(6000, T0, 1000, rng)  # 100 min, cruza janelas de 1h
+    for i in range(0, len(readings), 250):
+        assert store.append("p1", readings[i : i + 250]) == 250
+    store.append("p1", [{"ts": (T0 + 1500) / 1000, "systolic": 150, "diastolic": 95}])  # fora de ordem
+
+    raw = store.query("p1", T0, T0 + 5000, resolution_ms=None)
+    assert raw["points"] == 6 and raw["t"] == sorted(raw["t"]) and raw["series"]["systolic"][2] == 150.0
+    assert raw["series"]["heart_rate"][:2] == [readings[0]["bpm"], readings[1]["bpm"]]
+
+    # Automatico: 6001 pontos viram buckets de 2 min (<= 50), iguais ao calculo direto.
+    agg = store.query("p1", T0, T0 + 6_000_000, fields=["heart_rate"], aggs=["min", "max", "mean", "count"])
+    assert agg["resolution_ms"] == 120_000 and agg["buckets"] == 50 and agg["points"] == 6001
+    first = [r["bpm"] for r in readings[:120]]
+    hr = agg["series"]["heart_rate"]
+    assert (hr["min"][0], hr["max"][0], hr["count"][0]) == (min(first), max(first), 120)
+    assert math.isclose(hr["mean"][0], sum(first) / 120, abs_tol=1e-3)
+    assert sum(hr["count"]) == 6000
+
+    # Gravacao interrompida: a cauda incompleta e' ignorada na leitura e descartada na proxima gravacao.
+    chunk = os.path.join(str(tmp_path), "p1", f"{T0}.vts")
+    with open(chunk, "ab") as f:
+        f.write(b"VTB1\x10\x00")
+    assert store.query("p1", T0, T0 + 3_600_000, resolution_ms=120_000)["points"] == 3601
+    fresh = VitalsStore(str(tmp_path), chunk_s=3600)
+    fresh.append("p1", [{"ts": (T0 + 10) / 1000, "bpm": 99}])
+    assert fresh.query("p1", T0, T0 + 3_600_000, resolution_ms=120_000)["points"] == 3602
+
+
+def test_patient_vitals_api(monkeypatch, tmp_path):
+    monkeypatch.setenv("CARDIOIA_ASSISTANT_MODE", "local")
+    monkeypatch.setenv("CARDIOIA_VITALS_STORE_PATH", str(tmp_path))
+    from backend.app import create_app
+
+    client = create_app().test_client()
+    readings = [{"ts": (T0 + i * 60_000) / 1000, "bpm": 80 + i % 50, "temp": 36.8} for i in range(3000)]
+    readings[10]["bpm"] = 130
+    res = client.post("/api/patients/42/vitals", json={"readings": readings})
+    assert res.status_code == 201
+    assert res.get_json()["stored"] == 3000 and res.get_json()["alerts"][0]["alerts"] == ["Taquicardia"]
+    assert client.post("/api/phase3/vitals", json={"patient_id": 42, "ts": T0 / 1000, "temp": 38.5}).status_code == 200
+    # Sketch da Fase 3 sem NTP (`ts` = segundos desde o boot): entra na hora de chegada, nao em 1970.
+    assert client.post("/api/phase3/vitals", json={"patient_id": 7, "ts": 159, "bpm": 70}).status_code == 200
+    recent = client.get(f"/api/patients/7/vitals?end={time.time() + 60}&resolution=raw").get_json()
+    assert recent["points"] == 1
+
+    # Dois dias de leituras por minuto: a consulta devolve buckets, nao 3000 pontos crus.
+    end = T0 + 3000 * 60_000
+    data = client.get(f"/api/patients/42/vitals?start={T0 // 1000}&end={end // 1000}&agg=max,mean&fields=bpm").get_json()
+    assert data["buckets"] <= 1000 and data["resolution_ms"] == 300_000 and data["points"] == 3001
+    assert set(data["series"]["heart_rate"]) == {"max", "mean"} and data["series"]["heart_rate"]["max"][2] == 130.0
+
+    assert client.get(f"/api/patients/42/vitals?start={T0 // 1000}&end={end // 1000}&resolution=raw").status_code == 200
+    assert client.get("/api/patients/42/vitals?resolution=abc").status_code == 400
+    # Resolucao explicita fina demais para o intervalo: 400 antes de alocar os buckets.
+    res = client.get(f"/api/patients/42/vitals?start=0&end={end // 1000}&resolution=1s")
+    assert res.status_code == 400 and "resolution" in res.get_json()["error"]
+    assert client.get(f"/api/patients/42/vitals?start={T0 // 1000}&end={end // 1000}&resolution=1h").status_code == 200
+    assert client.get("/api/patients/..%2Fx/vitals").status_code in (400, 404)
+    assert "vitals_store" in client.get("/api/status").get_json()
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Iterable
+
+# Mensagens de chat e notas curtas sao memorizadas (a mesma mensagem passa pelo cache de
+# respostas, pelo assistente local e pela triagem); textos longos nao entram no memo.
+_MEMO_SIZE = 2048
+_MEMO_MAX_CHARS = 4096
+
+_WS_RE = re.compile(r"\s+")
+_SPACES_RE = re.compile(r" {2,}")
+_NON_TOKEN_RE = re.compile(r"[^a-z0-9\s/:-]")
+# Mesmo filtro de `diagnose.normalize` (Fase 2).
+_PHASE2_RE = re.compile(r"[^a-zà-ú0-9\s]")
+
+
+class _FoldTable(dict):
+    """
+    Tabela de `str.translate` para remover acentos (NFKD sem marcas combinantes), por caractere.
+
+    Decompor caractere a caractere da o mesmo resultado que decompor a string inteira: a
+    reordenacao canonica do NFKD so mexe em marcas combinantes, que sao descartadas. O bloco
+    latino e' pre-calculado; outros caracteres entram na tabela na primeira vez que aparecem.
+    """
+
+    def __missing__(self, code: int) -> str:
+        ch = chr(code)
+        folded = "".join(c for c in unicodedata.normalize("NFKD", ch) if not unicodedata.combining(c))
+        self[code] = folded
+        return folded
+
+
+_FOLD = _FoldTable()
+for _code in range(0x80, 0x250):
+    _FOLD[_code]
+del _code
+
+
+def _latin1_tables() -> tuple[bytes, str, bytes]:
+    """
+    Tabelas de `bytes.translate` para o caso comum (texto em Latin-1, como portugues).
+
+    - fold: remove acentos e troca todo espaco em branco por " " (so sobra colapsar "  ").
+      Os poucos caracteres cuja forma sem acento sai do Latin-1 (ex.: "¼" -> "1⁄4") ficam como
+      estao e sao tratados pela tabela completa.
+    - phase2: cada byte que `_PHASE2_RE` descarta vira espaco.
+    """
+    fold_table = bytearray(range(256))
+    wide = []
+    phase2_table = bytearray(range(256))
+    for code in range(256):
+        ch = chr(code)
+        folded = _FOLD[code] if code >= 0x80 else ch
+        if ch.isspace():
+            fold_table[code] = 0x20
+        elif len(folded) == 1 and ord(folded) < 256:
+            fold_table[code] = 0x20 if folded.isspace() else ord(folded)
+        else:
+            wide.append(ch)
+        if _PHASE2_RE.match(ch):
+            phase2_table[code] = 0x20
+    return bytes(fold_table), "".join(wide), bytes(phase2_table)
+
+
+_LATIN1_FOLD, _LATIN1_WIDE, _LATIN1_PHASE2 = _latin1_tables()
+
+
+def _fold_lowered(s: str) -> str:
+    try:
+        data = s.encode("latin-1")
+    except UnicodeEncodeError:
+        return _WS_RE.sub(" ", s.translate(_FOLD))
+    s = data.translate(_LATIN1_FOLD).decode("latin-1")
+    if not s.isascii() and any(ch in s for ch in _LATIN1_WIDE):
+        s = s.translate(_FOLD)
+    if "  " in s:
+        s = _SPACES_RE.sub(" ", s)
+    return s
+
+
+def fold(text: str) -> str:
+    """Minusculas, sem acentos e com espacos colapsados (antigo `_strip_accents_lower`)."""
+    return _fold_lowered((text or "").strip().lower())
+
+
+def tokenize(text: str) -> list[str]:
+    """Tokens do texto ja dobrado (`fold`), separando tudo que nao for [a-z0-9/:-]."""
+    return _NON_TOKEN_RE.sub(" ", fold(text)).split()
+
+
+def _phase2_lowered(s: str) -> str:
+    try:
+        return s.encode("latin-1").translate(_LATIN1_PHASE2).decode("latin-1")
+    except UnicodeEncodeError:
+        return _PHASE2_RE.sub(" ", s)
+
+
+def phase2_normalize(text: str | NormalizedText) -> str:
+    """Equivalente a `diagnose.normalize` da Fase 2; reaproveita a visao ja calculada de um `NormalizedText`."""
+    if isinstance(text, NormalizedText):
+        return text.phase2
+    return _phase2_lowered(text.lower())
+
+
+class NormalizedText:
+    """
+    Texto de uma requisicao com as visoes normalizadas calculadas sob demanda (uma vez cada).
+
+    - `lower`: `raw.lower()`
+    - `folded`: minusculas, sem acentos, espacos colapsados (chave do assistente local)
+    - `tokens` / `token_set`: tokens de `folded` (similaridade de intencoes)
+    - `phase2`: visao usada pelas regras da Fase 2 (`diagnose.normalize`)
+    """
+
+    __slots__ = ("raw", "_lower", "_folded", "_tokens", "_token_set", "_phase2")
+
+    def __init__(self, raw: str) -> None:
+        self.raw = raw or ""
+        self._lower: str | None = None
+        self._folded: str | None = None
+        self._tokens: tuple[str, ...] | None = None
+        self._token_set: frozenset[str] | None = None
+        self._phase2: str | None = None
+
+    def __repr__(self) -> str:
+        return f"NormalizedText({self.raw!r})"
+
+    @property
+    def lower(self) -> str:
+        if self._lower is None:
+            self._lower = self.raw.lower()
+        return self._lower
+
+    @property
+    def folded(self) -> str:
+        if self._folded is None:
+            self._folded = fold(self.raw)
+        return self._folded
+
+    @property
+    def tokens(self) -> tuple[str, ...]:
+        if self._tokens is None:
+            self._tokens = tuple(_NON_TOKEN_RE.sub(" ", self.folded).split())
+        return self._tokens
+
+    @property
+    def token_set(self) -> frozenset[str]:
+        if self._token_set is None:
+            self._token_set = frozenset(self.tokens)
+        return self._token_set
+
+    @property
+    def phase2(self) -> str:
+        if self._phase2 is None:
+            self._phase2 = _phase2_lowered(self.lower)
+        return self._phase2
+
+
+@lru_cache(maxsize=_MEMO_SIZE)
+def _normalize_memo(text: str) -> NormalizedText:
+    return NormalizedText(text)
+
+
+def normalize(text: str | NormalizedText) -> NormalizedText:
+    """Retorna o `NormalizedText` da mensagem (o mesmo objeto para mensagens curtas repetidas)."""
+    if isinstance(text, NormalizedText):
+        return text
+    text = text or ""
+    if len(text) > _MEMO_MAX_CHARS:
+        return NormalizedText(text)
+    return _normalize_memo(text)
+
+
+def fold_many(texts: Iterable[str]) -> list[str]:
+    """`fold` em lote (backfill de corpora grandes)."""
+    return [fold(t) for t in texts]
+
+
+def phase2_many(texts: Iterable[str]) -> list[str]:
+    """`phase2_normalize` em lote."""
+    return [_phase2_lowered((t or "").lower()) for t in texts]
+
+
+def normalize_many(texts: Iterable[str]) -> list[NormalizedText]:
+    """`NormalizedText` para cada texto, com as visoes `folded` e `phase2` ja preenchidas em lote."""
+    items = [NormalizedText(t) for t in texts]
+    raws = [nt.raw for nt in items]
+    for nt, folded, p2 in zip(items, fold_many(raws), phase2_many(raws)):
+        nt._folded = folded
+        nt._phase2 = p2
+    return items
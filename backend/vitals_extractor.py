@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator
+
+
+def _bp(g: tuple[str | None, ...]) -> str | None:
+    return f"{g[0]}/{g[1]}"
+
+
+def _hr(g: tuple[str | None, ...]) -> int | None:
+    return int(g[0])  # type: ignore[arg-type]
+
+
+def _temp_legacy(g: tuple[str | None, ...]) -> float | None:
+    return float(f"{g[0]}.{g[1] or '0'}")
+
+
+def _temp(g: tuple[str | None, ...]) -> float | None:
+    value = float(f"{g[0]}.{g[1] or '0'}")
+    unit = (g[2] or "").lower()
+    if unit.startswith("f"):
+        value = round((value - 32.0) * 5.0 / 9.0, 1)
+    # Fora da faixa fisiologica, provavelmente nao e' temperatura (ex.: "45 graus" de angulo).
+    if not 30.0 <= value <= 45.0:
+        return None
+    return value
+
+
+@dataclass(frozen=True)
+class _Rule:
+    kind: str  # chave no dicionario de saida
+    priority: int  # menor vence; empate -> primeira ocorrencia no texto
+    head: tuple[str, ...]  # palavras-chave (regex); vazio = regra que comeca por um numero
+    tail: str  # resto do padrao, avaliado em lookahead
+    convert: Callable[[tuple[str | None, ...]], Any]
+
+
+# Cada regra consome apenas o "cabecalho" (palavra-chave ou primeiro numero) e valida o resto em
+# lookahead. Assim uma unica varredura encontra todas as ocorrencias, inclusive sobrepostas
+# (ex.: "fc 120/80" -> FC 120 e PA 120/80), com o mesmo resultado das buscas separadas antigas.
+# Prioridade 0/1: padroes originais (compatibilidade); as demais sao as frases/unidades novas.
+_RULES: tuple[_Rule, ...] = (
+    _Rule("pressao_arterial", 0, (), r"\s*/\s*(\d{2,3})\b", _bp),
+    _Rule("pressao_arterial", 1, (), r"\s*(?:x|por)\s*(\d{2,3})\s*(?:mm\s*hg)?\b", _bp),
+    _Rule("frequencia_cardiaca_bpm", 0, ("fc", "frequencia cardiaca", "bpm"), r"\s*[:=]?\s*(\d{2,3})\b", _hr),
+    _Rule("frequencia_cardiaca_bpm", 1, (), r"\s*bpm\b", _hr),
+    _Rule(
+        "frequencia_cardiaca_bpm",
+        2,
+        ("pulso", "batimentos", r"freq(?:\.|uencia|uência)?\s*card(?:iaca|íaca)", r"frequência\s+cardíaca"),
+        r"\s*(?:de\s+)?[:=]?\s*(\d{2,3})\b",
+        _hr,
+    ),
+    _Rule("frequencia_cardiaca_bpm", 3, (), r"\s*(?:batimentos|bat\s*/\s*min|btm)\b", _hr),
+    _Rule("temperatura_c", 0, ("temp", "temperatura"), r"\s*[:=]?\s*(\d{2})(?:[\\.,](\d))?\s*(?:c|°c)?\b", _temp_legacy),
+    _Rule(
+        "temperatura_c",
+        1,
+        (r"temp\.?", "temperatura", "febre", "tax"),
+        r"\s*(?:de\s+)?[:=]?\s*(\d{2,3})(?:[.,](\d{1,2}))?(?!\d)\s*(?:°|º|graus)?\s*(?:(celsius|fahrenheit|c|f)(?![a-z]))?",
+        _temp,
+    ),
+    _Rule(
+        "temperatura_c",
+        2,
+        (),
+        r"(?:[.,](\d{1,2}))?(?!\d)\s*(?:°|º|graus)\s*(?:(celsius|fahrenheit|c|f)(?![a-z]))?",
+        _temp,
+    ),
+)
+
+
+class VitalsExtractor:
+    """
+    Extrator de sinais vitais (PA, FC, temperatura) com uma unica regex combinada e pre-compilada.
+
+    - `extract(texto)` -> dict (mesmo formato de `_extract_vitals_simple`)
+    - `extract_many(textos)` -> iterador de dicts (aceita lista ou gerador; processa em streaming)
+
+    As regras que comecam por numero compartilham o mesmo cabecalho `\\d{2,3}`; as demais sao
+    agrupadas por palavra-chave. Um filtro pela primeira letra evita testar posicoes inuteis.
+    """
+
+    def __init__(self, rules: tuple[_Rule, ...] = _RULES) -> None:
+        numeric = [(i, r) for i, r in enumerate(rules) if not r.head]
+        keyword = [(i, r) for i, r in enumerate(rules) if r.head]
+
+        first_chars = {"0123456789"} if numeric else set()
+        branches = []
+        if numeric:
+            tails = "|".join(f"(?P<r{i}>(?={r.tail}))" for i, r in numeric)
+            branches.append(rf"(?P<num>\d{{2,3}})(?:{tails})")
+        for i, r in keyword:
+            first_chars.update(h[0].lower() + h[0].upper() for h in r.head)
+            branches.append(f"(?P<r{i}>(?:{'|'.join(r.head)})(?={r.tail}))")
+        prefix = "".join(sorted(set("".join(first_chars))))
+        self._regex = re.compile(rf"(?=[{re.escape(prefix)}])\b(?:{'|'.join(branches)})", re.I)
+
+        # nome do grupo -> (regra, indices dos grupos que alimentam `convert`)
+        gi = self._regex.groupindex
+        self._dispatch: dict[str, tuple[_Rule, tuple[int, ...]]] = {}
+        for i, r in enumerate(rules):
+            outer = gi[f"r{i}"]
+            inner = tuple(range(outer + 1, outer + 1 + re.compile(r.tail, re.I).groups))
+            self._dispatch[f"r{i}"] = (r, ((gi["num"],) if not r.head else ()) + inner)
+
+        self._kinds = {r.kind for r in rules}
+        self._top = {kind: min(r.priority for r in rules if r.kind == kind) for kind in self._kinds}
+
+    def extract(self, text: str) -> dict[str, Any]:
+        best: dict[str, tuple[int, Any]] = {}
+        done = 0
+        for m in self._regex.finditer(text or ""):
+            rule, groups = self._dispatch[m.lastgroup]  # type: ignore[index]
+            current = best.get(rule.kind)
+            if current is not None and current[0] <= rule.priority:
+                continue
+            value = rule.convert(m.group(*groups) if len(groups) > 1 else (m.group(groups[0]),))
+            if value is None:
+                continue
+            best[rule.kind] = (rule.priority, value)
+            if rule.priority == self._top[rule.kind]:
+                done += 1
+                if done == len(self._kinds):
+                    break
+
+        # Ordem de chaves estavel (igual a implementacao anterior).
+        return {kind: best[kind][1] for kind in ("pressao_arterial", "frequencia_cardiaca_bpm", "temperatura_c") if kind in best}
+
+    def extract_many(self, texts: Iterable[str]) -> Iterator[dict[str, Any]]:
+        extract = self.extract
+        for text in texts:
+            yield extract(text)
+
+
+DEFAULT_EXTRACTOR = VitalsExtractor()
+
+
+def extract_vitals(text: str) -> dict[str, Any]:
+    return DEFAULT_EXTRACTOR.extract(text)
@@ -0,0 +1,489 @@
+from __future__ import annotations
+
+import bisect
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Iterable, Iterator
+
+from backend.metrics import METRICS
+
+try:  # Trava entre processos (workers do gunicorn gravando no mesmo paciente); no Windows so' por processo.
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
+METRICS.describe("cardioia_vitals_points_total", "counter", "Leituras gravadas no armazenamento de sinais vitais.")
+METRICS.describe("cardioia_vitals_query_seconds", "histogram", "Duracao das consultas de serie temporal (mode=raw|agg).")
+
+FIELDS = ("systolic", "diastolic", "heart_rate", "temp")
+# Nomes usados pelos dispositivos da Fase 3 (`bpm`) e pelo banco do RPA.
+_ALIASES = {"bpm": "heart_rate", "hr": "heart_rate", "temperature": "temp", "sys": "systolic", "dia": "diastolic"}
+AGGS = ("min", "max", "mean", "count")
+DEFAULT_AGGS = ("min", "max", "mean")
+
+# Arquivo por paciente e janela de tempo (`<raiz>/<paciente>/<inicio_ms>.vts`), so com acrescimos.
+# Cada gravacao (um lote) vira um bloco colunar:
+#   cabecalho | estatisticas por coluna | ts int64[n] (ms) | systolic f32[n] | ... | temp f32[n]
+# As linhas do bloco ficam ordenadas por ts; min/max do cabecalho permitem pular blocos fora do
+# intervalo e as estatisticas respondem um bucket inteiro sem ler os pontos. Colunas em ordem de
+# bytes nativa (little-endian em x86/ARM); valor ausente = NaN.
+MAGIC = b"VTB1"
+_HEAD = struct.Struct("<4sIqq")  # magic, linhas, ts minimo, ts maximo
+_STATS = struct.Struct("<ffdI4x")  # min, max, soma, contagem (sem NaN)
+_BLOCK_HEAD = _HEAD.size + _STATS.size * len(FIELDS)
+_ROW = 8 + 4 * len(FIELDS)
+_PATIENT_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# Passos "redondos" para a resolucao automatica (segundos).
+_NICE_STEPS_S = (1, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 10800, 21600, 43200, 86400, 604800)
+_UNITS_S = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name) or default))
+    except ValueError:
+        return default
+
+
+def default_store_path() -> str:
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    path = (os.getenv("CARDIOIA_VITALS_STORE_PATH") or "").strip()
+    return path or os.path.join(repo_root, "backend", "data", "vitals")
+
+
+def parse_time_ms(value: Any) -> int:
+    """Epoch em segundos (ou ms, se grande demais para segundos) ou ISO 8601 (sem fuso = UTC)."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        number = float(value)
+    else:
+        text = str(value or "").strip()
+        try:
+            number = float(text)
+        except ValueError:
+            try:
+                dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+            except ValueError:
+                raise ValueError(f"Horario invalido: {value!r}") from None
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)
+            return int(dt.timestamp() * 1000)
+    if not math.isfinite(number):
+        raise ValueError(f"Horario invalido: {value!r}")
+    return int(number if abs(number) >= 1e11 else number * 1000)
+
+
+# Antes de 2001 o `ts` nao e' relogio de parede, e' tempo de uptime do dispositivo (o sketch da
+# Fase 3 manda `millis()/1000` quando o ESP32 nao tem NTP).
+_MIN_WALL_CLOCK_MS = 978_307_200_000
+
+
+def device_time_ms(value: Any, received_at_s: float, max_ahead_s: float = 300.0) -> int:
+    """
+    Horario de uma leitura vinda de um dispositivo. Sem `ts`, com `ts` relativo (uptime) ou muito
+    adiante da chegada (relogio errado), vale a hora em que a leitura chegou; `ts` ilegivel -> ValueError.
+    """
+    received_ms = int(received_at_s * 1000)
+    if value is None:
+        return received_ms
+    ts = parse_time_ms(value)
+    if ts < _MIN_WALL_CLOCK_MS or ts > received_ms + max_ahead_s * 1000:
+        return received_ms
+    return ts
+
+
+def parse_resolution_ms(value: Any) -> int | None:
+    """"raw" => None; "auto"/vazio => 0; "300", "5m", "1h", "1d" => milissegundos."""
+    text = str(value or "auto").strip().lower()
+    if text == "raw":
+        return None
+    if text == "auto":
+        return 0
+    unit = _UNITS_S.get(text[-1])
+    try:
+        seconds = float(text[:-1]) * unit if unit else float(text)
+    except ValueError:
+        raise ValueError(f"Resolucao invalida: {value!r}") from None
+    if not seconds > 0:
+        raise ValueError(f"Resolucao invalida: {value!r}")
+    return max(1, int(seconds * 1000))
+
+
+def _as_float(value: Any) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return number if math.isfinite(number) else math.nan
+
+
+@dataclass(frozen=True)
+class _Block:
+    n: int
+    min_ts: int
+    max_ts: int
+    stats: tuple[tuple[float, float, float, int], ...]
+    ts: memoryview
+    cols: tuple[memoryview, ...]
+
+
+def _encode_block(rows: list[tuple[int, tuple[float, ...]]]) -> bytes:
+    rows.sort(key=lambda row: row[0])
+    ts = array("q", (row[0] for row in rows))
+    stats, cols = [], []
+    for i in range(len(FIELDS)):
+        col = array("f", (row[1][i] for row in rows))
+        values = [v for v in col if v == v]
+        if values:
+            stats.append(_STATS.pack(min(values), max(values), math.fsum(values), len(values)))
+        else:
+            stats.append(_STATS.pack(math.nan, math.nan, 0.0, 0))
+        cols.append(col.tobytes())
+    return b"".join([_HEAD.pack(MAGIC, len(rows), ts[0], ts[-1]), *stats, ts.tobytes(), *cols])
+
+
+def _valid_length(f: Any, size: int) -> int:
+    """Bytes ate o ultimo bloco completo (o resto e' uma gravacao interrompida)."""
+    off = 0
+    while off + _HEAD.size <= size:
+        f.seek(off)
+        magic, n, _lo, _hi = _HEAD.unpack(f.read(_HEAD.size))
+        end = off + _BLOCK_HEAD + n * _ROW
+        if magic != MAGIC or n == 0 or end > size:
+            break
+        off = end
+    return off
+
+
+def _read_blocks(path: str) -> Iterator[_Block]:
+    """Blocos do arquivo via mmap (as colunas sao views, sem copia)."""
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _BLOCK_HEAD:
+            return
+        mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+    view = memoryview(mm)
+    off = 0
+    while off + _BLOCK_HEAD <= size:
+        magic, n, lo, hi = _HEAD.unpack_from(mm, off)
+        end = off + _BLOCK_HEAD + n * _ROW
+        if magic != MAGIC or n == 0 or end > size:
+            break  # cauda de uma gravacao em andamento/interrompida
+        stats = tuple(_STATS.unpack_from(mm, off + _HEAD.size + i * _STATS.size) for i in range(len(FIELDS)))
+        p = off + _BLOCK_HEAD
+        ts = view[p : p + 8 * n].cast("q")
+        p += 8 * n
+        cols = []
+        for _ in FIELDS:
+            cols.append(view[p : p + 4 * n].cast("f"))
+            p += 4 * n
+        yield _Block(n, lo, hi, stats, ts, tuple(cols))
+        off = end
+
+
+def _nice_resolution_ms(span_ms: int, max_points: int) -> int:
+    target_s = span_ms / 1000 / max(1, max_points)
+    for step in _NICE_STEPS_S:
+        if step >= target_s:
+            return step * 1000
+    return math.ceil(target_s / _NICE_STEPS_S[-1]) * _NICE_STEPS_S[-1] * 1000
+
+
+def _clean(value: float) -> float | None:
+    return round(value, 3) if value == value else None
+
+
+class VitalsStore:
+    """
+    Serie temporal de sinais vitais por paciente (pressao, frequencia cardiaca, temperatura).
+
+    Gravacao so por acrescimo, em blocos colunares por lote, num arquivo por janela de tempo
+    (`CARDIOIA_VITALS_CHUNK_S`); leitura por mmap. `query` devolve os pontos crus ou, em intervalos
+    longos, min/max/media por bucket -- o grafico nunca recebe mais que `max_points` pontos.
+    """
+
+    def __init__(
+        self,
+        root: str | None = None,
+        chunk_s: int | None = None,
+        max_points: int | None = None,
+        max_raw_points: int | None = None,
+    ) -> None:
+        self.root = root or default_store_path()
+        self.chunk_ms = (chunk_s or _env_int("CARDIOIA_VITALS_CHUNK_S", 86400)) * 1000
+        self.max_points = max_points or _env_int("CARDIOIA_VITALS_MAX_POINTS", 1000)
+        self.max_raw_points = max_raw_points or _env_int("CARDIOIA_VITALS_MAX_RAW_POINTS", 20000)
+        self._lock = threading.Lock()
+        self._checked: set[str] = set()
+        self.appended = 0
+        self.queries = 0
+
+    def _patient_dir(self, patient_id: Any) -> str:
+        pid = str(patient_id)
+        if not _PATIENT_RE.match(pid):
+            raise ValueError(f"patient_id invalido: {pid!r}")
+        return os.path.join(self.root, pid)
+
+    def append(self, patient_id: Any, readings: Iterable[dict[str, Any]], now_ms: int | None = None) -> int:
+        """Grava um lote de leituras (`ts` + campos de `FIELDS` ou apelidos). Retorna quantas entraram."""
+        directory = self._patient_dir(patient_id)
+        chunks: dict[int, list[tuple[int, tuple[float, ...]]]] = {}
+        for reading in readings:
+            values = dict.fromkeys(FIELDS, math.nan)
+            for key, value in reading.items():
+                field = _ALIASES.get(key, key)
+                if field in values:
+                    values[field] = _as_float(value)
+            if all(v != v for v in values.values()):
+                continue
+            raw_ts = reading.get("ts", reading.get("timestamp"))
+            ts = parse_time_ms(raw_ts) if raw_ts is not None else (now_ms or int(time.time() * 1000))
+            chunks.setdefault(ts - ts % self.chunk_ms, []).append((ts, tuple(values[f] for f in FIELDS)))
+
+        total = 0
+        for chunk_start, rows in sorted(chunks.items()):
+            os.makedirs(directory, exist_ok=True)
+            self._append_block(os.path.join(directory, f"{chunk_start}.vts"), _encode_block(rows))
+            total += len(rows)
+        if total:
+            with self._lock:
+                self.appended += total
+            METRICS.inc("cardioia_vitals_points_total", total)
+        return total
+
+    def _append_block(self, path: str, data: bytes) -> None:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            with self._lock:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                # Primeira gravacao do processo neste arquivo: descarta a cauda de uma gravacao
+                # interrompida, senao os blocos novos ficariam depois de lixo e nunca seriam lidos.
+                if path not in self._checked:
+                    size = os.fstat(fd).st_size
+                    with open(path, "rb") as f:
+                        valid = _valid_length(f, size)
+                    if valid != size:
+                        os.ftruncate(fd, valid)
+                    self._checked.add(path)
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view) :]
+        finally:
+            os.close(fd)  # libera o flock
+
+    def _chunk_paths(self, directory: str, start_ms: int, end_ms: int) -> list[str]:
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return []
+        out = []
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            if ext != ".vts" or not stem.lstrip("-").isdigit():
+                continue
+            chunk_start = int(stem)
+            if chunk_start < end_ms and chunk_start + self.chunk_ms > start_ms:
+                out.append((chunk_start, os.path.join(directory, name)))
+        return [path for _, path in sorted(out)]
+
+    def _blocks(self, patient_id: Any, start_ms: int, end_ms: int) -> Iterator[_Block]:
+        for path in self._chunk_paths(self._patient_dir(patient_id), start_ms, end_ms):
+            for block in _read_blocks(path):
+                if block.max_ts >= start_ms and block.min_ts < end_ms:
+                    yield block
+
+    def query(
+        self,
+        patient_id: Any,
+        start_ms: int,
+        end_ms: int,
+        resolution_ms: int | None = 0,
+        aggs: Iterable[str] = DEFAULT_AGGS,
+        fields: Iterable[str] = FIELDS,
+    ) -> dict[str, Any]:
+        """
+        Pontos em [start_ms, end_ms). `resolution_ms`: None = pontos crus, 0 = automatico (crus
+        se couberem em `max_points`, senao buckets "redondos"), > 0 = buckets desse tamanho.
+        Os buckets sao alinhados ao epoch (o mesmo grafico nao "anda" entre atualizacoes).
+        """
+        fields = tuple(_ALIASES.get(f, f) for f in fields)
+        aggs = tuple(aggs)
+        unknown = [f for f in fields if f not in FIELDS] + [a for a in aggs if a not in AGGS]
+        if unknown:
+            raise ValueError(f"Campos/agregacoes desconhecidos: {', '.join(unknown)}")
+        if end_ms <= start_ms:
+            raise ValueError("`end` deve ser maior que `start`.")
+        if resolution_ms is not None and resolution_ms > 0:
+            # Os buckets sao alocados densos: a resolucao pedida nao pode passar de `max_points` buckets.
+            buckets = (end_ms - 1) // resolution_ms - start_ms // resolution_ms + 1
+            if buckets > self.max_points:
+                coarser = _nice_resolution_ms(end_ms - start_ms, self.max_points)
+                raise ValueError(
+                    f"{buckets} buckets passam do limite de {self.max_points}; "
+                    f"use `resolution` >= {coarser // 1000}s, `auto` ou encurte o intervalo."
+                )
+
+        t0 = time.perf_counter()
+        blocks = list(self._blocks(patient_id, start_ms, end_ms))
+        if resolution_ms is not None and resolution_ms <= 0:
+            points = sum(hi - lo for lo, hi in (_slice(b, start_ms, end_ms) for b in blocks))
+            resolution_ms = None if points <= self.max_points else _nice_resolution_ms(end_ms - start_ms, self.max_points)
+
+        if resolution_ms is None:
+            result = self._raw(blocks, start_ms, end_ms, fields)
+            mode = "raw"
+        else:
+            result = self._aggregate(blocks, start_ms, end_ms, resolution_ms, aggs, fields)
+            mode = "agg"
+        with self._lock:
+            self.queries += 1
+        METRICS.observe("cardioia_vitals_query_seconds", time.perf_counter() - t0, mode=mode)
+        return {
+            "patient_id": str(patient_id),
+            "start": start_ms,
+            "end": end_ms,
+            "resolution_ms": resolution_ms,
+            "fields": list(fields),
+            **result,
+        }
+
+    def _raw(self, blocks: list[_Block], start_ms: int, end_ms: int, fields: tuple[str, ...]) -> dict[str, Any]:
+        idx = [FIELDS.index(f) for f in fields]
+        ts: list[int] = []
+        cols: list[list[float]] = [[] for _ in idx]
+        for block in blocks:
+            lo, hi = _slice(block, start_ms, end_ms)
+            ts.extend(block.ts[lo:hi].tolist())
+            for out, i in zip(cols, idx):
+                out.extend(block.cols[i][lo:hi].tolist())
+            if len(ts) > self.max_raw_points:
+                raise ValueError(f"Mais de {self.max_raw_points} pontos; use `resolution` (ex.: 5m) ou encurte o intervalo.")
+        # Blocos com horarios sobrepostos (leituras fora de ordem): reordena so quando precisa.
+        order = range(len(ts))
+        if any(ts[i] > ts[i + 1] for i in range(len(ts) - 1)):
+            order = sorted(order, key=ts.__getitem__)
+            ts = [ts[i] for i in order]
+            cols = [[col[i] for i in order] for col in cols]
+        return {
+            "points": len(ts),
+            "t": ts,
+            "series": {f: [_clean(v) for v in col] for f, col in zip(fields, cols)},
+        }
+
+    def _aggregate(
+        self,
+        blocks: list[_Block],
+        start_ms: int,
+        end_ms: int,
+        res: int,
+        aggs: tuple[str, ...],
+        fields: tuple[str, ...],
+    ) -> dict[str, Any]:
+        origin = start_ms - start_ms % res
+        nb = (end_ms - 1 - origin) // res + 1
+        idx = [FIELDS.index(f) for f in fields]
+        mins = [[math.inf] * nb for _ in idx]
+        maxs = [[-math.inf] * nb for _ in idx]
+        sums = [[0.0] * nb for _ in idx]
+        counts = [[0] * nb for _ in idx]
+        rows = [0] * nb
+        points = 0
+
+        for block in blocks:
+            first = (block.min_ts - origin) // res
+            if first == (block.max_ts - origin) // res and block.min_ts >= start_ms and block.max_ts < end_ms:
+                # Bloco inteiro dentro de um bucket: as estatisticas do cabecalho bastam.
+                rows[first] += block.n
+                points += block.n
+                for k, i in enumerate(idx):
+                    lo_v, hi_v, total, count = block.stats[i]
+                    if count:
+                        mins[k][first] = min(mins[k][first], lo_v)
+                        maxs[k][first] = max(maxs[k][first], hi_v)
+                        sums[k][first] += total
+                        counts[k][first] += count
+                continue
+            ts = block.ts
+            i, hi = _slice(block, start_ms, end_ms)
+            if i == hi:
+                continue
+            points += hi - i
+            spanned = (ts[hi - 1] - origin) // res - (ts[i] - origin) // res + 1
+            if (hi - i) < 16 * spanned:
+                # Poucos pontos por bucket: um passo por ponto sai mais barato que fatiar.
+                buckets = [(t - origin) // res for t in ts[i:hi].tolist()]
+                for b in buckets:
+                    rows[b] += 1
+                for k, c in enumerate(idx):
+                    mn, mx, sm, ct = mins[k], maxs[k], sums[k], counts[k]
+                    for b, v in zip(buckets, block.cols[c][i:hi].tolist()):
+                        if v == v:
+                            if v < mn[b]:
+                                mn[b] = v
+                            if v > mx[b]:
+                                mx[b] = v
+                            sm[b] += v
+                            ct[b] += 1
+                continue
+            # Bloco ordenado: cada bucket e' uma fatia continua (bisect), reduzida com min/max/sum.
+            while i < hi:
+                b = (ts[i] - origin) // res
+                j = bisect.bisect_left(ts, origin + (b + 1) * res, i, hi)
+                rows[b] += j - i
+                for k, c in enumerate(idx):
+                    values = [v for v in block.cols[c][i:j].tolist() if v == v]
+                    if values:
+                        mins[k][b] = min(mins[k][b], min(values))
+                        maxs[k][b] = max(maxs[k][b], max(values))
+                        sums[k][b] += sum(values)
+                        counts[k][b] += len(values)
+                i = j
+
+        used = [b for b in range(nb) if rows[b]]
+        series: dict[str, dict[str, list[Any]]] = {}
+        for k, field in enumerate(fields):
+            out: dict[str, list[Any]] = {}
+            ct = counts[k]
+            for agg in aggs:
+                if agg == "count":
+                    out[agg] = [ct[b] for b in used]
+                elif agg == "min":
+                    out[agg] = [_clean(mins[k][b]) if ct[b] else None for b in used]
+                elif agg == "max":
+                    out[agg] = [_clean(maxs[k][b]) if ct[b] else None for b in used]
+                else:
+                    out[agg] = [_clean(sums[k][b] / ct[b]) if ct[b] else None for b in used]
+            series[field] = out
+        return {
+            "points": points,
+            "buckets": len(used),
+            "aggs": list(aggs),
+            "t": [origin + b * res for b in used],
+            "series": series,
+        }
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "path": self.root,
+            "chunk_s": self.chunk_ms // 1000,
+            "appended": self.appended,
+            "queries": self.queries,
+        }
+
+
+def _slice(block: _Block, start_ms: int, end_ms: int) -> tuple[int, int]:
+    if block.min_ts >= start_ms and block.max_ts < end_ms:
+        return 0, block.n
+    return bisect.bisect_left(block.ts, start_ms), bisect.bisect_left(block.ts, end_ms)
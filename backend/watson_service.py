@@ -5,6 +5,9 @@ from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
 from ibm_cloud_sdk_core.api_exception import ApiException
 from dotenv import load_dotenv
 
+from backend.metrics import dependency_call
+from backend.rate_limit import ConcurrencyLimitExceeded, llm_slot
+
 # Carrega variáveis de ambiente procurando em locais comuns:
 # - `./.env` (raiz do repo)
 # - `./FASE5/.env` (compatibilidade com estrutura antiga)
@@ -39,14 +42,21 @@ class WatsonService:
             authenticator=authenticator
         )
         self.assistant.set_service_url(url)
+        # Timeout explícito: sem ele, uma instabilidade do Watson prende a requisição por muito tempo.
+        try:
+            timeout_s = float(os.getenv("WATSON_TIMEOUT_S") or 8.0)
+        except ValueError:
+            timeout_s = 8.0
+        self.assistant.set_http_config({"timeout": timeout_s})
 
     def create_session(self):
         """Cria uma nova sessão com o assistente."""
         try:
-            session = self.assistant.create_session(
-                assistant_id=self.assistant_id,
-                environment_id=self.environment_id,
-            ).get_result()
+            with dependency_call("watson", "create_session"):
+                session = self.assistant.create_session(
+                    assistant_id=self.assistant_id,
+                    environment_id=self.environment_id,
+                ).get_result()
             return session['session_id']
         except Exception as e:
             print(f"Erro ao criar sessão: {e}")
@@ -57,22 +67,26 @@ class WatsonService:
         """Envia mensagem do usuário para o Watson e retorna a resposta."""
         # Se não tiver ID configurado ou der erro de conexão, retorna erro real (SEM LOCAL)
         if not self.assistant_id or not self.environment_id:
-            return {"text": "Erro: Watson não configurado no .env. Configure ASSISTANT_ID (ou WATSON_ASSISTANT_ID + WATSON_ENVIRONMENT_ID)."}
+            return {
+                "text": "Erro: Watson não configurado no .env. Configure ASSISTANT_ID (ou WATSON_ASSISTANT_ID + WATSON_ENVIRONMENT_ID).",
+                "error_type": "service_error",
+            }
 
         try:
-            response = self.assistant.message(
-                assistant_id=self.assistant_id,
-                environment_id=self.environment_id,
-                session_id=session_id,
-                user_id=user_id,
-                input={
-                    'message_type': 'text',
-                    'text': message_text,
-                    'options': {
-                        'return_context': True
+            with llm_slot("watson"), dependency_call("watson", "message"):
+                response = self.assistant.message(
+                    assistant_id=self.assistant_id,
+                    environment_id=self.environment_id,
+                    session_id=session_id,
+                    user_id=user_id,
+                    input={
+                        'message_type': 'text',
+                        'text': message_text,
+                        'options': {
+                            'return_context': True
+                        }
                     }
-                }
-            ).get_result()
+                ).get_result()
 
             if response['output']['generic']:
                 text_response = response['output']['generic'][0]['text']
@@ -105,17 +119,22 @@ class WatsonService:
                 "entities": response['output'].get('entities', [])
             }
 
+        except ConcurrencyLimitExceeded as e:
+            # Fila local cheia: o Watson não foi chamado (não é falha do serviço).
+            print(f"Watson não chamado (teto de concorrência): {e}")
+            return {"text": "Muitas conversas ao mesmo tempo. Tente novamente em instantes.", "error_type": "overloaded"}
+
         except ApiException as e:
             # Sessões do Watson expiram; nesse caso o backend pode recriar a sessão e reenviar 1 vez.
             msg = str(getattr(e, "message", "") or str(e))
             if getattr(e, "code", None) in [404, 400] and "session" in msg.lower():
                 return {"text": "Sessão expirada. Recriando...", "error_type": "invalid_session"}
             print(f"Erro na nuvem Watson (ApiException): {e}")
-            return {"text": f"Erro de comunicação com o Watson: {msg}"}
+            return {"text": f"Erro de comunicação com o Watson: {msg}", "error_type": "service_error"}
 
         except Exception as e:
             print(f"Erro na nuvem Watson: {e}")
-            return {"text": f"Erro de comunicação com o Watson: {str(e)}"}
+            return {"text": f"Erro de comunicação com o Watson: {str(e)}", "error_type": "service_error"}
 
 # Teste rápido se executado diretamente
 if __name__ == "__main__":
@@ -14,6 +14,21 @@ type ClinicalExtractResponse = {
   triage: Record<string, any>
 }
 
+// Eventos tipados das rotas SSE (`/api/message/stream`, `/api/clinical/extract/stream`).
+type StreamEvent =
+  | { event: 'meta'; data: Record<string, any> }
+  | { event: 'triage'; data: { risk: string; diagnosis: Record<string, any> } }
+  | { event: 'vitals'; data: Record<string, any> }
+  | { event: 'token'; data: { text: string } }
+  | { event: 'done'; data: any }
+  | { event: 'error'; data: { error: string } }
+
+type ExtractStreamState = {
+  triage?: Record<string, any>
+  vitals?: Record<string, any>
+  text: string
+}
+
 type MonitorLogsResponse = {
   logs: Array<Record<string, any>>
 }
@@ -58,11 +73,47 @@ async function sendToAssistant(message: string, userId: string) {
   return payload as { response: string }
 }
 
-async function extractClinical(text: string) {
+// Backend sem a rota de streaming (404/405): o unico caso em que vale repetir pela rota JSON.
+class StreamUnavailable extends Error {}
+
+// EventSource nao aceita POST: le o corpo `text/event-stream` via fetch e entrega cada evento ja parseado.
+async function streamSse(url: string, body: unknown, onEvent: (ev: StreamEvent) => void) {
+  const res = await fetch(url, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+    body: JSON.stringify(body),
+  })
+  if (res.status === 404 || res.status === 405) throw new StreamUnavailable(`Streaming indisponivel (${res.status})`)
+  if (!res.ok || !res.body) {
+    const payload = await res.json().catch(() => ({}))
+    throw new Error(payload?.error || `Falha no streaming (${res.status})`)
+  }
+  const reader = res.body.pipeThrough(new TextDecoderStream()).getReader()
+  let buf = ''
+  for (;;) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buf += value
+    let idx: number
+    while ((idx = buf.indexOf('\n\n')) !== -1) {
+      const block = buf.slice(0, idx)
+      buf = buf.slice(idx + 2)
+      let event = ''
+      let data = ''
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7)
+        else if (line.startsWith('data: ')) data += line.slice(6)
+      }
+      if (event && data) onEvent({ event, data: JSON.parse(data) } as StreamEvent)
+    }
+  }
+}
+
+async function extractClinical(text: string, userId: string) {
   const res = await fetch('/api/clinical/extract', {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ text }),
+    body: JSON.stringify({ text, user_id: userId }),
   })
   const payload = await res.json().catch(() => ({}))
   if (!res.ok) throw new Error(payload?.error || 'Falha ao extrair informacoes clinicas')
@@ -134,6 +185,7 @@ export default function App() {
   const [extractText, setExtractText] = useState('')
   const [extractBusy, setExtractBusy] = useState(false)
   const [extractResult, setExtractResult] = useState<ClinicalExtractResponse | null>(null)
+  const [extractStream, setExtractStream] = useState<ExtractStreamState | null>(null)
   const [extractError, setExtractError] = useState<string | null>(null)
 
   const [logsBusy, setLogsBusy] = useState(false)
@@ -196,11 +248,29 @@ export default function App() {
     const typingId = uuid()
     setMsgs((m) => [...m, { id: typingId, role: 'assistant', text: 'Digitando...', ts: Date.now() }])
 
+    const setTyping = (text: string) => setMsgs((m) => m.map((x) => (x.id === typingId ? { ...x, text } : x)))
+
     try {
-      const data = await sendToAssistant(msg, userId)
-      setMsgs((m) =>
-        m.map((x) => (x.id === typingId ? { ...x, text: String(data.response || '').trim() || 'Sem resposta.' } : x)),
-      )
+      let streamed = ''
+      let response: string | null = null
+      try {
+        await streamSse('/api/message/stream', { message: msg, user_id: userId }, (ev) => {
+          if (ev.event === 'token') {
+            streamed += ev.data.text
+            setTyping(streamed)
+          } else if (ev.event === 'done') {
+            response = String(ev.data?.response || '')
+          } else if (ev.event === 'error') {
+            throw new Error(ev.data.error)
+          }
+        })
+      } catch (e) {
+        // So um backend sem a rota de streaming cai para a rota JSON. 429, 500 ou conexao perdida
+        // aparecem como erro: repetir pela outra rota gastaria a cota de novo (ou duplicaria o turno).
+        if (!(e instanceof StreamUnavailable)) throw e
+        response = String((await sendToAssistant(msg, userId)).response || '')
+      }
+      setTyping(String(response ?? streamed).trim() || 'Sem resposta.')
       setMode(await fetchStatus())
     } catch (e: any) {
       setMsgs((m) =>
@@ -372,11 +442,22 @@ export default function App() {
                       setExtractBusy(true)
                       setExtractError(null)
                       setExtractResult(null)
+                      setExtractStream({ text: '' })
                       try {
-                        const r = await extractClinical(extractText)
-                        setExtractResult(r)
+                        let result: ClinicalExtractResponse | null = null
+                        await streamSse('/api/clinical/extract/stream', { text: extractText, user_id: userId }, (ev) => {
+                          if (ev.event === 'triage') setExtractStream((s) => ({ text: '', ...s, triage: ev.data }))
+                          else if (ev.event === 'vitals') setExtractStream((s) => ({ text: '', ...s, vitals: ev.data }))
+                          else if (ev.event === 'token')
+                            setExtractStream((s) => ({ ...s, text: (s?.text || '') + ev.data.text }))
+                          else if (ev.event === 'done') result = ev.data as ClinicalExtractResponse
+                          else if (ev.event === 'error') throw new Error(ev.data.error)
+                        })
+                        setExtractResult(result ?? (await extractClinical(extractText, userId)))
+                        setExtractStream(null)
                       } catch (e: any) {
                         setExtractError(e?.message || 'Falha na extração')
+                        setExtractStream(null)
                       } finally {
                         setExtractBusy(false)
                       }
@@ -391,6 +472,7 @@ export default function App() {
                       setExtractText('')
                       setExtractError(null)
                       setExtractResult(null)
+                      setExtractStream(null)
                     }}
                   >
                     Limpar
@@ -415,6 +497,23 @@ export default function App() {
                       </div>
                     </div>
                   </>
+                ) : extractStream ? (
+                  <div className="subgrid">
+                    <div className="mini">
+                      <div className="miniLabel">Triagem (local)</div>
+                      <pre className="mono">{extractStream.triage ? JSON.stringify(extractStream.triage, null, 2) : '...'}</pre>
+                    </div>
+                    <div className="mini">
+                      <div className="miniLabel">Sinais vitais (regex)</div>
+                      <pre className="mono">{extractStream.vitals ? JSON.stringify(extractStream.vitals, null, 2) : '...'}</pre>
+                    </div>
+                    {extractStream.text ? (
+                      <div className="mini">
+                        <div className="miniLabel">Gemini (parcial)</div>
+                        <pre className="mono">{extractStream.text}</pre>
+                      </div>
+                    ) : null}
+                  </div>
                 ) : (
                   <p className="muted">Nenhum resultado ainda. Clique em "Extrair".</p>
                 )}
@@ -0,0 +1,65 @@
+# Configuracao do gunicorn (producao). Uso:
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Tudo pode ser ajustado por variavel de ambiente (ver `.env.example`).
+
+import multiprocessing
+import os
+
+
+def _int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+bind = os.getenv("CARDIOIA_BIND", "0.0.0.0:5000")
+
+# Pre-fork: 1 worker por core por padrao; cada worker atende `threads` requisicoes
+# simultaneas (as rotas passam a maior parte do tempo esperando Watson/Gemini).
+workers = _int("CARDIOIA_WORKERS", multiprocessing.cpu_count())
+threads = _int("CARDIOIA_THREADS", 4)
+# O teto de chamadas simultaneas a LLM (CARDIOIA_LLM_MAX_CONCURRENCY) e' da maquina: cada worker
+# fica com a sua parte (`backend/rate_limit.py:build_llm_limiter`). O app e' importado depois deste arquivo.
+if not os.getenv("CARDIOIA_LLM_WORKERS"):
+    os.environ["CARDIOIA_LLM_WORKERS"] = str(workers)
+worker_class = "gthread"
+
+# Carrega o app no master antes do fork (estado compartilhado copy-on-write, ver `wsgi.py`).
+preload_app = True
+
+# Reciclagem graciosa: cada worker sai depois de N requisicoes (+ jitter para nao reciclar
+# todos ao mesmo tempo) e tem `graceful_timeout` segundos para terminar o que esta em andamento.
+max_requests = _int("CARDIOIA_MAX_REQUESTS", 2000)
+max_requests_jitter = _int("CARDIOIA_MAX_REQUESTS_JITTER", 200)
+graceful_timeout = _int("CARDIOIA_GRACEFUL_TIMEOUT", 30)
+timeout = _int("CARDIOIA_WORKER_TIMEOUT", 60)
+keepalive = 5
+
+accesslog = os.getenv("CARDIOIA_ACCESS_LOG", "-")
+errorlog = "-"
+
+
+def on_starting(server):
+    # Variantes .gz/.br do frontend (idempotente: so gera o que estiver faltando/desatualizado).
+    if os.getenv("CARDIOIA_PRECOMPRESS_STATIC", "1").strip().lower() in ("0", "false", "no"):
+        return
+    try:
+        from pathlib import Path
+
+        from scripts.precompress_static import precompress
+
+        report = precompress(Path(__file__).resolve().parent / "backend" / "static")
+        server.log.info("Static pre-comprimido: %s arquivo(s) gerado(s).", report["files"])
+    except Exception as e:
+        server.log.warning("Falha ao pre-comprimir o static: %s", e)
+
+
+def post_fork(server, worker):
+    server.log.info("Worker %s pronto (estado pre-carregado herdado do master).", worker.pid)
+    # Ponte MQTT e afins sobem em cada worker ja no fork, sem esperar a primeira requisicao HTTP.
+    from backend.app import start_background_services
+    from wsgi import app
+
+    start_background_services(app)
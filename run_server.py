@@ -1,12 +1,28 @@
 from __future__ import annotations
 
+import os
+import sys
+
 from backend.app import create_app
 
 
 def main() -> None:
-    app = create_app()
+    # Producao (multi-worker, pre-fork): `python run_server.py --prod`
+    # (equivale a `gunicorn -c gunicorn.conf.py wsgi:app`; requer Linux/macOS).
+    if "--prod" in sys.argv[1:]:
+        from gunicorn.app.wsgiapp import run
+
+        repo_root = os.path.dirname(os.path.abspath(__file__))
+        sys.argv = [sys.argv[0], "--chdir", repo_root, "-c", os.path.join(repo_root, "gunicorn.conf.py"), "wsgi:app"]
+        run()
+        return
+
+    # Servidor de desenvolvimento (1 processo). Reloader/debug podem ser desligados com CARDIOIA_DEBUG=0.
+    debug = os.getenv("CARDIOIA_DEBUG", "1").strip().lower() not in ["0", "false", "no", "off"]
+    # Com o reloader, so' o processo filho (WERKZEUG_RUN_MAIN) atende; o pai apenas vigia os arquivos.
+    app = create_app(start_background=not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true")
     print("Iniciando servidor Flask na porta 5000...")
-    app.run(debug=True, port=5000)
+    app.run(debug=debug, port=5000)
 
 
 if __name__ == "__main__":
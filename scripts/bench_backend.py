@@ -0,0 +1,403 @@
+"""
+Microbenchmarks do backend com dados sinteticos em escala (1x, 10x, 100x, 1000x), comparados com um baseline.
+
+Operacoes e a dimensao que cresce em cada uma:
+- `mock.best_intent` / `mock.best_intent_tfidf` / `mock.send_message`: tamanho do skill (intents/exemplos do `watson_skill_export.json`)
+- `phase2.triage`: tamanho do knowledge map da Fase 2
+- `vitals.extract_simple`: tamanho da nota clinica
+- `phase3.risk_check_local`: (constante; so o lote cresce)
+- `vitals.query_auto`: leituras no intervalo consultado (resposta sempre em <= 1000 buckets)
+- `automation.read_logs`: tamanho do `logs.json`
+- `automation.run_rpa_cycle`: linhas da tabela `monitoring` (+ `logs.json` proporcional)
+- `mock.session_memory` (memoria, nao tempo): turnos por sessao; bytes por sessao (tracemalloc) e
+  tamanho serializado, que devem ficar estaveis com o historico limitado
+
+O relatorio traz o custo por operacao (mediana entre rodadas), o fator de crescimento entre a
+menor e a maior escala e esse fator relativo ao crescimento linear (`vs_linear`, que independe
+da maquina e mostra "penhascos" de escala), alem da razao contra o baseline salvo. Uso:
+  python scripts/bench_backend.py
+  python scripts/bench_backend.py --scales 1,10,100 --only phase2.triage,mock.best_intent
+  python scripts/bench_backend.py --save-baseline          # grava scripts/bench_backend_baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+_WORDS = (
+    "dor peito braco esquerdo falta ar cansaco tontura palpitacao pressao alta suor frio nausea "
+    "consulta agendar medico exame febre tosse inchaco pernas noite esforco repouso ansiedade"
+).split()
+
+_CONVERSATIONS = [
+    ["Olá", "estou com dor no peito", "sim, vai pro braço esquerdo", "tenho falta de ar"],
+    ["Bom dia", "quero agendar uma consulta", "segunda que vem", "prefiro de manhã"],
+    ["to mal", "sim ou nao o que????", "minha pressão deu 150/95", "deixa pra lá"],
+    ["dor no braço", "no direito", "não", "obrigado"],
+]
+
+_MESSAGES = [m for conv in _CONVERSATIONS for m in conv] + [
+    "tenho sentido palpitações à noite",
+    "quero marcar com um cardiologista",
+    "o que é pressão alta?",
+    "meu dente ta doendo",
+]
+
+
+# --- geradores sinteticos ---
+
+
+def scaled_skill(skill: dict[str, Any], scale: int, rng: random.Random) -> dict[str, Any]:
+    """Replica cada intent `scale` vezes com exemplos variados (tokens novos por copia)."""
+    out = dict(skill)
+    intents = list(skill.get("intents", []))
+    for k in range(1, scale):
+        for it in skill.get("intents", []):
+            examples = []
+            for e in it.get("examples", []):
+                extra = " ".join(rng.choice(_WORDS) for _ in range(2))
+                examples.append({"text": f"{e.get('text', '')} {extra} v{k}"})
+            intents.append({**it, "intent": f"{it['intent']}_v{k}", "examples": examples})
+    out["intents"] = intents
+    return out
+
+
+def scaled_knowledge_map(rules: list[tuple[str, str, str]], scale: int, rng: random.Random) -> list[tuple[str, str, str]]:
+    out = list(rules)
+    for k in range(1, scale):
+        for s1, s2, disease in rules:
+            out.append((f"{s1} {rng.choice(_WORDS)}{k}", s2, f"{disease} {k}"))
+    return out
+
+
+def clinical_note(scale: int, rng: random.Random) -> str:
+    filler = " ".join(rng.choice(_WORDS) for _ in range(40 * scale))
+    return f"Paciente refere {filler}. Pressao 150/95, FC 88 bpm, temperatura 37,8 C."
+
+
+def log_entries(n: int, rng: random.Random) -> list[dict[str, Any]]:
+    return [
+        {
+            "timestamp": f"2026-01-{1 + i % 28:02d}T{i % 24:02d}:00:00",
+            "patient": f"Paciente {i % 500}",
+            "status": "CRITICAL",
+            "vitals": {"bp": f"{rng.randint(140, 190)}/{rng.randint(90, 120)}", "hr": rng.randint(60, 140)},
+            "ai_analysis": "Alerta automatico: vitais alterados.",
+            "action": "Notificar Equipe Medica",
+        }
+        for i in range(n)
+    ]
+
+
+def monitoring_db(path: Path, rows: int, rng: random.Random) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE patients (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, age INTEGER)")
+    conn.execute(
+        "CREATE TABLE monitoring (id INTEGER PRIMARY KEY AUTOINCREMENT, patient_id INTEGER, systolic INTEGER, "
+        "diastolic INTEGER, heart_rate INTEGER, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, "
+        "FOREIGN KEY(patient_id) REFERENCES patients(id))"
+    )
+    patients = max(2, rows // 10)
+    conn.executemany("INSERT INTO patients (name, age) VALUES (?, ?)", [(f"Paciente {i}", 40 + i % 50) for i in range(patients)])
+    conn.executemany(
+        "INSERT INTO monitoring (patient_id, systolic, diastolic, heart_rate, timestamp) VALUES (?, ?, ?, ?, ?)",
+        [
+            (
+                1 + rng.randrange(patients),
+                rng.randint(100, 180),
+                rng.randint(60, 110),
+                rng.randint(55, 130),
+                f"2026-01-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00",
+            )
+            for i in range(rows)
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+# --- medicao ---
+
+
+def measure(fn: Callable[[], Any], ops: int, min_time: float, min_rounds: int = 3) -> dict[str, float]:
+    """Roda `fn` (que executa `ops` operacoes) ate `min_time` segundos; mediana por operacao em us."""
+    samples: list[float] = []
+    spent = 0.0
+    while len(samples) < min_rounds or spent < min_time:
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        samples.append(dt / ops)
+        spent += dt
+        if len(samples) >= 1000:
+            break
+    return {
+        "per_op_us": round(statistics.median(samples) * 1e6, 3),
+        "min_us": round(min(samples) * 1e6, 3),
+        "rounds": len(samples),
+    }
+
+
+class Suite:
+    def __init__(self, tmp: Path, seed: int) -> None:
+        from backend.automation_adapter import AutomationAdapter
+        from backend.mock_assistant import MockAssistantService
+        from backend.phase2_triage import Phase2TriageService
+
+        self.tmp = tmp
+        self.seed = seed
+        self.mock = MockAssistantService()
+        self.base_skill = self.mock._load_skill()
+        self.triage = Phase2TriageService()
+        self.base_rules = list(self.triage._rules or [])
+        self.adapter = AutomationAdapter()
+
+    def rng(self, scale: int) -> random.Random:
+        return random.Random(self.seed * 1000 + scale)
+
+    def _use_skill(self, scale: int) -> None:
+        from backend.mock_assistant import _build_dialog
+
+        skill = scaled_skill(self.base_skill, scale, self.rng(scale))
+        self.mock._dialog = _build_dialog(self.mock._index_skill(skill))
+
+    def best_intent(self, scale: int):
+        self._use_skill(scale)
+        msgs = _MESSAGES
+        return lambda: [self.mock._best_intent(m) for m in msgs], len(msgs)
+
+    def best_intent_tfidf(self, scale: int):
+        import dataclasses
+
+        from backend.intent_engine import TfidfIntentEngine
+
+        self._use_skill(scale)
+        dialog = self.mock._dialog
+        self.mock._dialog = dataclasses.replace(dialog, intent_engine=TfidfIntentEngine(dialog.idx.intents))
+        msgs = _MESSAGES
+        return lambda: [self.mock._best_intent(m) for m in msgs], len(msgs)
+
+    def send_message(self, scale: int):
+        self._use_skill(scale)
+        turns = sum(len(c) for c in _CONVERSATIONS)
+
+        def run() -> None:
+            for conv in _CONVERSATIONS:
+                sid = self.mock.create_session()
+                for msg in conv:
+                    self.mock.send_message(sid, msg)
+            self.mock._sessions.clear()
+
+        return run, turns
+
+    def phase2_triage(self, scale: int):
+        self.triage._rules = scaled_knowledge_map(self.base_rules, scale, self.rng(scale))
+        texts = [" ".join(conv) for conv in _CONVERSATIONS] + _MESSAGES
+        return lambda: [self.triage.triage(t) for t in texts], len(texts)
+
+    def extract_vitals(self, scale: int):
+        from backend.clinical_extraction import _extract_vitals_simple
+
+        rng = self.rng(scale)
+        notes = [clinical_note(scale, rng) for _ in range(8)]
+        return lambda: [_extract_vitals_simple(n) for n in notes], len(notes)
+
+    def risk_check(self, scale: int):
+        from backend.phase3_vitals import risk_check_local
+
+        rng = self.rng(scale)
+        pairs = [(round(rng.uniform(35.5, 40.0), 1), rng.randint(50, 150)) for _ in range(100 * scale)]
+        return lambda: [risk_check_local(t, b) for t, b in pairs], len(pairs)
+
+    def vitals_query(self, scale: int):
+        from backend.vitals_store import VitalsStore
+
+        rng = self.rng(scale)
+        store = VitalsStore(str(self.tmp / f"vitals_{scale}"), chunk_s=86400)
+        t0 = 1_699_920_000_000
+        n = 1000 * scale
+        readings = [{"ts": (t0 + i * 5000) / 1000, "bpm": rng.randint(55, 140), "temp": rng.uniform(36, 39.5)} for i in range(n)]
+        for i in range(0, n, 500):
+            store.append("bench", readings[i : i + 500])
+        end = t0 + n * 5000
+        return lambda: store.query("bench", t0, end), 1
+
+    def read_logs(self, scale: int):
+        path = self.tmp / f"logs_{scale}.json"
+        path.write_text(json.dumps(log_entries(100 * scale, self.rng(scale)), ensure_ascii=False, indent=4), encoding="utf-8")
+        self.adapter.log_path = path
+        return lambda: self.adapter.read_logs(), 1
+
+    def run_rpa_cycle(self, scale: int):
+        rpa = self.adapter._rpa
+        db = self.tmp / f"patients_{scale}.db"
+        logs = self.tmp / f"rpa_logs_{scale}.json"
+        rng = self.rng(scale)
+        monitoring_db(db, 100 * scale, rng)
+        seed_logs = json.dumps(log_entries(10 * scale, rng), ensure_ascii=False, indent=4)
+        rpa.DB_PATH, rpa.LOG_PATH = str(db), str(logs)
+
+        def run() -> None:
+            # Cada rodada parte do mesmo logs.json (o ciclo acrescenta alertas).
+            logs.write_text(seed_logs, encoding="utf-8")
+            with contextlib.redirect_stdout(io.StringIO()):
+                rpa.run_rpa_cycle()
+
+        return run, 1
+
+
+    def session_memory(self, scale: int) -> dict[str, Any]:
+        """Memoria por sessao LOCAL depois de `4 * scale` turnos (conversas repetidas)."""
+        self._use_skill(1)
+        sessions = 20
+        messages = [m for conv in _CONVERSATIONS for m in conv]
+        turns = 4 * scale
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.mock.send_message(self.mock.create_session(), messages[0])  # aquece caches fora da medicao
+            self.mock._sessions.clear()
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            sids = [self.mock.create_session() for _ in range(sessions)]
+            for sid in sids:
+                for i in range(turns):
+                    self.mock.send_message(sid, messages[i % len(messages)])
+            after = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+        contexts = [self.mock._sessions[sid] for sid in sids]
+        self.mock._sessions.clear()
+        return {
+            "scale": scale,
+            "turns_per_session": turns,
+            "bytes_per_session": round((after - before) / sessions),
+            "serialized_bytes": max(len(ctx.to_bytes()) for ctx in contexts),
+        }
+
+
+BENCHMARKS: dict[str, str] = {
+    "mock.best_intent": "best_intent",
+    "mock.best_intent_tfidf": "best_intent_tfidf",
+    "mock.send_message": "send_message",
+    "phase2.triage": "phase2_triage",
+    "vitals.extract_simple": "extract_vitals",
+    "phase3.risk_check_local": "risk_check",
+    "vitals.query_auto": "vitals_query",
+    "automation.read_logs": "read_logs",
+    "automation.run_rpa_cycle": "run_rpa_cycle",
+}
+# Medem memoria (relatorio em `memory`, fora da comparacao com o baseline de tempo).
+MEMORY_BENCHMARKS: dict[str, str] = {
+    "mock.session_memory": "session_memory",
+}
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> dict[str, Any]:
+    base = baseline.get("results", {})
+    out = {}
+    for key, cur in results.items():
+        ref = base.get(key)
+        if not ref:
+            out[key] = {"status": "novo"}
+            continue
+        # Compara pelo minimo entre rodadas: bem menos sensivel a ruido da maquina que a mediana.
+        ratio = cur["min_us"] / ref["min_us"] if ref["min_us"] else 1.0
+        out[key] = {
+            "baseline_min_us": ref["min_us"],
+            "ratio": round(ratio, 3),
+            "status": "regressao" if ratio > tolerance else ("melhora" if ratio < 1 / tolerance else "ok"),
+        }
+    return out
+
+
+def main() -> int:
+    repo_root = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(repo_root))
+    # Benchmarks sao offline: nunca chamam Gemini do `rpa_monitor`.
+    os.environ["GEMINI_API_KEY"] = ""
+
+    default_baseline = repo_root / "scripts" / "bench_backend_baseline.json"
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", default="1,10,100,1000")
+    parser.add_argument("--only", default="", help="Lista de benchmarks (separados por virgula).")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Segundos minimos por medicao.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", default=str(default_baseline))
+    parser.add_argument("--save-baseline", action="store_true", help="Grava o resultado como novo baseline.")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Razao acima da qual conta como regressao.")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--out", default="")
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    available = {**BENCHMARKS, **MEMORY_BENCHMARKS}
+    names = [n.strip() for n in args.only.split(",") if n.strip()] or list(available)
+    unknown = [n for n in names if n not in available]
+    if unknown:
+        print(json.dumps({"error": f"Benchmarks desconhecidos: {unknown}", "disponiveis": list(available)}))
+        return 2
+
+    results: dict[str, Any] = {}
+    scaling: dict[str, Any] = {}
+    memory: dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(prefix="cardioia_bench_") as tmp:
+        suite = Suite(Path(tmp), args.seed)
+        for name in names:
+            if name in MEMORY_BENCHMARKS:
+                setup = getattr(suite, MEMORY_BENCHMARKS[name])
+                for scale in scales:
+                    memory[f"{name}@{scale}x"] = setup(scale)
+                continue
+            setup = getattr(suite, BENCHMARKS[name])
+            for scale in scales:
+                fn, ops = setup(scale)
+                fn()  # aquecimento (memos, caches de regex, pagina do SQLite)
+                results[f"{name}@{scale}x"] = {"scale": scale, "ops": ops, **measure(fn, ops, args.min_time)}
+            lo, hi = results[f"{name}@{scales[0]}x"], results[f"{name}@{scales[-1]}x"]
+            if len(scales) > 1:
+                growth = hi["per_op_us"] / lo["per_op_us"] if lo["per_op_us"] else 0.0
+                scaling[name] = {
+                    "scales": f"{scales[0]}x->{scales[-1]}x",
+                    "growth": round(growth, 2),
+                    # 1.0 = linear no tamanho dos dados; bem acima disso e' um penhasco de escala.
+                    "vs_linear": round(growth / (scales[-1] / scales[0]), 3),
+                }
+
+    report: dict[str, Any] = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+        "scaling": scaling,
+    }
+    if memory:
+        report["memory"] = memory
+    baseline_path = Path(args.baseline)
+    regressions = 0
+    if baseline_path.exists() and not args.save_baseline:
+        report["comparison"] = compare(results, json.loads(baseline_path.read_text(encoding="utf-8")), args.tolerance)
+        regressions = sum(1 for c in report["comparison"].values() if c["status"] == "regressao")
+        report["regressions"] = regressions
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        baseline_path.write_text(text + "\n", encoding="utf-8")
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    print(text)
+    return 1 if (regressions and args.fail_on_regression) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
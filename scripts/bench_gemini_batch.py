@@ -0,0 +1,74 @@
+"""
+Benchmark da extracao em lote (prompt packing) com o modelo falso (offline).
+
+Compara `batch_size=1` (uma chamada e um prompt completo por nota) com lotes maiores,
+medindo chamadas ao LLM, caracteres de prompt por nota e tempo por nota.
+
+Uso:
+  python scripts/bench_gemini_batch.py --notes 200 --latency 0.05 --batch-sizes 1,4,8,16
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+
+def _notes(n: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    queixas = ["dor no peito", "falta de ar", "tontura", "palpitacoes", "cansaco"]
+    return [
+        f"Paciente {i} relata {rng.choice(queixas)} ha {rng.randint(1, 48)} horas. "
+        f"PA {rng.randint(100, 180)}/{rng.randint(60, 110)}, FC {rng.randint(50, 140)} bpm."
+        for i in range(n)
+    ]
+
+
+def main() -> int:
+    repo_root = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(repo_root))
+    # Sem cache: mede o custo real de cada configuracao.
+    os.environ["CARDIOIA_EXTRACTION_CACHE"] = "0"
+
+    from backend.clinical_extraction import GeminiClinicalExtractor
+    from backend.fake_gemini import FakeGeminiModel
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--notes", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="latencia simulada por chamada (s)")
+    parser.add_argument("--batch-sizes", default="1,4,8,16")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    notes = _notes(args.notes, args.seed)
+    note_chars = sum(len(n) for n in notes)
+    rows = []
+    for k in [int(x) for x in args.batch_sizes.split(",") if x.strip()]:
+        model = FakeGeminiModel(latency_s=args.latency)
+        ext = GeminiClinicalExtractor(model=model)
+        t0 = time.perf_counter()
+        out = ext.extract_many(notes, batch_size=k, max_workers=args.workers)
+        elapsed = time.perf_counter() - t0
+        rows.append(
+            {
+                "batch_size": k,
+                "llm_calls": model.calls,
+                "prompt_chars_per_note": round(model.prompt_chars / len(notes), 1),
+                "instruction_chars_per_note": round((model.prompt_chars - note_chars) / len(notes), 1),
+                "ms_per_note": round(elapsed * 1000 / len(notes), 3),
+                "extracted": sum(1 for o in out if o is not None),
+            }
+        )
+
+    print(json.dumps({"notes": len(notes), "latency_s": args.latency, "workers": args.workers, "runs": rows}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
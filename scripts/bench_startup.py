@@ -0,0 +1,83 @@
+"""
+Benchmark de import e startup do backend (boot de worker).
+
+Cada rodada roda num processo Python novo (cache de import frio) e mede:
+- `import backend.app`
+- `create_app()` (servicos lazy: nada pesado deve acontecer aqui)
+- primeira chamada de cada rota (constroi o servico sob demanda)
+- `warm()` de todos os servicos (custo equivalente ao startup "eager" antigo)
+
+Uso:
+  python scripts/bench_startup.py --runs 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+
+_CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from backend.app import create_app
+t_import = time.perf_counter() - t0
+
+t0 = time.perf_counter()
+app = create_app()
+t_create = time.perf_counter() - t0
+client = app.test_client()
+
+def first(method, path, **kw):
+    t = time.perf_counter()
+    getattr(client, method)(path, **kw)
+    return time.perf_counter() - t
+
+out = {
+    "import_ms": t_import,
+    "create_app_ms": t_create,
+    "first_status_ms": first("get", "/api/status"),
+    "first_triage_ms": first("post", "/api/phase2/triage", json={"text": "dor no peito e falta de ar"}),
+    "first_extract_ms": first("post", "/api/clinical/extract", json={"text": "PA 150/95 FC 88 bpm"}),
+    "first_monitor_logs_ms": first("get", "/api/monitor/logs"),
+}
+t0 = time.perf_counter()
+create_app().config["services"].warm()
+out["eager_warm_all_ms"] = time.perf_counter() - t0
+print(json.dumps({k: v * 1000 for k, v in out.items()}))
+"""
+
+
+def main() -> int:
+    repo_root = Path(__file__).resolve().parents[1]
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--mode", default="local", help="CARDIOIA_ASSISTANT_MODE para o processo filho")
+    args = parser.parse_args()
+
+    env = {**os.environ, "CARDIOIA_ASSISTANT_MODE": args.mode}
+    samples: list[dict[str, float]] = []
+    for _ in range(max(1, args.runs)):
+        proc = subprocess.run(
+            [sys.executable, "-c", _CHILD], cwd=str(repo_root), env=env, capture_output=True, text=True, check=True
+        )
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    report = {
+        "runs": len(samples),
+        "mode": args.mode,
+        "median_ms": {k: round(statistics.median(s[k] for s in samples), 2) for k in samples[0]},
+        "max_ms": {k: round(max(s[k] for s in samples), 2) for k in samples[0]},
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
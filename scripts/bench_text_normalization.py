@@ -0,0 +1,89 @@
+"""
+Benchmark da normalizacao de texto compartilhada (`backend/text_normalization.py`).
+
+Compara, sobre um corpus sintetico com acentos:
+- a implementacao antiga (NFKD caractere a caractere + regex) com `fold_many` (tabelas de `translate`);
+- `diagnose.normalize` da Fase 2 com `phase2_many`;
+e confere que todas as saidas sao identicas.
+
+Uso:
+  python scripts/bench_text_normalization.py --docs 50000 --seed 7
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+
+def _legacy_fold(s: str) -> str:
+    # Copia fiel do antigo `mock_assistant._strip_accents_lower` (referencia).
+    s = (s or "").strip().lower()
+    s = "".join(ch for ch in unicodedata.normalize("NFKD", s) if not unicodedata.combining(ch))
+    return re.sub(r"\s+", " ", s)
+
+
+def _legacy_phase2(text: str) -> str:
+    # Copia fiel de `diagnose.normalize` (Fase 2).
+    return re.sub(r"[^a-zà-ú0-9\s]", " ", text.lower())
+
+
+_WORDS = (
+    "Paciente relata dor no peito há duas horas, com falta de ar e náusea. Pressão 150/95, "
+    "FC 88 bpm. Está tonto, sente palpitações e suor frio; nega febre. Histórico: hipertensão, "
+    "diabetes, uso de losartana. Irradiação para o braço esquerdo e mandíbula. Cansaço aos esforços."
+).split()
+
+
+def _corpus(n: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 40))) for _ in range(n)]
+
+
+def _time(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def main() -> int:
+    repo_root = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(repo_root))
+    from backend.text_normalization import fold_many, phase2_many
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    corpus = _corpus(args.docs, args.seed)
+    legacy, legacy_s = _time(lambda: [_legacy_fold(t) for t in corpus])
+    bulk, bulk_s = _time(fold_many, corpus)
+    legacy_p2, legacy_p2_s = _time(lambda: [_legacy_phase2(t) for t in corpus])
+    bulk_p2, bulk_p2_s = _time(phase2_many, corpus)
+
+    mismatches = sum(a != b for a, b in zip(legacy, bulk))
+    mismatches += sum(a != b for a, b in zip(legacy_p2, bulk_p2))
+    report = {
+        "docs": len(corpus),
+        "chars": sum(len(t) for t in corpus),
+        "fold_legacy_seconds": round(legacy_s, 4),
+        "fold_many_seconds": round(bulk_s, 4),
+        "fold_speedup": round(legacy_s / bulk_s, 2),
+        "phase2_legacy_seconds": round(legacy_p2_s, 4),
+        "phase2_many_seconds": round(bulk_p2_s, 4),
+        "phase2_speedup": round(legacy_p2_s / bulk_p2_s, 2),
+        "mismatches": mismatches,
+    }
+    print(json.dumps(report, indent=2))
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,122 @@
+"""
+Benchmark do extrator de sinais vitais sobre um corpus sintetico de anamneses.
+
+Compara a implementacao antiga (ate 4 `re.search` por texto) com o `VitalsExtractor`
+(uma varredura combinada + `extract_many`) e confere que os resultados antigos se mantem.
+
+Uso:
+  python scripts/bench_vitals_extractor.py --docs 50000 --seed 7
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+
+def _legacy_extract(text: str) -> dict[str, Any]:
+    # Copia fiel da versao anterior de `_extract_vitals_simple` (referencia para o benchmark).
+    t = text or ""
+    vitals: dict[str, Any] = {}
+    m = re.search(r"\b(\d{2,3})\s*/\s*(\d{2,3})\b", t)
+    if m:
+        vitals["pressao_arterial"] = f"{m.group(1)}/{m.group(2)}"
+    m = re.search(r"\b(?:fc|frequencia cardiaca|bpm)\s*[:=]?\s*(\d{2,3})\b", t, re.I)
+    if m:
+        vitals["frequencia_cardiaca_bpm"] = int(m.group(1))
+    else:
+        m = re.search(r"\b(\d{2,3})\s*bpm\b", t, re.I)
+        if m:
+            vitals["frequencia_cardiaca_bpm"] = int(m.group(1))
+    m = re.search(r"\b(?:temp|temperatura)\s*[:=]?\s*(\d{2})(?:[\\.,](\d))?\s*(?:c|°c)?\b", t, re.I)
+    if m:
+        vitals["temperatura_c"] = float(f"{m.group(1)}.{m.group(2) or '0'}")
+    return vitals
+
+
+_FILLER = [
+    "Paciente refere dor no peito ha 2 horas.",
+    "Nega febre ou calafrios.",
+    "Relata falta de ar aos esforcos e cansaco.",
+    "Historico de hipertensao e diabetes tipo 2.",
+    "Em uso de losartana 50mg e metformina.",
+    "Alergia a dipirona.",
+    "Sem queixas urinarias.",
+    "Acompanhante informa episodio de tontura pela manha.",
+]
+
+
+def _vitals_phrase(rng: random.Random) -> str:
+    s, d = rng.randint(90, 190), rng.randint(55, 120)
+    hr = rng.randint(45, 160)
+    temp = f"{rng.randint(35, 40)},{rng.randint(0, 9)}"
+    return rng.choice(
+        [
+            f"PA {s}/{d}, FC {hr} bpm, temp {temp} C.",
+            f"Medi pressao {s}/{d} e {hr}bpm.",
+            f"pressao {s} x {d} mmHg, pulso de {hr}, febre de {temp} °C.",
+            f"frequencia cardiaca: {hr}; temperatura={temp}.",
+            f"Sinais: {s} por {d}, {hr} batimentos, {temp}°C.",
+            "Sem medicoes recentes.",
+        ]
+    )
+
+
+def synthetic_corpus(n: int, seed: int = 7) -> Iterator[str]:
+    rng = random.Random(seed)
+    for _ in range(n):
+        parts = rng.sample(_FILLER, k=rng.randint(2, 5))
+        parts.insert(rng.randint(0, len(parts)), _vitals_phrase(rng))
+        yield " ".join(parts)
+
+
+def main() -> int:
+    repo_root = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(repo_root))
+    from backend.vitals_extractor import VitalsExtractor
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    corpus = list(synthetic_corpus(args.docs, args.seed))
+    extractor = VitalsExtractor()
+
+    t0 = time.perf_counter()
+    legacy = [_legacy_extract(t) for t in corpus]
+    legacy_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    combined = list(extractor.extract_many(corpus))
+    combined_s = time.perf_counter() - t0
+
+    # Tudo que a versao antiga encontrava deve continuar igual.
+    mismatches = sum(1 for old, new in zip(legacy, combined) if any(new.get(k) != v for k, v in old.items()))
+    coverage_old = sum(len(v) for v in legacy)
+    coverage_new = sum(len(v) for v in combined)
+
+    report = {
+        "docs": len(corpus),
+        "chars": sum(len(t) for t in corpus),
+        "legacy_seconds": round(legacy_s, 4),
+        "combined_seconds": round(combined_s, 4),
+        "legacy_docs_per_s": round(len(corpus) / legacy_s),
+        "combined_docs_per_s": round(len(corpus) / combined_s),
+        "speedup": round(legacy_s / combined_s, 2),
+        "fields_found_legacy": coverage_old,
+        "fields_found_combined": coverage_new,
+        "legacy_mismatches": mismatches,
+    }
+    print(json.dumps(report, indent=2))
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,77 @@
+"""
+Compila `watson_skill_export.json` no artefato binario usado pelo assistente local (`backend/skill_artifact.py`).
+
+O artefato guarda o indice ja pronto (exemplos tokenizados com dicionario de tokens, textos do
+dialogo extraidos) e o sha256/tamanho/mtime do export. Se o export mudar, o backend ignora o
+artefato, indexa o JSON e regrava o artefato sozinho; este script serve para gerar no build/deploy
+(e `--check` para falhar no CI quando o artefato estiver desatualizado).
+
+Uso:
+  python scripts/build_skill_artifact.py
+  python scripts/build_skill_artifact.py --out /srv/cardioia/watson_skill.bin
+  python scripts/build_skill_artifact.py --check
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+
+def _best_of(fn, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> int:
+    repo_root = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(repo_root))
+    from backend.mock_assistant import MockAssistantService, _SkillIndex
+    from backend.skill_artifact import artifact_status, default_artifact_path, read_artifact, write_artifact
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", default="", help="Destino (padrao: CARDIOIA_SKILL_ARTIFACT ou backend/data/watson_skill.bin).")
+    parser.add_argument("--check", action="store_true", help="So verifica se o artefato esta atualizado.")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    source = MockAssistantService._skill_path()
+    target = args.out or default_artifact_path()
+    if args.check:
+        status = artifact_status(target, source)
+        print(json.dumps({"artifact": target, "status": status}))
+        return 0 if status == "fresh" else 1
+
+    t0 = time.perf_counter()
+    idx = MockAssistantService._index_skill(MockAssistantService._load_skill())
+    size = write_artifact(target, source, idx.to_payload())
+    build_s = time.perf_counter() - t0
+
+    loaded = _SkillIndex.from_payload(read_artifact(target, source) or {})
+    json_s = _best_of(lambda: MockAssistantService._index_skill(MockAssistantService._load_skill()), args.runs)
+    artifact_s = _best_of(lambda: _SkillIndex.from_payload(read_artifact(target, source) or {}), args.runs)
+    report = {
+        "source": source,
+        "artifact": target,
+        "bytes": size,
+        "intents": len(idx.intents),
+        "examples": len(idx.example_tokens),
+        "templates": len(idx.templates),
+        "roundtrip_ok": loaded == idx,
+        "build_ms": round(build_s * 1000, 3),
+        "load_json_ms": round(json_s * 1000, 3),
+        "load_artifact_ms": round(artifact_s * 1000, 3),
+    }
+    print(json.dumps(report, indent=2))
+    return 0 if report["roundtrip_ok"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,127 @@
+"""
+Classifica em lote mensagens registradas com o motor TF-IDF de intencoes (`backend/intent_engine.py`).
+
+Serve para rodadas offline sobre conversas logadas: top-k por mensagem, concordancia com o Jaccard
+atual (o motor padrao do assistente local) e vazao. Entrada em texto (uma mensagem por linha), JSON
+(lista de strings ou de objetos com `message`) ou JSONL; sem `--input` usa as mensagens dos roteiros
+de `scripts/load_scenarios/` e as frases de sintomas da Fase 2.
+
+Uso:
+  python scripts/classify_intents.py
+  python scripts/classify_intents.py --input conversas.jsonl --top-k 5 --out classificacao.json
+  python scripts/classify_intents.py --summary
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+
+def _messages_from(obj: Any) -> list[str]:
+    if isinstance(obj, str):
+        return [obj]
+    if isinstance(obj, dict):
+        msg = obj.get("message") or obj.get("text") or (obj.get("json") or {}).get("message")
+        return [msg] if isinstance(msg, str) else []
+    if isinstance(obj, list):
+        return [m for item in obj for m in _messages_from(item)]
+    return []
+
+
+def load_messages(path: Path) -> list[str]:
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".jsonl":
+        return [m for line in text.splitlines() if line.strip() for m in _messages_from(json.loads(line))]
+    if path.suffix == ".json":
+        return _messages_from(json.loads(text))
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def default_messages(repo_root: Path) -> list[str]:
+    msgs: list[str] = []
+    for scenario in sorted((repo_root / "scripts" / "load_scenarios").glob("*.json")):
+        steps = json.loads(scenario.read_text(encoding="utf-8")).get("steps", [])
+        msgs.extend(m for m in _messages_from(steps) if m)
+    sentences = repo_root / "FASES ANTERIORES" / "Fase2" / "data" / "symptom_sentences_pt.txt"
+    if sentences.exists():
+        msgs.extend(load_messages(sentences))
+    return msgs
+
+
+def main() -> int:
+    repo_root = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(repo_root))
+    from backend.intent_engine import DEFAULT_MIN_SCORE, TfidfIntentEngine
+    from backend.mock_assistant import MockAssistantService
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", default="", help="Arquivo .txt, .json ou .jsonl com as mensagens.")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--min-score", type=float, default=DEFAULT_MIN_SCORE)
+    parser.add_argument("--out", default="", help="Grava o relatorio neste arquivo em vez de imprimir.")
+    parser.add_argument("--summary", action="store_true", help="Omite a lista por mensagem.")
+    args = parser.parse_args()
+
+    messages = load_messages(Path(args.input)) if args.input else default_messages(repo_root)
+    mock = MockAssistantService()
+    idx = mock._dialog.idx
+
+    t0 = time.perf_counter()
+    engine = TfidfIntentEngine(idx.intents, min_score=args.min_score)
+    build_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    ranked = engine.classify_many(messages, k=args.top_k)
+    classify_s = time.perf_counter() - t0
+
+    # `intent`/`jaccard`: decisao final do assistente (com reforcos por palavra-chave e guard rails)
+    # usando cada motor; `top` e' o ranking cru do TF-IDF.
+    tfidf_dialog = dataclasses.replace(mock._dialog, intent_engine=engine)
+    jaccard_dialog = dataclasses.replace(mock._dialog, intent_engine=None)
+    rows = []
+    agree = accepted = 0
+    for msg, top in zip(messages, ranked):
+        tfidf_intent = mock._best_intent(msg, dialog=tfidf_dialog)[0]
+        jaccard_intent = mock._best_intent(msg, dialog=jaccard_dialog)[0]
+        agree += tfidf_intent == jaccard_intent
+        accepted += tfidf_intent is not None
+        rows.append(
+            {
+                "message": msg,
+                "intent": tfidf_intent,
+                "jaccard": jaccard_intent,
+                "top": [{"intent": name, "score": round(score, 4)} for name, score in top],
+            }
+        )
+
+    n = len(messages)
+    report: dict[str, Any] = {
+        "messages": n,
+        "unique_messages": len({r["message"] for r in rows}),
+        "examples": engine.n_examples,
+        "features": engine.n_features,
+        "min_score": engine.min_score,
+        "build_ms": round(build_s * 1000, 3),
+        "classify_ms": round(classify_s * 1000, 3),
+        "messages_per_s": round(n / classify_s, 1) if classify_s else None,
+        "accepted_rate": round(accepted / n, 4) if n else 0.0,
+        "jaccard_agreement": round(agree / n, 4) if n else 0.0,
+    }
+    if not args.summary:
+        report["results"] = rows
+
+    out = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(out + "\n", encoding="utf-8")
+    print(out if not args.out else json.dumps({k: v for k, v in report.items() if k != "results"}, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,511 @@
+"""
+Simulador de milhares de dispositivos de sinais vitais (asyncio) para teste de carga da ingestao.
+
+Cada dispositivo virtual e' um paciente com linha de base propria e um perfil de anomalia:
+`normal`, `tachycardia` (rajadas de 125-165 bpm), `fever` (rampa ate ~39.5 C e volta) ou
+`hypertension` (PA 150-185/95-115). As leituras saem em horarios fixos (modelo aberto: uma leitura
+atrasada nao adia as seguintes, e a latencia conta a partir do horario previsto), por HTTP
+(`POST /api/patients/<id>/vitals`, pool de conexoes keep-alive) ou MQTT (`<topico>/<id>`, QoS 1,
+requer `pip install paho-mqtt`).
+
+O relatorio (JSON) traz envios, confirmacoes (HTTP 201 / PUBACK), erros, latencia de envio,
+atraso de agendamento (o proprio simulador saturado) e os alertas: as leituras que a regra da
+Fase 3 deveria disparar x os alertas recebidos, com a latencia ponta a ponta -- no HTTP vem na
+resposta; no MQTT pelo topico de alertas da ponte (CARDIOIA_MQTT_ALERT_TOPIC).
+
+Uso:
+  python scripts/device_simulator.py --spawn --devices 200 --rate 1 --duration 20
+  python scripts/device_simulator.py --url http://127.0.0.1:5000 --devices 2000 --rate 0.5 --batch 5
+  python scripts/device_simulator.py --transport mqtt --mqtt-host 127.0.0.1 --devices 5000 --rate 0.2 \\
+      --profiles normal=0.7,tachycardia=0.15,fever=0.1,hypertension=0.05
+  python scripts/device_simulator.py --transport mqtt --spawn --devices 500 --duration 30   # ponte no app local
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+PROFILES = ("normal", "tachycardia", "fever", "hypertension")
+
+
+class Device:
+    """Paciente virtual: linha de base com ruido + anomalia do perfil."""
+
+    __slots__ = ("patient_id", "profile", "rng", "hr", "temp", "sys", "dia", "burst", "fever", "fever_dir")
+
+    def __init__(self, patient_id: str, profile: str, rng: random.Random) -> None:
+        self.patient_id = patient_id
+        self.profile = profile
+        self.rng = rng
+        self.hr = rng.gauss(74, 7)
+        self.temp = rng.gauss(36.6, 0.2)
+        self.sys = rng.gauss(118, 8)
+        self.dia = rng.gauss(78, 5)
+        self.burst = 0
+        self.fever = 0.0
+        self.fever_dir = 1
+
+    def sample(self, ts: float) -> dict[str, Any]:
+        rng = self.rng
+        hr = self.hr + rng.gauss(0, 3)
+        temp = self.temp + rng.gauss(0, 0.05)
+        sys_, dia = self.sys + rng.gauss(0, 4), self.dia + rng.gauss(0, 3)
+        if self.profile == "tachycardia":
+            if self.burst == 0 and rng.random() < 0.08:
+                self.burst = rng.randint(3, 10)
+            if self.burst:
+                self.burst -= 1
+                hr = rng.uniform(125, 165)
+        elif self.profile == "fever":
+            self.fever = min(3.0, max(0.0, self.fever + self.fever_dir * rng.uniform(0.05, 0.2)))
+            if self.fever >= 3.0 or self.fever <= 0.0:
+                self.fever_dir = -self.fever_dir
+            temp += self.fever
+        elif self.profile == "hypertension":
+            sys_, dia = rng.uniform(150, 185), rng.uniform(95, 115)
+        return {
+            "ts": round(ts, 3),
+            "systolic": round(sys_),
+            "diastolic": round(dia),
+            "bpm": round(hr),
+            "temp": round(temp, 2),
+        }
+
+
+def parse_profiles(text: str) -> list[tuple[str, float]]:
+    out = []
+    for part in (p.strip() for p in text.split(",") if p.strip()):
+        name, _, weight = part.partition("=")
+        if name not in PROFILES:
+            raise SystemExit(f"Perfil desconhecido: {name} (use {', '.join(PROFILES)})")
+        out.append((name, float(weight or 1)))
+    return out
+
+
+class Stats:
+    """Contadores do laco asyncio (os callbacks do paho chegam via `call_soon_threadsafe`)."""
+
+    def __init__(self) -> None:
+        self.sent = 0
+        self.readings = 0
+        self.acked = 0
+        self.errors: dict[str, int] = {}
+        self.send_latency: list[float] = []
+        self.schedule_lag: list[float] = []
+        self.alerts_expected = 0
+        self.alert_latency: list[float] = []
+        self.unexpected_alerts = 0
+        self.pending_alerts: dict[tuple[str, float], float] = {}
+
+    def error(self, kind: str) -> None:
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def expect_alert(self, patient_id: str, ts: float, scheduled: float) -> None:
+        self.alerts_expected += 1
+        self.pending_alerts[(patient_id, ts)] = scheduled
+
+    def alert_seen(self, patient_id: str, ts: Any, seen: float) -> None:
+        try:
+            scheduled = self.pending_alerts.pop((str(patient_id), float(ts)), None)
+        except (TypeError, ValueError):
+            scheduled = None
+        if scheduled is None:
+            self.unexpected_alerts += 1
+        else:
+            self.alert_latency.append(seen - scheduled)
+
+
+def _summary_ms(values: list[float]) -> dict[str, float]:
+    from load_test import percentile
+
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "p50": round(percentile(ordered, 50) * 1000, 2),
+        "p95": round(percentile(ordered, 95) * 1000, 2),
+        "p99": round(percentile(ordered, 99) * 1000, 2),
+        "max": round((ordered[-1] if ordered else 0.0) * 1000, 2),
+    }
+
+
+class HttpTransport:
+    """Cliente HTTP/1.1 minimo sobre asyncio com pool de conexoes keep-alive."""
+
+    name = "http"
+
+    def __init__(self, base_url: str, connections: int, timeout: float) -> None:
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._pool: asyncio.Queue[tuple[asyncio.StreamReader, asyncio.StreamWriter] | None] = asyncio.Queue()
+        for _ in range(max(1, connections)):
+            self._pool.put_nowait(None)  # conexao aberta sob demanda
+
+    async def start(self, stats: Stats) -> None:
+        return None
+
+    async def _request(self, conn, path: str, body: bytes) -> tuple[Any, int, bytes]:
+        if conn is None:
+            conn = await asyncio.open_connection(self.host, self.port)
+        reader, writer = conn
+        writer.write(
+            (
+                f"POST {self.prefix}{path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n"
+            ).encode("latin-1")
+            + body
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("conexao fechada pelo servidor")
+        status = int(status_line.split()[1])
+        length, close = None, False
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "connection" and value.strip().lower() == "close":
+                close = True
+        data = await (reader.readexactly(length) if length is not None else reader.read())
+        if close or length is None:
+            writer.close()
+            conn = None
+        return conn, status, data
+
+    async def send(self, device: Device, readings: list[dict[str, Any]], stats: Stats, scheduled: float) -> None:
+        body = json.dumps({"readings": readings} if len(readings) > 1 else readings[0]).encode("utf-8")
+        conn = await self._pool.get()
+        stats.schedule_lag.append(time.perf_counter() - scheduled)
+        try:
+            for attempt in (1, 2):
+                try:
+                    conn, status, data = await asyncio.wait_for(
+                        self._request(conn, f"/api/patients/{device.patient_id}/vitals", body), self.timeout
+                    )
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    conn = None  # keep-alive fechado do outro lado: uma nova tentativa com conexao nova
+                    if attempt == 2:
+                        raise e
+        except asyncio.TimeoutError:
+            stats.error("timeout")
+            conn = None
+            return
+        except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+            stats.error(type(e).__name__)
+            conn = None
+            return
+        finally:
+            self._pool.put_nowait(conn)
+
+        now = time.perf_counter()
+        stats.send_latency.append(now - scheduled)
+        if status != 201:
+            stats.error(f"http_{status}")
+            return
+        stats.acked += 1
+        for alert in json.loads(data).get("alerts", []):
+            stats.alert_seen(device.patient_id, alert.get("ts"), now)
+
+    async def close(self) -> None:
+        while not self._pool.empty():
+            conn = self._pool.get_nowait()
+            if conn is not None:
+                conn[1].close()
+
+
+class MqttTransport:
+    """Publica pelo paho-mqtt (`--mqtt-clients` conexoes divididas entre os dispositivos), QoS 1."""
+
+    name = "mqtt"
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        import paho.mqtt.client as mqtt
+
+        self._mqtt = mqtt
+        self.args = args
+        self.topic = args.mqtt_topic.rstrip("/")
+        self.clients: list[Any] = []
+        self._lock = threading.Lock()
+        self._pending: dict[tuple[int, int], asyncio.Future] = {}
+        self._early: dict[tuple[int, int], float] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _client(self, cid: str) -> Any:
+        mqtt = self._mqtt
+        if hasattr(mqtt, "CallbackAPIVersion"):
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=cid)
+        else:
+            client = mqtt.Client(client_id=cid)
+        if self.args.mqtt_username:
+            client.username_pw_set(self.args.mqtt_username, self.args.mqtt_password)
+        client.max_inflight_messages_set(self.args.mqtt_inflight)
+        return client
+
+    async def start(self, stats: Stats) -> None:
+        self._loop = loop = asyncio.get_running_loop()
+        connected: list[asyncio.Future] = []
+        suffix = f"{os.getpid()}-{int(time.time())}"
+
+        # Assinaturas do paho 1.x e 2.x (o 2.x acrescenta reason code/properties no fim).
+        def on_connect(_c, future, _flags, rc, *_):
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(rc))
+
+        for i in range(self.args.mqtt_clients):
+            client = self._client(f"cardioia-sim-{suffix}-{i}")
+            future = loop.create_future()
+            client.user_data_set(future)
+            client.on_connect = on_connect
+            client.on_publish = lambda _c, _u, mid, *_, i=i: self._acked(i, mid)
+            client.connect_async(self.args.mqtt_host, self.args.mqtt_port, keepalive=30)
+            client.loop_start()
+            self.clients.append(client)
+            connected.append(future)
+
+        if self.args.alert_topic:
+            sub = self._client(f"cardioia-sim-{suffix}-alerts")
+            future = loop.create_future()
+            sub.user_data_set(future)
+
+            def on_sub_connect(c, fut, _flags, rc, *_):
+                c.subscribe(self.args.alert_topic, qos=1)
+                loop.call_soon_threadsafe(lambda: fut.done() or fut.set_result(rc))
+
+            def on_alert(_c, _u, msg):
+                seen = time.perf_counter()
+                try:
+                    alert = json.loads(msg.payload)
+                except ValueError:
+                    return
+                loop.call_soon_threadsafe(stats.alert_seen, alert.get("patient_id"), alert.get("ts"), seen)
+
+            sub.on_connect = on_sub_connect
+            sub.on_message = on_alert
+            sub.connect_async(self.args.mqtt_host, self.args.mqtt_port, keepalive=30)
+            sub.loop_start()
+            self.clients.append(sub)
+            connected.append(future)
+
+        results = await asyncio.wait_for(asyncio.gather(*connected), self.args.timeout)
+        if any(rc != 0 for rc in results):  # `ReasonCode` do paho 2.x compara com int
+            raise SystemExit(f"Conexao MQTT recusada (rc={results})")
+        await asyncio.sleep(0.2)  # assinatura de alertas ativa antes do primeiro envio
+
+    def _acked(self, client_idx: int, mid: int) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            future = self._pending.pop((client_idx, mid), None)
+            if future is None:
+                self._early[(client_idx, mid)] = now  # PUBACK chegou antes de registrarmos o mid
+                return
+        self._loop.call_soon_threadsafe(lambda: future.done() or future.set_result(now))
+
+    async def send(self, device: Device, readings: list[dict[str, Any]], stats: Stats, scheduled: float) -> None:
+        idx = hash(device.patient_id) % self.args.mqtt_clients
+        payload = json.dumps(readings if len(readings) > 1 else readings[0])
+        stats.schedule_lag.append(time.perf_counter() - scheduled)
+        info = self.clients[idx].publish(f"{self.topic}/{device.patient_id}", payload, qos=1)
+        if info.rc != 0:
+            stats.error(f"publish_rc_{info.rc}")
+            return
+        future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            early = self._early.pop((idx, info.mid), None)
+            if early is None:
+                self._pending[(idx, info.mid)] = future
+        try:
+            acked_at = early if early is not None else await asyncio.wait_for(future, self.args.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._pending.pop((idx, info.mid), None)
+            stats.error("puback_timeout")
+            return
+        stats.send_latency.append(acked_at - scheduled)
+        stats.acked += 1
+
+    async def close(self) -> None:
+        for client in self.clients:
+            client.loop_stop()
+            client.disconnect()
+
+
+async def run_device(device: Device, transport: Any, stats: Stats, args: argparse.Namespace, start: float, tasks: set) -> None:
+    from backend.phase3_vitals import risk_check_local
+
+    loop = asyncio.get_running_loop()
+    interval = 1.0 / args.rate
+    # Desencontra os dispositivos dentro do primeiro intervalo (sem rajada sincronizada no inicio).
+    next_at = start + device.rng.uniform(0, interval)
+    end = start + args.duration
+    batch: list[dict[str, Any]] = []
+    while next_at < end:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        reading = device.sample(time.time())
+        if risk_check_local(reading["temp"], reading["bpm"])["alerts"]:
+            stats.expect_alert(device.patient_id, reading["ts"], next_at)
+        batch.append(reading)
+        stats.readings += 1
+        if len(batch) >= args.batch:
+            stats.sent += 1
+            task = loop.create_task(transport.send(device, batch, stats, next_at))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            batch = []
+        next_at += interval * (device.rng.uniform(0.9, 1.1) if args.jitter else 1.0)
+
+
+async def simulate(args: argparse.Namespace, base_url: str) -> dict[str, Any]:
+    rng = random.Random(args.seed)
+    profiles = parse_profiles(args.profiles)
+    names, weights = [p for p, _ in profiles], [w for _, w in profiles]
+    devices = [
+        Device(f"{args.prefix}{i}", rng.choices(names, weights)[0], random.Random(rng.random()))
+        for i in range(args.devices)
+    ]
+    stats = Stats()
+    transport: Any = MqttTransport(args) if args.transport == "mqtt" else HttpTransport(base_url, args.connections, args.timeout)
+    await transport.start(stats)
+
+    tasks: set[asyncio.Task] = set()
+    start = time.perf_counter() + 0.05
+    await asyncio.gather(*(run_device(d, transport, stats, args, start, tasks) for d in devices))
+    if tasks:
+        await asyncio.wait(tasks, timeout=args.timeout)
+    # Alertas atrasados (lote da ponte, fila do broker) ainda podem chegar.
+    drain_until = time.perf_counter() + args.drain
+    while stats.pending_alerts and time.perf_counter() < drain_until:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    await transport.close()
+
+    track_alerts = args.transport == "http" or bool(args.alert_topic)
+    counts = {name: sum(d.profile == name for d in devices) for name in names}
+    return {
+        "transport": args.transport,
+        "target": base_url if args.transport == "http" else f"mqtt://{args.mqtt_host}:{args.mqtt_port}/{args.mqtt_topic}",
+        "devices": args.devices,
+        "profiles": counts,
+        "rate_per_device": args.rate,
+        "batch": args.batch,
+        "duration_s": args.duration,
+        "elapsed_s": round(elapsed, 3),
+        "target_readings_per_s": round(args.devices * args.rate, 2),
+        "readings": stats.readings,
+        "readings_per_s": round(stats.readings / elapsed, 2) if elapsed else 0.0,
+        "sent": stats.sent,
+        "acked": stats.acked,
+        "errors": sum(stats.errors.values()),
+        "error_kinds": stats.errors,
+        "send_latency_ms": _summary_ms(stats.send_latency),
+        "schedule_lag_ms": _summary_ms(stats.schedule_lag),
+        "alerts": {
+            "tracked": track_alerts,
+            "expected": stats.alerts_expected,
+            "received": len(stats.alert_latency),
+            "missed": len(stats.pending_alerts) if track_alerts else None,
+            "unexpected": stats.unexpected_alerts,
+            "latency_ms": _summary_ms(stats.alert_latency),
+        },
+    }
+
+
+def _spawn(args: argparse.Namespace) -> str:
+    """App local (modo LOCAL) com armazenamento temporario; no MQTT a ponte sobe junto com o app."""
+    from load_test import _spawn_local_server
+
+    os.environ.setdefault("CARDIOIA_VITALS_STORE_PATH", tempfile.mkdtemp(prefix="cardioia-sim-"))
+    os.environ["CARDIOIA_RATE_LIMIT"] = "0"
+    if args.transport == "mqtt":
+        os.environ.update(
+            {
+                "CARDIOIA_MQTT_INGEST": "1",
+                "CARDIOIA_MQTT_HOST": args.mqtt_host,
+                "CARDIOIA_MQTT_PORT": str(args.mqtt_port),
+                "CARDIOIA_MQTT_TOPIC": args.mqtt_topic,
+                "CARDIOIA_MQTT_ALERT_TOPIC": args.alert_topic,
+            }
+        )
+    base_url = _spawn_local_server()
+    import urllib.request
+
+    # A primeira requisicao sobe as threads da ponte MQTT (como num worker real).
+    urllib.request.urlopen(f"{base_url}/api/status", timeout=30).read()
+    time.sleep(1.0 if args.transport == "mqtt" else 0)
+    return base_url
+
+
+def main() -> int:
+    repo_root = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(repo_root))
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--transport", choices=("http", "mqtt"), default="http")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--spawn", action="store_true", help="Sobe o app local (modo LOCAL) em vez de usar --url.")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=0.5, help="Leituras/s por dispositivo.")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--batch", type=int, default=1, help="Leituras por envio (o dispositivo acumula).")
+    parser.add_argument("--profiles", default="normal=0.8,tachycardia=0.1,fever=0.07,hypertension=0.03")
+    parser.add_argument("--prefix", default="sim", help="Prefixo dos ids de paciente.")
+    parser.add_argument("--no-jitter", dest="jitter", action="store_false", help="Intervalos exatos entre leituras.")
+    parser.add_argument("--connections", type=int, default=32, help="Conexoes HTTP keep-alive.")
+    parser.add_argument("--mqtt-host", default=os.getenv("CARDIOIA_MQTT_HOST") or "127.0.0.1")
+    parser.add_argument("--mqtt-port", type=int, default=int(os.getenv("CARDIOIA_MQTT_PORT") or 1883))
+    parser.add_argument("--mqtt-username", default=os.getenv("CARDIOIA_MQTT_USERNAME") or "")
+    parser.add_argument("--mqtt-password", default=os.getenv("CARDIOIA_MQTT_PASSWORD") or "")
+    parser.add_argument("--mqtt-topic", default=os.getenv("CARDIOIA_MQTT_TOPIC") or "cardioia/grupo1/vitals")
+    parser.add_argument("--alert-topic", default=os.getenv("CARDIOIA_MQTT_ALERT_TOPIC") or "cardioia/grupo1/alerts")
+    parser.add_argument("--mqtt-clients", type=int, default=4, help="Conexoes MQTT divididas entre os dispositivos.")
+    parser.add_argument("--mqtt-inflight", type=int, default=1000, help="Mensagens QoS 1 sem PUBACK por conexao.")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--drain", type=float, default=3.0, help="Espera por alertas atrasados no fim (s).")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default="")
+    args = parser.parse_args()
+    if args.rate <= 0 or args.devices <= 0 or args.batch <= 0:
+        parser.error("--devices, --rate e --batch devem ser positivos")
+
+    report_out = sys.stdout
+    base_url = args.url
+    if args.spawn:
+        # Os `print()` do app vao para stderr; stdout fica so com o relatorio.
+        sys.stdout = sys.stderr
+        base_url = _spawn(args)
+    if args.transport == "mqtt":
+        try:
+            import paho.mqtt.client  # noqa: F401
+        except ImportError:
+            print(json.dumps({"ok": False, "error": "paho-mqtt nao instalado (pip install paho-mqtt)"}), file=report_out)
+            return 1
+
+    report = asyncio.run(simulate(args, base_url))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    print(text, file=report_out)
+    return 0 if report["errors"] == 0 and not report["alerts"]["missed"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,312 @@
+"""
+Teste de carga HTTP: reexecuta roteiros de conversa (scripts/load_scenarios/*.json) contra um servidor rodando.
+
+Cada sessao sorteia um roteiro (pelo `weight`) e executa os passos em ordem, com um `user_id`
+proprio (a conversa multi-turno mantem o estado no servidor). Dois modelos de carga:
+- fechado (padrao): `--concurrency` usuarios virtuais repetindo sessoes sem pausa entre elas;
+- aberto: `--rate` sessoes/s com chegadas de Poisson; `--concurrency` limita as sessoes em voo
+  e o atraso para iniciar (`start_lag_ms`) mostra quando o servidor nao acompanha a taxa.
+
+Relatorio (JSON) por rota: requisicoes, status, erros e latencia p50/p95/p99/max em ms.
+
+Uso (totalmente offline, sobe o app em modo LOCAL numa porta livre):
+  python scripts/load_test.py --spawn --duration 30 --concurrency 8
+  python scripts/load_test.py --url http://127.0.0.1:5000 --rate 20 --duration 60 --out carga.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+
+def load_scenarios(paths: list[Path]) -> list[dict[str, Any]]:
+    files: list[Path] = []
+    for p in paths:
+        files.extend(sorted(p.glob("*.json")) if p.is_dir() else [p])
+    scenarios = []
+    for f in files:
+        data = json.loads(f.read_text(encoding="utf-8"))
+        if not data.get("steps"):
+            raise ValueError(f"Roteiro sem passos: {f}")
+        data.setdefault("name", f.stem)
+        data.setdefault("weight", 1)
+        scenarios.append(data)
+    return scenarios
+
+
+def _fill(value: Any, user_id: str) -> Any:
+    if isinstance(value, str):
+        return value.replace("{user_id}", user_id)
+    if isinstance(value, dict):
+        return {k: _fill(v, user_id) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, user_id) for v in value]
+    return value
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Percentil por posto mais proximo (sem interpolacao), sobre valores ja ordenados."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.routes: dict[str, dict[str, Any]] = {}
+        self.sessions = 0
+        self.failed_sessions = 0
+        self.start_lag: list[float] = []
+
+    def record(self, route: str, latency_s: float, status: int | None, error: bool) -> None:
+        with self._lock:
+            r = self.routes.setdefault(route, {"latencies": [], "status": {}, "errors": 0})
+            r["latencies"].append(latency_s)
+            key = str(status) if status is not None else "conexao"
+            r["status"][key] = r["status"].get(key, 0) + 1
+            r["errors"] += int(error)
+
+    def session_done(self, ok: bool, lag_s: float | None = None) -> None:
+        with self._lock:
+            self.sessions += 1
+            self.failed_sessions += int(not ok)
+            if lag_s is not None:
+                self.start_lag.append(lag_s)
+
+    def report(self, elapsed_s: float) -> dict[str, Any]:
+        def summary(values: list[float]) -> dict[str, float]:
+            values = sorted(values)
+            return {
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "max_ms": round((values[-1] if values else 0.0) * 1000, 2),
+                "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+            }
+
+        routes = {}
+        total = errors = 0
+        for route in sorted(self.routes):
+            r = self.routes[route]
+            n = len(r["latencies"])
+            total += n
+            errors += r["errors"]
+            routes[route] = {
+                "requests": n,
+                "rps": round(n / elapsed_s, 2) if elapsed_s else 0.0,
+                "errors": r["errors"],
+                "status": r["status"],
+                **summary(r["latencies"]),
+            }
+        out = {
+            "elapsed_s": round(elapsed_s, 2),
+            "sessions": self.sessions,
+            "failed_sessions": self.failed_sessions,
+            "requests": total,
+            "errors": errors,
+            "rps": round(total / elapsed_s, 2) if elapsed_s else 0.0,
+            "routes": routes,
+        }
+        if self.start_lag:
+            lag = sorted(self.start_lag)
+            out["start_lag_ms"] = {
+                "p50": round(percentile(lag, 50) * 1000, 2),
+                "p99": round(percentile(lag, 99) * 1000, 2),
+                "max": round(lag[-1] * 1000, 2),
+            }
+        return out
+
+
+class _Connections:
+    """Uma conexao keep-alive por thread (como um navegador/cliente real)."""
+
+    def __init__(self, base_url: str, timeout: float) -> None:
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or (443 if self.https else 80)
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = cls(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def request(self, method: str, path: str, body: Any = None) -> tuple[int, bytes]:
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+        for attempt in (0, 1):
+            conn = self._conn()
+            try:
+                conn.request(method, self.prefix + path, body=payload, headers=headers)
+                res = conn.getresponse()
+                return res.status, res.read()
+            except (http.client.HTTPException, ConnectionError):
+                # Conexao keep-alive fechada pelo servidor: reabre e tenta 1 vez.
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        raise RuntimeError("inalcancavel")
+
+
+def run_session(
+    scenario: dict[str, Any], conns: _Connections, rec: Recorder, rng: random.Random, think_scale: float
+) -> bool:
+    user_id = f"load-{uuid.uuid4().hex[:12]}"
+    ok = True
+    for step in scenario["steps"]:
+        if rng.random() >= float(step.get("probability", 1.0)):
+            continue
+        think = float(step.get("think_ms", 0)) * think_scale / 1000.0
+        if think > 0:
+            time.sleep(think)
+        method = step.get("method", "GET").upper()
+        route = f"{method} {step['path']}"
+        expect = step.get("expect_status")
+        started = time.perf_counter()
+        try:
+            status, _ = conns.request(method, step["path"], _fill(step.get("json"), user_id))
+        except Exception:
+            rec.record(route, time.perf_counter() - started, None, True)
+            ok = False
+            continue
+        error = status != expect if expect is not None else status >= 400
+        rec.record(route, time.perf_counter() - started, status, error)
+        ok = ok and not error
+    return ok
+
+
+def _pick(scenarios: list[dict[str, Any]], rng: random.Random) -> dict[str, Any]:
+    return rng.choices(scenarios, weights=[float(s["weight"]) for s in scenarios])[0]
+
+
+def run_closed(scenarios, conns, rec, args) -> None:
+    deadline = time.monotonic() + args.duration
+    remaining = [args.sessions] if args.sessions else None
+    lock = threading.Lock()
+
+    def user(i: int) -> None:
+        rng = random.Random(args.seed + i)
+        while time.monotonic() < deadline:
+            if remaining is not None:
+                with lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+            rec.session_done(run_session(_pick(scenarios, rng), conns, rec, rng, args.think_scale))
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def run_open(scenarios, conns, rec, args) -> None:
+    rng = random.Random(args.seed)
+    deadline = time.monotonic() + args.duration
+    slots = threading.BoundedSemaphore(args.concurrency)
+
+    def session(scenario: dict[str, Any], scheduled: float, seed: int) -> None:
+        with slots:
+            lag = time.monotonic() - scheduled
+            srng = random.Random(seed)
+            rec.session_done(run_session(scenario, conns, rec, srng, args.think_scale), lag)
+
+    started = 0
+    with ThreadPoolExecutor(max_workers=args.concurrency * 4) as pool:
+        next_at = time.monotonic()
+        while next_at < deadline and (not args.sessions or started < args.sessions):
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(session, _pick(scenarios, rng), next_at, rng.randrange(1 << 30))
+            started += 1
+            next_at += rng.expovariate(args.rate)
+
+
+def _spawn_local_server() -> str:
+    """Sobe o app em modo LOCAL (sem Watson/Gemini) numa thread, numa porta livre."""
+    os.environ["CARDIOIA_ASSISTANT_MODE"] = "local"
+    os.environ["GEMINI_API_KEY"] = ""
+    from werkzeug.serving import make_server
+
+    from backend.app import create_app
+
+    server = make_server("127.0.0.1", 0, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def main() -> int:
+    repo_root = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(repo_root))
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--spawn", action="store_true", help="Sobe o app local (modo LOCAL) em vez de usar --url.")
+    parser.add_argument("--scenarios", nargs="*", default=[str(repo_root / "scripts" / "load_scenarios")])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0.0, help="Sessoes/s (Poisson). 0 = modelo fechado.")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--sessions", type=int, default=0, help="Limite de sessoes (0 = so --duration).")
+    parser.add_argument("--think-scale", type=float, default=1.0, help="Multiplica os `think_ms` (0 desliga).")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default="")
+    args = parser.parse_args()
+
+    scenarios = load_scenarios([Path(p) for p in args.scenarios])
+    report_out = sys.stdout
+    if args.spawn:
+        # Os `print()` do app (modo local, robo RPA) vao para stderr; stdout fica so com o relatorio.
+        sys.stdout = sys.stderr
+    base_url = _spawn_local_server() if args.spawn else args.url
+    conns = _Connections(base_url, args.timeout)
+    rec = Recorder()
+
+    t0 = time.perf_counter()
+    if args.rate > 0:
+        run_open(scenarios, conns, rec, args)
+    else:
+        run_closed(scenarios, conns, rec, args)
+    elapsed = time.perf_counter() - t0
+
+    report = {
+        "url": base_url,
+        "model": "aberto" if args.rate > 0 else "fechado",
+        "concurrency": args.concurrency,
+        "rate": args.rate or None,
+        "scenarios": {s["name"]: s["weight"] for s in scenarios},
+        **rec.report(elapsed),
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    print(text, file=report_out)
+    return 0 if report["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
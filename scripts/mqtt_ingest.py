@@ -0,0 +1,61 @@
+"""
+Ponte MQTT -> serie temporal de sinais vitais como processo unico (`backend/mqtt_ingest.py`).
+
+Assina o topico dos dispositivos da Fase 3 (QoS 1), grava em lotes no armazenamento de sinais
+vitais (o mesmo diretorio lido por `/api/patients/<id>/vitals`) e aplica a regra de alerta da
+Fase 3. Com o servidor em varios workers, prefira este processo a CARDIOIA_MQTT_INGEST=1 no app
+(ou use CARDIOIA_MQTT_SHARED_GROUP). Broker local para testes: `mosquitto -p 1883`.
+Requer `pip install paho-mqtt`; conexao via CARDIOIA_MQTT_* (ver `.env.example`).
+
+Uso:
+  python scripts/mqtt_ingest.py
+  python scripts/mqtt_ingest.py --duration 60 --report-every 10
+  CARDIOIA_MQTT_HOST=broker.local CARDIOIA_MQTT_TOPIC='cardioia/+/vitals/#' python scripts/mqtt_ingest.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+
+def main() -> int:
+    repo_root = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(repo_root))
+    from backend.mqtt_ingest import MqttIngestBridge
+    from backend.vitals_store import VitalsStore
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--topic", default="", help="Topico (padrao: CARDIOIA_MQTT_TOPIC ou cardioia/grupo1/vitals).")
+    parser.add_argument("--store", default="", help="Diretorio do armazenamento (padrao: CARDIOIA_VITALS_STORE_PATH).")
+    parser.add_argument("--duration", type=float, default=0, help="Segundos ate parar (0 = ate Ctrl+C).")
+    parser.add_argument("--report-every", type=float, default=30, help="Intervalo entre relatorios (s).")
+    args = parser.parse_args()
+
+    try:
+        import paho.mqtt.client  # noqa: F401
+    except ImportError:
+        print(json.dumps({"ok": False, "error": "paho-mqtt nao instalado (pip install paho-mqtt)"}))
+        return 1
+
+    bridge = MqttIngestBridge(VitalsStore(args.store or None), topic=args.topic or None)
+    bridge.ensure_started()
+    deadline = time.monotonic() + args.duration if args.duration else None
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            wait = args.report_every if deadline is None else min(args.report_every, max(0.0, deadline - time.monotonic()))
+            time.sleep(wait)
+            print(json.dumps(bridge.stats(), ensure_ascii=False), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bridge.stop()
+    print(json.dumps({"ok": True, **bridge.stats()}, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
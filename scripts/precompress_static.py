@@ -0,0 +1,94 @@
+"""
+Gera variantes pre-comprimidas (.gz e, se o pacote `brotli` estiver instalado, .br) do build do frontend.
+
+O servidor (`backend/static_files.py`) escolhe a variante pelo Accept-Encoding do cliente. Cada
+variante recebe o mesmo mtime do original; se o original mudar, a variante e' ignorada ate
+este script rodar de novo (roda sozinho depois de `npm run build` e na subida do gunicorn).
+
+Uso:
+  python scripts/precompress_static.py
+  python scripts/precompress_static.py --dir backend/static --min-size 512
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import sys
+from pathlib import Path
+
+_MIN_SIZE = 512
+
+
+def _brotli():
+    try:
+        import brotli  # type: ignore
+
+        return brotli
+    except Exception:
+        return None
+
+
+def _write_variant(source: Path, suffix: str, payload: bytes, st: os.stat_result) -> int:
+    target = source.with_name(source.name + suffix)
+    tmp = target.with_name(target.name + ".tmp")
+    tmp.write_bytes(payload)
+    os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.replace(tmp, target)
+    return len(payload)
+
+
+def precompress(root: Path, min_size: int = _MIN_SIZE, force: bool = False) -> dict:
+    from backend.static_files import is_compressible, variant_is_fresh
+
+    brotli = _brotli()
+    report = {"dir": str(root), "files": 0, "skipped": 0, "bytes_in": 0, "gzip_bytes": 0, "br_bytes": 0}
+    if brotli is None:
+        report["brotli"] = "pacote `brotli` nao instalado; apenas .gz"
+    for path in sorted(root.rglob("*")):
+        if not path.is_file() or not is_compressible(path.name):
+            continue
+        st = path.stat()
+        if st.st_size < min_size:
+            continue
+        codecs = [(".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            codecs.append((".br", lambda data: brotli.compress(data, quality=11)))
+        pending = [(s, fn) for s, fn in codecs if force or not variant_is_fresh(st, str(path) + s)]
+        if not pending:
+            report["skipped"] += 1
+            continue
+        data = path.read_bytes()
+        report["files"] += 1
+        report["bytes_in"] += len(data)
+        for suffix, compress in pending:
+            payload = compress(data)
+            if len(payload) >= len(data):
+                continue
+            size = _write_variant(path, suffix, payload, st)
+            report["gzip_bytes" if suffix == ".gz" else "br_bytes"] += size
+    return report
+
+
+def main() -> int:
+    repo_root = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(repo_root))
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dir", default=str(repo_root / "backend" / "static"))
+    parser.add_argument("--min-size", type=int, default=_MIN_SIZE)
+    parser.add_argument("--force", action="store_true", help="Regera mesmo variantes atualizadas.")
+    args = parser.parse_args()
+
+    root = Path(args.dir)
+    if not root.is_dir():
+        print(json.dumps({"error": f"Diretorio nao encontrado: {root}"}))
+        return 1
+    print(json.dumps(precompress(root, args.min_size, args.force), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+# Entrypoint WSGI de producao (usado pelo gunicorn, ver `gunicorn.conf.py`).
+#
+# Com `preload_app = True`, este modulo e' importado uma unica vez no processo master:
+# o indice do skill, as regras da Fase 2 e os handles de modelo sao carregados aqui e
+# os workers herdam essas paginas via fork (copy-on-write), sem recarregar nada.
+
+import gc
+import os
+
+from backend.app import create_app
+
+
+def _preload_names() -> list[str]:
+    raw = os.getenv("CARDIOIA_PRELOAD_SERVICES", "assistant,phase2_triage,clinical_extraction")
+    return [n.strip() for n in raw.split(",") if n.strip()]
+
+
+# Threads de fundo (ponte MQTT) nao atravessam o fork: sobem no `post_fork` (ver `gunicorn.conf.py`).
+app = create_app(start_background=False)
+app.config["services"].warm(*_preload_names())
+
+# Move os objetos ja carregados para a geracao permanente do GC: o coletor dos workers
+# deixa de percorre-los (e de "sujar" as paginas compartilhadas com o master).
+gc.collect()
+gc.freeze()